@@ -253,8 +253,13 @@ scheduler_events = {
         "optima.optima.utils.sync.hourly_sync"
     ],
     "cron": {
-        "*/10 * * * *": [
+        "* * * * *": [
+            "optima.optima.utils.outbox.enqueue_outbox_dispatch",
+            "optima.optima.utils.spool.replay_spool",
             "optima.optima.utils.sync.check_optima_sync_status"
+        ],
+        "*/5 * * * *": [
+            "optima.optima.utils.sync.delta_sync"
         ]
     }
 }
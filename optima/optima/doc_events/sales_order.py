@@ -1,6 +1,6 @@
 import frappe
 from frappe import _
-from optima.optima.utils.order_sync import enqueue_optima_order_sync
+from optima.optima.utils.outbox import add_to_outbox
 
 def on_submit(doc, method):
     """Handle Sales Order submission"""
@@ -8,15 +8,14 @@ def on_submit(doc, method):
         return
         
     try:
-        # Queue the sync process with retry
-        enqueue_optima_order_sync(doc.name)
+        # Queue the order in the outbox; this is part of the submit transaction
+        # and the dispatcher pushes it to Optima with the next batch
+        add_to_outbox(doc.name)
         
         # Update initial status
         doc.db_set('custom_optima_sync_status', 'Pending')
-        frappe.db.commit()
         
     except Exception as e:
         frappe.log_error(f"Optima Sync Error: {str(e)}", "Optima Sales Order Submit")
         doc.db_set('custom_optima_sync_status', 'Failed')
         doc.db_set('custom_optima_sync_error', str(e))
-        frappe.db.commit()
\ No newline at end of file
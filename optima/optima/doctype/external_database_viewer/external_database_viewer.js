@@ -42,6 +42,22 @@ frappe.ui.form.on('External Database Viewer', {
                 }
             });
         });
+
+        frm.add_custom_button(__('Refresh Schema'), function () {
+            frappe.call({
+                method: "optima.optima.utils.schema_cache.clear_schema_cache",
+                args: {
+                    server: frm.doc.server_ip_address,
+                    port: frm.doc.port
+                },
+                callback: function () {
+                    frappe.show_alert({
+                        message: __('Schema will be read again from the server'),
+                        indicator: 'green'
+                    });
+                }
+            });
+        });
     }
 });
 
@@ -72,6 +88,9 @@ window.showTables = function(database) {
                         <div class="table-card" style="background-color: ${color}; padding: 10px; border-radius: 10px; color: #fff; text-align: center; box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1); cursor: pointer;"
                             onclick="showColumns('${database}', '${table.table_name}')">
                             ${table.table_name}
+                            <div style="font-size: 0.8em; opacity: 0.85;">
+                                ~${format_number(table.row_count, null, 0)} rows · ${(table.reserved_kb / 1024).toFixed(1)} MB
+                            </div>
                         </div>
                     `;
                 });
@@ -147,8 +166,8 @@ window.showColumns = function(database, table) {
     });
 };
 
-// Function to fetch and display the latest 5 items from the table
-window.showLatestItems = function(database, table) {
+// Function to fetch one page of items from the table; `always` runs whether or not it succeeded
+function fetchItemsPage(database, table, cursor, callback, always) {
     frappe.call({
         method: "optima.optima.doctype.external_database_viewer.external_database_viewer.fetch_latest_items",
         args: {
@@ -157,59 +176,94 @@ window.showLatestItems = function(database, table) {
             username: cur_frm.doc.username,
             password: cur_frm.doc.password,
             database: database,
-            table: table
+            table: table,
+            page_size: 50,
+            cursor: cursor
         },
         callback: function(response) {
             if (response.message && !response.message.error) {
-                let data = response.message;
-                let items_html = `
-                    <div style="padding: 20px; background-color: #fff;">
-                        <h3 style="color: #333; text-align: center; margin-bottom: 20px;">Latest 5 Items in <span style="color: #007bff;">${table}</span></h3>
-                        <table id="latest-items-table" style="width: 100%; border-collapse: collapse; border: 1px solid #ddd;">
-                            <tr style="background-color: #f8f9fa; color: #333;">
-                `;
+                callback(response.message);
+            } else {
+                frappe.msgprint("Error fetching items: " + (response.message || {}).error);
+            }
+        },
+        always: always
+    });
+}
 
-                // Add column headers
-                data.columns.forEach(column => {
-                    items_html += `<th style="padding: 10px; border: 1px solid #ddd;">${column}</th>`;
-                });
+function itemRowsHtml(items) {
+    let rows_html = '';
+    items.forEach(item => {
+        rows_html += `<tr style="text-align: center;">`;
+        item.forEach(value => {
+            rows_html += `<td style="padding: 10px; border: 1px solid #ddd;">${value}</td>`;
+        });
+        rows_html += `</tr>`;
+    });
+    return rows_html;
+}
 
-                items_html += `</tr>`;
+// Function to display the latest items from the table, loading further pages on scroll
+window.showLatestItems = function(database, table) {
+    fetchItemsPage(database, table, null, function(data) {
+        let items_html = `
+            <div style="padding: 20px; background-color: #fff;">
+                <h3 style="color: #333; text-align: center; margin-bottom: 20px;">Latest Items in <span style="color: #007bff;">${table}</span></h3>
+                <div id="latest-items-scroll" style="max-height: 60vh; overflow-y: auto;">
+                    <table id="latest-items-table" style="width: 100%; border-collapse: collapse; border: 1px solid #ddd;">
+                        <tr style="background-color: #f8f9fa; color: #333;">
+        `;
 
-                // Add rows for the latest items
-                data.items.forEach(item => {
-                    items_html += `<tr style="text-align: center;">`;
-                    item.forEach(value => {
-                        items_html += `<td style="padding: 10px; border: 1px solid #ddd;">${value}</td>`;
-                    });
-                    items_html += `</tr>`;
-                });
+        // Add column headers
+        data.columns.forEach(column => {
+            items_html += `<th style="padding: 10px; border: 1px solid #ddd;">${column}</th>`;
+        });
 
-                items_html += `</table></div>`;
+        items_html += `</tr>`;
 
-                // Add buttons for actions
-                items_html += `
-                    <div style="text-align: center; margin-top: 20px;">
-                        <button class="btn btn-success" onclick="downloadExcel('${table}')">Download Excel</button>
-                    </div>
-                `;
+        // Add rows for the first page
+        items_html += itemRowsHtml(data.items);
 
-                // Display the items in a modal
-                frappe.msgprint({
-                    title: `Latest 5 Items in ${table}`,
-                    indicator: 'blue',
-                    message: items_html,
-                    primary_action: {
-                        label: 'Close',
-                        action() {
-                            frappe.hide_msgprint();
-                        }
-                    }
-                });
-            } else {
-                frappe.msgprint("Error fetching items: " + response.message.error);
+        items_html += `</table></div></div>`;
+
+        // Add buttons for actions
+        items_html += `
+            <div style="text-align: center; margin-top: 20px;">
+                <button class="btn btn-success" onclick="downloadExcel('${table}')">Download Excel</button>
+            </div>
+        `;
+
+        // Display the items in a modal
+        frappe.msgprint({
+            title: `Latest Items in ${table}`,
+            indicator: 'blue',
+            message: items_html,
+            primary_action: {
+                label: 'Close',
+                action() {
+                    frappe.hide_msgprint();
+                }
             }
-        }
+        });
+
+        // Fetch the next page when the user scrolls near the bottom
+        let next_cursor = data.next_cursor;
+        let loading = false;
+        let container = document.getElementById('latest-items-scroll');
+        container.addEventListener('scroll', function() {
+            if (!next_cursor || loading) return;
+            if (container.scrollTop + container.clientHeight < container.scrollHeight - 100) return;
+
+            loading = true;
+            fetchItemsPage(database, table, next_cursor, function(page) {
+                document.getElementById('latest-items-table')
+                    .insertAdjacentHTML('beforeend', itemRowsHtml(page.items));
+                next_cursor = page.next_cursor;
+            }, function() {
+                // Also after a failed page, so scrolling can try again
+                loading = false;
+            });
+        });
     });
 };
 
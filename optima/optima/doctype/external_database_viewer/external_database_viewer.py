@@ -1,76 +1,93 @@
 # Copyright (c) 2024, JCMAPP and contributors
 # For license information, please see license.txt
 
-import pymssql
 import frappe
+from frappe import _
 from frappe.model.document import Document
-from frappe.utils import now_datetime
+from frappe.utils import cint, now_datetime
+import base64
+import json
+from optima.optima.utils.connection import get_connection, get_optima_connection, quote_identifier
+from optima.optima.utils.order_sync import insert_order_header
+from optima.optima.utils.schema_cache import get_cached_schema
+from optima.optima.utils.table_stats import fetch_table_stats
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500  # rows per page, whatever the client asks for
 
 class ExternalDatabaseViewer(Document):
 	pass
 
 @frappe.whitelist()
-def fetch_databases(server, port, username, password):
-    try:
+def fetch_databases(server, port, username, password, refresh=0):
+    def load():
         # Connect to the MS SQL server
-        conn = pymssql.connect(server=server, port=port, user=username, password=password)
-        cursor = conn.cursor()
+        with get_connection(server=server, port=port, user=username, password=password, use_circuit=False) as conn:
+            cursor = conn.cursor()
         
-        # Query to list all databases
-        cursor.execute("SELECT name FROM master.dbo.sysdatabases")
-        databases = cursor.fetchall()
+            # Query to list all databases
+            cursor.execute("SELECT name FROM master.dbo.sysdatabases")
+            databases = cursor.fetchall()
         
-        # Close connection
-        cursor.close()
-        conn.close()
+            # Close connection
+            cursor.close()
 
         # Return the list of databases
         return [{"name": db[0]} for db in databases]
 
+    try:
+        return get_cached_schema(server, port, username, password, None, "databases", load, refresh)
+
     except Exception as e:
         frappe.log_error(message=str(e), title="MS SQL Connection Error")
         return {"error": str(e)}
 
 @frappe.whitelist()
-def fetch_tables(server, port, username, password, database):
-    try:
+def fetch_tables(server, port, username, password, database, refresh=0):
+    def load():
         # Connect to the specific MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
+        with get_connection(server=server, port=port, user=username, password=password, database=database, use_circuit=False) as conn:
+            cursor = conn.cursor()
         
-        # Query to list all tables in the database
-        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_type = 'BASE TABLE'")
-        tables = cursor.fetchall()
+            # List all tables in the database with approximate row counts and sizes
+            tables = fetch_table_stats(cursor)
         
-        # Close connection
-        cursor.close()
-        conn.close()
+            # Close connection
+            cursor.close()
 
         # Return the list of tables
-        return [{"table_name": table[0]} for table in tables]
+        return tables
+
+    try:
+        return get_cached_schema(server, port, username, password, database, "tables", load, refresh)
 
     except Exception as e:
         frappe.log_error(message=str(e), title="MS SQL Connection Error")
         return {"error": str(e)}
 
 @frappe.whitelist()
-def fetch_columns(server, port, username, password, database, table):
-    try:
+def fetch_columns(server, port, username, password, database, table, refresh=0):
+    def load():
         # Connect to the specific MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
+        with get_connection(server=server, port=port, user=username, password=password, database=database, use_circuit=False) as conn:
+            cursor = conn.cursor()
         
-        # Query to get column details for the specified table
-        cursor.execute(f"SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.columns WHERE table_name = '{table}'")
-        columns = cursor.fetchall()
+            # Query to get column details for the specified table
+            cursor.execute(
+                "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.columns WHERE table_name = %s ORDER BY ORDINAL_POSITION",
+                (table,)
+            )
+            columns = cursor.fetchall()
         
-        # Close connection
-        cursor.close()
-        conn.close()
+            # Close connection
+            cursor.close()
 
         # Return the list of columns with their data types
         return [{"column_name": col[0], "data_type": col[1]} for col in columns]
 
+    try:
+        return get_cached_schema(server, port, username, password, database, f"columns|{table}", load, refresh)
+
     except Exception as e:
         frappe.log_error(message=str(e), title="MS SQL Column Fetch Error")
         return {"error": str(e)}
@@ -78,20 +95,19 @@ def fetch_columns(server, port, username, password, database, table):
 def fetch_table_data(server, port, username, password, database, table):
     try:
         # Connect to the specific MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
+        with get_connection(server=server, port=port, user=username, password=password, database=database, use_circuit=False) as conn:
+            cursor = conn.cursor()
         
-        # Query to get the first 5 rows from the specified table
-        cursor.execute(f"SELECT TOP 5 * FROM {table}")
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]  # Column names
+            # Query to get the first 5 rows from the specified table
+            cursor.execute(f"SELECT TOP 5 * FROM {table}")
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]  # Column names
         
-        # Format data as a list of dictionaries for better readability
-        data = [dict(zip(columns, row)) for row in rows]
+            # Format data as a list of dictionaries for better readability
+            data = [dict(zip(columns, row)) for row in rows]
         
-        # Close connection
-        cursor.close()
-        conn.close()
+            # Close connection
+            cursor.close()
 
         # Return the table data
         return data
@@ -103,16 +119,15 @@ def fetch_table_data(server, port, username, password, database, table):
 def fetch_items(server, port, username, password, database, table, limit=5):
     try:
         # Connect to the specific MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor(as_dict=True)
+        with get_connection(server=server, port=port, user=username, password=password, database=database, use_circuit=False) as conn:
+            cursor = conn.cursor(as_dict=True)
 
-        # Query to get the first `limit` items from the specified table
-        cursor.execute(f"SELECT TOP {limit} * FROM {table} ORDER BY [id] DESC")
-        items = cursor.fetchall()
+            # Query to get the first `limit` items from the specified table
+            cursor.execute(f"SELECT TOP {limit} * FROM {table} ORDER BY [id] DESC")
+            items = cursor.fetchall()
 
-        # Close connection
-        cursor.close()
-        conn.close()
+            # Close connection
+            cursor.close()
 
         # Return the list of items
         return items
@@ -121,161 +136,212 @@ def fetch_items(server, port, username, password, database, table, limit=5):
         frappe.log_error(message=str(e), title="MS SQL Item Fetch Error")
         return {"error": str(e)}
 @frappe.whitelist()
-def fetch_latest_items(server, port, username, password, database, table):
-    try:
-        # Connect to the specific MS SQL database
-        server = "196.200.26.2"
-        port = "1433"
-        username = "sa"
-        password = "123@impala"
-        database = "CONNECTOR_ORDERS"
-
-        # Connect to the MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
-
-        # Query to get column names to identify a suitable ordering column
-        cursor.execute(f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{table}'")
-        columns = [col[0] for col in cursor.fetchall()]
+def fetch_latest_items(server, port, username, password, database, table, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+    """Return one page of a table, newest first, and a cursor for the next page.
 
-        # Choose an appropriate column for ordering (e.g., created_at or first column as fallback)
-        order_column = 'created_at' if 'created_at' in columns else columns[0]
-
-        # Query to get the latest 5 items using the identified column
-        cursor.execute(f"SELECT * FROM {table} ORDER BY [{order_column}] DESC")
-        items = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]  # Get column names
-
-        # Close connection
-        cursor.close()
-        conn.close()
+    Tables with a single-column primary key are paged by key (keyset), so a
+    page costs the same however deep the user scrolls. Other tables fall back
+    to OFFSET/FETCH on created_at or their first column.
+    """
+    try:
+        page_size = min(max(cint(page_size), 1), MAX_PAGE_SIZE)
+        position = decode_cursor(cursor)
 
-        # Return the list of items with column names
+        # Connect to the specific MS SQL database
+        with get_connection(server=server, port=port, user=username, password=password, database=database, use_circuit=False) as conn:
+            db_cursor = conn.cursor()
+
+            # "schema.table" is looked up and quoted part by part
+            schema_name, _sep, table_name = table.rpartition(".")
+
+            # Query to get column names to identify a suitable ordering column
+            db_cursor.execute("""
+                SELECT c.COLUMN_NAME,
+                    CASE WHEN pk.COLUMN_NAME IS NOT NULL THEN 1 ELSE 0 END AS is_primary_key
+                FROM INFORMATION_SCHEMA.COLUMNS c
+                LEFT JOIN (
+                    SELECT ku.TABLE_SCHEMA, ku.TABLE_NAME, ku.COLUMN_NAME
+                    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+                    INNER JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE ku
+                        ON ku.CONSTRAINT_NAME = tc.CONSTRAINT_NAME
+                        AND ku.TABLE_SCHEMA = tc.TABLE_SCHEMA AND ku.TABLE_NAME = tc.TABLE_NAME
+                    WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+                ) pk ON pk.TABLE_SCHEMA = c.TABLE_SCHEMA AND pk.TABLE_NAME = c.TABLE_NAME
+                    AND pk.COLUMN_NAME = c.COLUMN_NAME
+                WHERE c.TABLE_NAME = %s AND c.TABLE_SCHEMA = ISNULL(%s, SCHEMA_NAME())
+                ORDER BY c.ORDINAL_POSITION
+            """, (table_name, schema_name or None))
+            columns = db_cursor.fetchall()
+            if not columns:
+                return {"error": f"Table {table} not found"}
+
+            primary_key = [col[0] for col in columns if col[1]]
+            column_names = [col[0] for col in columns]
+            source = ".".join(quote_identifier(part) for part in table.split("."))
+
+            # Fetch one extra row to know whether there is a next page
+            if len(primary_key) == 1:
+                mode, order_column = "keyset", primary_key[0]
+                key = quote_identifier(order_column)
+                if position.get("after") is None:
+                    db_cursor.execute(f"SELECT TOP (%s) * FROM {source} ORDER BY {key} DESC", (page_size + 1,))
+                else:
+                    db_cursor.execute(
+                        f"SELECT TOP (%s) * FROM {source} WHERE {key} < %s ORDER BY {key} DESC",
+                        (page_size + 1, position["after"])
+                    )
+            else:
+                # Choose an appropriate column for ordering (e.g., created_at or first column as fallback)
+                mode, order_column = "offset", 'created_at' if 'created_at' in column_names else column_names[0]
+                db_cursor.execute(
+                    f"SELECT * FROM {source} ORDER BY {quote_identifier(order_column)} DESC "
+                    "OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
+                    (cint(position.get("offset")), page_size + 1)
+                )
+
+            items = [list(row) for row in db_cursor.fetchmany(page_size + 1)]
+            column_names = [desc[0] for desc in db_cursor.description]  # Get column names
+
+            # Close connection
+            db_cursor.close()
+
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            if mode == "keyset":
+                next_cursor = encode_cursor({"after": items[-1][column_names.index(order_column)]})
+            else:
+                next_cursor = encode_cursor({"offset": cint(position.get("offset")) + page_size})
+
+        # Return the page with column names and where to continue
         return {
             "columns": column_names,
-            "items": items
+            "items": items,
+            "next_cursor": next_cursor,
+            "page_size": page_size,
+            "mode": mode
         }
 
     except Exception as e:
         frappe.log_error(message=str(e), title="Fetch Latest Items Error")
         return {"error": str(e)}
 
-import pymssql
-import frappe
-from frappe.utils import now_datetime
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(frappe.as_json(position, indent=None).encode()).decode()
+
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        frappe.throw(_("Invalid page cursor"))
+
 
 @frappe.whitelist()
 def insert_item_to_external_db(item_name, description, item_code, start_date=None, end_date=None):
     try:
-        # Connection parameters
-        server = "196.200.26.2"
-        port = "1433"
-        username = "sa"
-        password = "123@impala"
-        database = "CONNECTOR_ORDERS"
-
-        # Connect to the MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
-
-        # SQL insert query with all columns specified
-        insert_query = """
-            INSERT INTO ITEMS (
-                ID_ITEMS, ID_DBASEORDINI, PROGR, ID_COMMESSE, STATO, RACK, RACKSORT, ID_WORKS, ELAB,
-                PROGRELAB, POSPZ, RACKNO, SIDENO, STACKNO, X, Y, Z, ID_RACKS, ID_CBOLLER, ID_RWKITS,
-                ID_ORDMAST, PRIOPZ, PREFEPZ, BATCH_RACKSORT, NOTES, START_DATE, END_DATE, SEQX,
-                FLAGS_PROD, StartForDate, EndForDate, StartRealDate, EndRealDate, TimeStdUnit,
-                TimeRealUnit, WasteStdQty, WasteRealQty, EWPOSPZ, ID_LASTRE, IS_STOCK, LASTUSER,
-                LASTDATE, LASTCLIENT, USERCREATE, DATECREATE, CLIENTCREATE, ID_ITEMS_PARENT,
-                EXTERNAL_ID_ITEMS, ROTANGLE, RACKCDL, DESTINATION, RACKROTATED, TIPOSCARICO,
-                ID_DOC_BOOKED, ID_CBOLLER_UNLOAD, QUANTITY, RACK_X, RACK_Y, RACK_Z, DURATION,
-                ID_RACKINSTANCE, ID_ITEMSDBASE, TIPO_ITEM, GMCQ_BARCODE, Excluded, Excluded_REASON
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s
+        # Connect to the Optima database configured in Optima Settings
+        with get_optima_connection() as conn:
+            cursor = conn.cursor()
+
+            # SQL insert query with all columns specified
+            insert_query = """
+                INSERT INTO ITEMS (
+                    ID_ITEMS, ID_DBASEORDINI, PROGR, ID_COMMESSE, STATO, RACK, RACKSORT, ID_WORKS, ELAB,
+                    PROGRELAB, POSPZ, RACKNO, SIDENO, STACKNO, X, Y, Z, ID_RACKS, ID_CBOLLER, ID_RWKITS,
+                    ID_ORDMAST, PRIOPZ, PREFEPZ, BATCH_RACKSORT, NOTES, START_DATE, END_DATE, SEQX,
+                    FLAGS_PROD, StartForDate, EndForDate, StartRealDate, EndRealDate, TimeStdUnit,
+                    TimeRealUnit, WasteStdQty, WasteRealQty, EWPOSPZ, ID_LASTRE, IS_STOCK, LASTUSER,
+                    LASTDATE, LASTCLIENT, USERCREATE, DATECREATE, CLIENTCREATE, ID_ITEMS_PARENT,
+                    EXTERNAL_ID_ITEMS, ROTANGLE, RACKCDL, DESTINATION, RACKROTATED, TIPOSCARICO,
+                    ID_DOC_BOOKED, ID_CBOLLER_UNLOAD, QUANTITY, RACK_X, RACK_Y, RACK_Z, DURATION,
+                    ID_RACKINSTANCE, ID_ITEMSDBASE, TIPO_ITEM, GMCQ_BARCODE, Excluded, Excluded_REASON
+                ) VALUES (
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    %s, %s, %s, %s
+                )
+            """
+
+            now = now_datetime()
+            data = (
+                9999,  # ID_ITEMS
+                None,  # ID_DBASEORDINI
+                1,  # PROGR
+                None,  # ID_COMMESSE
+                'NEW',  # STATO
+                None,  # RACK
+                None,  # RACKSORT
+                None,  # ID_WORKS
+                0,  # ELAB
+                None,  # PROGRELAB
+                None,  # POSPZ
+                None,  # RACKNO
+                None,  # SIDENO
+                None,  # STACKNO
+                None,  # X
+                None,  # Y
+                None,  # Z
+                None,  # ID_RACKS
+                None,  # ID_CBOLLER
+                None,  # ID_RWKITS
+                None,  # ID_ORDMAST
+                None,  # PRIOPZ
+                None,  # PREFEPZ
+                None,  # BATCH_RACKSORT
+                description,  # NOTES
+                start_date,  # START_DATE
+                end_date,  # END_DATE
+                None,  # SEQX
+                None,  # FLAGS_PROD
+                start_date,  # StartForDate
+                end_date,  # EndForDate
+                None,  # StartRealDate
+                None,  # EndRealDate
+                None,  # TimeStdUnit
+                None,  # TimeRealUnit
+                None,  # WasteStdQty
+                None,  # WasteRealQty
+                None,  # EWPOSPZ
+                None,  # ID_LASTRE
+                1,  # IS_STOCK
+                'system_user',  # LASTUSER
+                now,  # LASTDATE
+                'system_client',  # LASTCLIENT
+                'system_user',  # USERCREATE
+                now,  # DATECREATE
+                'system_client',  # CLIENTCREATE
+                None,  # ID_ITEMS_PARENT
+                None,  # EXTERNAL_ID_ITEMS
+                None,  # ROTANGLE
+                None,  # RACKCDL
+                None,  # DESTINATION
+                0,  # RACKROTATED
+                None,  # TIPOSCARICO
+                None,  # ID_DOC_BOOKED
+                None,  # ID_CBOLLER_UNLOAD
+                1,  # QUANTITY
+                None,  # RACK_X
+                None,  # RACK_Y
+                None,  # RACK_Z
+                None,  # DURATION
+                None,  # ID_RACKINSTANCE
+                None,  # ID_ITEMSDBASE
+                None,  # TIPO_ITEM
+                item_code,  # GMCQ_BARCODE
+                0,  # Excluded
+                None  # Excluded_REASON
             )
-        """
-
-        now = now_datetime()
-        data = (
-            9999,  # ID_ITEMS
-            None,  # ID_DBASEORDINI
-            1,  # PROGR
-            None,  # ID_COMMESSE
-            'NEW',  # STATO
-            None,  # RACK
-            None,  # RACKSORT
-            None,  # ID_WORKS
-            0,  # ELAB
-            None,  # PROGRELAB
-            None,  # POSPZ
-            None,  # RACKNO
-            None,  # SIDENO
-            None,  # STACKNO
-            None,  # X
-            None,  # Y
-            None,  # Z
-            None,  # ID_RACKS
-            None,  # ID_CBOLLER
-            None,  # ID_RWKITS
-            None,  # ID_ORDMAST
-            None,  # PRIOPZ
-            None,  # PREFEPZ
-            None,  # BATCH_RACKSORT
-            description,  # NOTES
-            start_date,  # START_DATE
-            end_date,  # END_DATE
-            None,  # SEQX
-            None,  # FLAGS_PROD
-            start_date,  # StartForDate
-            end_date,  # EndForDate
-            None,  # StartRealDate
-            None,  # EndRealDate
-            None,  # TimeStdUnit
-            None,  # TimeRealUnit
-            None,  # WasteStdQty
-            None,  # WasteRealQty
-            None,  # EWPOSPZ
-            None,  # ID_LASTRE
-            1,  # IS_STOCK
-            'system_user',  # LASTUSER
-            now,  # LASTDATE
-            'system_client',  # LASTCLIENT
-            'system_user',  # USERCREATE
-            now,  # DATECREATE
-            'system_client',  # CLIENTCREATE
-            None,  # ID_ITEMS_PARENT
-            None,  # EXTERNAL_ID_ITEMS
-            None,  # ROTANGLE
-            None,  # RACKCDL
-            None,  # DESTINATION
-            0,  # RACKROTATED
-            None,  # TIPOSCARICO
-            None,  # ID_DOC_BOOKED
-            None,  # ID_CBOLLER_UNLOAD
-            1,  # QUANTITY
-            None,  # RACK_X
-            None,  # RACK_Y
-            None,  # RACK_Z
-            None,  # DURATION
-            None,  # ID_RACKINSTANCE
-            None,  # ID_ITEMSDBASE
-            None,  # TIPO_ITEM
-            item_code,  # GMCQ_BARCODE
-            0,  # Excluded
-            None  # Excluded_REASON
-        )
-
-        # Execute the insert query
-        cursor.execute(insert_query, data)
-        conn.commit()
-        print("Insert committed successfully.")
-
-        # Close the connection
-        cursor.close()
-        conn.close()
+
+            # Execute the insert query
+            cursor.execute(insert_query, data)
+            conn.commit()
+            print("Insert committed successfully.")
+
+            # Close the connection
+            cursor.close()
 
         return {"message": "Item inserted successfully"}
 
@@ -283,61 +349,46 @@ def insert_item_to_external_db(item_name, description, item_code, start_date=Non
         frappe.log_error(f"Error while inserting item: {str(e)}", "Insert Item to External DB")
         return f"Error: {str(e)}"
 
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
-
-import pymssql
-import frappe
-from frappe.utils import now_datetime
 
 @frappe.whitelist()
 def insert_customer_to_external_db(code, description, address, city, province, email, telephone, vat_ex):
     try:
-        # Connection parameters
-        server = "196.200.26.2"
-        port = "1433"
-        username = "sa"
-        password = "123@impala"
-        database = "CONNECTOR_ORDERS"
-
-        # Connect to the MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
-
-        # SQL insert query (remove the IDENTITY column 'id')
-        insert_query = """
-            INSERT INTO ERP_Customers (
-                Code, Description, Address, City, Province, Email, Telephone, VatEx,
-                ID_OPERATIONS, TimeStamp
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+        # Connect to the Optima database configured in Optima Settings
+        with get_optima_connection() as conn:
+            cursor = conn.cursor()
+
+            # SQL insert query (remove the IDENTITY column 'id')
+            insert_query = """
+                INSERT INTO ERP_Customers (
+                    Code, Description, Address, City, Province, Email, Telephone, VatEx,
+                    ID_OPERATIONS, TimeStamp
+                ) VALUES (
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                )
+            """
+
+            # Static data and provided values
+            now = now_datetime()
+            data = (
+                code,
+                description,
+                address,
+                city,
+                province,
+                email,
+                telephone,
+                vat_ex,
+                1,  # ID_OPERATIONS (example value)
+                now  # TimeStamp
             )
-        """
-
-        # Static data and provided values
-        now = now_datetime()
-        data = (
-            code,
-            description,
-            address,
-            city,
-            province,
-            email,
-            telephone,
-            vat_ex,
-            1,  # ID_OPERATIONS (example value)
-            now  # TimeStamp
-        )
-
-        # Execute the insert query
-        cursor.execute(insert_query, data)
-        conn.commit()
-        print("Insert committed successfully.")
-
-        # Close the connection
-        cursor.close()
-        conn.close()
+
+            # Execute the insert query
+            cursor.execute(insert_query, data)
+            conn.commit()
+            print("Insert committed successfully.")
+
+            # Close the connection
+            cursor.close()
 
         return {"message": "Customer inserted successfully"}
 
@@ -345,63 +396,46 @@ def insert_customer_to_external_db(code, description, address, city, province, e
         frappe.log_error(f"Error while inserting customer: {str(e)}", "Insert Customer to External DB")
         return {"error": str(e)}
 
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
-
-import pymssql
-import frappe
-from frappe.utils import now_datetime
 
 @frappe.whitelist()
 def insert_sales_order_to_external_tables():
     try:
-        # Connection parameters
-        server = "196.200.26.2"
-        port = "1433"
-        username = "sa"
-        password = "123@impala"
-        database = "CONNECTOR_ORDERS"
-
-        # Connect to the MS SQL database
-        conn = pymssql.connect(server=server, port=port, user=username, password=password, database=database)
-        cursor = conn.cursor()
-
-        # Insert into OPTIMA_Orders
-        insert_order_query = """
-            INSERT INTO OPTIMA_Orders (
-                CLIENTE, DATAORD, DESCR1_SPED, DESCR_TIPICAUDOC, NAZIONI_CODICE, RIF, DEF, statoordine, ID_ORDINI
-            )
-            VALUES (
-                123, GETDATE(), 'Static Description', 'Static Document Description', 'CTY', 'Ref123', 'D', 'O', 1001  -- Adjust ID_ORDINI if necessary
-            )
-        """
-        cursor.execute(insert_order_query)
-
-        # Retrieve the last inserted ID if needed for future linkage (can replace ID_ORDINI with 1001)
-        cursor.execute("SELECT @@IDENTITY")
-        last_inserted_id = cursor.fetchone()[0]
-
-        # Insert into OPTIMA_Orderlines with matching ID_ORDINI
-        insert_orderline_query = """
-            INSERT INTO OPTIMA_Orderlines (
-                ID_ORDINI, ID_ORDMAST, RIGA, DESCMAT, QTAPZ, DESCR_MAT_COMP, COD_ART_CLIENTE
-            )
-            VALUES (%s, %s, 1, 'Static Item Description', 10, 'Static Material Description', 'ClientCode123')
-        """
-        cursor.execute(insert_orderline_query, (1001, last_inserted_id))  # Matching ID_ORDINI (1001) with the OPTIMA_Orders entry
-
-        # Insert into OPTIMA_OrderTimes
-        insert_ordertimes_query = """
-            INSERT INTO OPTIMA_Bom (ID_ORDMAST, RIGA,ID_ORDINI)
-            VALUES (%s, 1,1001)
-        """
-        cursor.execute(insert_ordertimes_query, (last_inserted_id,))
-
-        # Commit the transaction
-        conn.commit()
-        cursor.close()
-        conn.close()
+        # Connect to the Optima database configured in Optima Settings
+        with get_optima_connection() as conn:
+            cursor = conn.cursor()
+
+            # Insert into OPTIMA_Orders
+            last_inserted_id = insert_order_header(cursor, {
+                "CLIENTE": 123,
+                "DATAORD": now_datetime(),
+                "DESCR1_SPED": 'Static Description',
+                "DESCR_TIPICAUDOC": 'Static Document Description',
+                "NAZIONI_CODICE": 'CTY',
+                "RIF": 'Ref123',
+                "DEF": 'D',
+                "statoordine": 'O',
+                "ID_ORDINI": 1001  # Adjust ID_ORDINI if necessary
+            })
+
+            # Insert into OPTIMA_Orderlines with matching ID_ORDINI
+            insert_orderline_query = """
+                INSERT INTO OPTIMA_Orderlines (
+                    ID_ORDINI, ID_ORDMAST, RIGA, DESCMAT, QTAPZ, DESCR_MAT_COMP, COD_ART_CLIENTE
+                )
+                VALUES (%s, %s, 1, 'Static Item Description', 10, 'Static Material Description', 'ClientCode123')
+            """
+            cursor.execute(insert_orderline_query, (1001, last_inserted_id))  # Matching ID_ORDINI (1001) with the OPTIMA_Orders entry
+
+            # Insert into OPTIMA_OrderTimes
+            insert_ordertimes_query = """
+                INSERT INTO OPTIMA_Bom (ID_ORDMAST, RIGA,ID_ORDINI)
+                VALUES (%s, 1,1001)
+            """
+            cursor.execute(insert_ordertimes_query, (last_inserted_id,))
+
+            # Commit the transaction
+            conn.commit()
+            cursor.close()
 
         return {"message": "Sales order and related records inserted successfully"}
 
@@ -409,7 +443,3 @@ def insert_sales_order_to_external_tables():
         frappe.log_error(f"Error while inserting sales order: {str(e)}", "Insert Sales Order to External Tables")
         return {"error": str(e)}
 
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
-
@@ -3,6 +3,9 @@
 
 # import frappe
 from frappe.tests import IntegrationTestCase, UnitTestCase
+from optima.optima.doctype.external_database_viewer.external_database_viewer import fetch_latest_items
+from optima.optima.tests.utils import FakeOptimaTestCase
+from optima.optima.utils import fake_mssql
 
 
 # On IntegrationTestCase, the doctype test records and all
@@ -28,3 +31,34 @@ class TestExternalDatabaseViewer(IntegrationTestCase):
 	"""
 
 	pass
+
+
+class TestFetchLatestItems(FakeOptimaTestCase):
+	def setUp(self):
+		super().setUp()
+		fake_mssql.seed_master_data(items=12, customers=0)
+
+	def fetch_page(self, table, cursor=None):
+		return fetch_latest_items("optima-test", None, "test", "test", None, table, page_size=5, cursor=cursor)
+
+	def test_pages_follow_the_primary_key(self):
+		codes = []
+		pages = 0
+		cursor = None
+		while True:
+			page = self.fetch_page("ITEMS", cursor)
+			self.assertEqual(page["mode"], "keyset")
+			codes += [row[page["columns"].index("GMCQ_BARCODE")] for row in page["items"]]
+			pages += 1
+			cursor = page["next_cursor"]
+			if not cursor:
+				break
+
+		self.assertEqual(pages, 3)
+		self.assertEqual(codes, [f"FAKE-ART-{idx:06d}" for idx in range(12, 0, -1)])
+
+	def test_schema_qualified_table_name(self):
+		page = self.fetch_page("dbo.ITEMS")
+
+		self.assertNotIn("error", page)
+		self.assertEqual(len(page["items"]), 5)
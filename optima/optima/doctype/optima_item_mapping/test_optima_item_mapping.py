@@ -0,0 +1,76 @@
+# Copyright (c) 2026, Ronoh and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from unittest.mock import patch
+from optima.optima.utils.sync import create_in_bulk, make_item_docs
+
+
+class TestOptimaItemMapping(FrappeTestCase):
+	def setUp(self):
+		if not frappe.db.exists("Item Group", "Products"):
+			frappe.get_doc({
+				"doctype": "Item Group",
+				"item_group_name": "Products",
+				"parent_item_group": "All Item Groups"
+			}).insert(ignore_permissions=True)
+		self.prefix = f"_Test Optima {frappe.generate_hash(length=6)}"
+
+	def tearDown(self):
+		frappe.db.delete("Optima Item Mapping", {"name": ["like", f"{self.prefix}%"]})
+		frappe.db.delete("Item", {"name": ["like", f"{self.prefix}%"]})
+		frappe.db.commit()
+
+	def make_records(self, count):
+		return [
+			frappe._dict(ItemCode=f"{self.prefix}-{idx}", Description=f"Bulk article {idx}")
+			for idx in range(count)
+		]
+
+	def test_create_in_bulk_writes_mappings_in_one_insert(self):
+		records = self.make_records(3)
+
+		with patch.object(frappe.db, "bulk_insert", wraps=frappe.db.bulk_insert) as bulk_insert:
+			created, failed = create_in_bulk(records, make_item_docs)
+
+		self.assertEqual((created, failed), (3, []))
+		bulk_insert.assert_called_once()
+		doctype, fields, values = bulk_insert.call_args.args[:3]
+		self.assertEqual(doctype, "Optima Item Mapping")
+		self.assertEqual(len(values), 3)
+
+		for record in records:
+			self.assertTrue(frappe.db.exists("Item", record.ItemCode))
+			self.assertEqual(
+				frappe.db.get_value("Optima Item Mapping", record.ItemCode, "erpnext_item_code"),
+				record.ItemCode
+			)
+
+	def test_create_in_bulk_skips_only_the_failing_record(self):
+		records = self.make_records(3)
+		# An Item without a mapping makes the second record's Item insert fail
+		make_item_docs(records[1])[0].insert(ignore_permissions=True)
+
+		created, failed = create_in_bulk(records, make_item_docs)
+
+		self.assertEqual((created, failed), (2, [records[1]]))
+		self.assertTrue(frappe.db.exists("Optima Item Mapping", records[0].ItemCode))
+		self.assertFalse(frappe.db.exists("Optima Item Mapping", records[1].ItemCode))
+		self.assertTrue(frappe.db.exists("Optima Item Mapping", records[2].ItemCode))
+
+	def test_failed_mapping_leaves_no_item_behind(self):
+		records = self.make_records(3)
+		# A stale mapping makes the chunk's mapping insert fail on the second record
+		frappe.get_doc({
+			"doctype": "Optima Item Mapping",
+			"optima_item_code": records[1].ItemCode,
+			"erpnext_item_code": records[1].ItemCode
+		}).insert(ignore_permissions=True, ignore_links=True)
+
+		created, failed = create_in_bulk(records, make_item_docs)
+
+		self.assertEqual((created, failed), (2, [records[1]]))
+		self.assertTrue(frappe.db.exists("Item", records[0].ItemCode))
+		self.assertFalse(frappe.db.exists("Item", records[1].ItemCode))
+		self.assertTrue(frappe.db.exists("Optima Item Mapping", records[2].ItemCode))
@@ -0,0 +1,108 @@
+# Copyright (c) 2026, Ronoh and Contributors
+# See license.txt
+
+import frappe
+from redis.exceptions import LockNotOwnedError
+from unittest.mock import patch
+from optima.optima.tests.utils import FakeOptimaTestCase, make_test_sales_order
+from optima.optima.utils import fake_mssql
+from optima.optima.utils.outbox import (
+	DISPATCH_LOCK_TIMEOUT,
+	MAX_OUTBOX_ATTEMPTS,
+	dispatch_batch,
+	dispatch_outbox,
+	enqueue_outbox_dispatch
+)
+
+test_dependencies = ["Sales Order"]
+
+
+class TestOptimaOutbox(FakeOptimaTestCase):
+	def make_entry(self, attempts=0):
+		sales_order = make_test_sales_order(lines=1)
+		frappe.get_doc({
+			"doctype": "Optima Outbox",
+			"sales_order": sales_order.name,
+			"status": "Pending",
+			"attempts": attempts
+		}).insert(ignore_permissions=True)
+		return frappe.get_all(
+			"Optima Outbox",
+			filters={"sales_order": sales_order.name},
+			fields=["name", "sales_order", "attempts"]
+		)[0]
+
+	def get_entry(self, entry):
+		return frappe.db.get_value("Optima Outbox", entry.name, ["status", "attempts", "last_error"], as_dict=True)
+
+	def assert_parked(self, entries):
+		for entry in entries:
+			self.assertEqual(self.get_entry(entry).status, "Pending")
+			self.assertEqual(self.get_entry(entry).attempts, 0)
+
+	def test_pushed_entry_is_completed(self):
+		entry = self.make_entry()
+
+		self.assertEqual(dispatch_batch([entry]), {"completed": 1, "failed": 0, "parked": 0})
+		self.assertEqual(self.get_entry(entry).status, "Completed")
+		self.assertEqual(self.count_pushed_orders(entry.sales_order), 1)
+
+	def test_unreachable_server_parks_entries_without_using_an_attempt(self):
+		entries = [self.make_entry(), self.make_entry()]
+
+		with patch(
+			"optima.optima.utils.outbox.get_optima_connection",
+			side_effect=fake_mssql.OperationalError("Login timeout expired")
+		):
+			self.assertEqual(dispatch_batch(entries), {"completed": 0, "failed": 0, "parked": 2})
+
+		self.assert_parked(entries)
+
+	def test_connection_lost_mid_batch_parks_the_rest(self):
+		entries = [self.make_entry(), self.make_entry(), self.make_entry()]
+
+		def drop_connection(doc, conn=None):
+			conn.close()
+			raise fake_mssql.OperationalError("Connection reset by peer")
+
+		with patch("optima.optima.utils.outbox.sync_sales_order_to_optima", side_effect=drop_connection):
+			self.assertEqual(dispatch_batch(entries), {"completed": 0, "failed": 0, "parked": 3})
+
+		self.assert_parked(entries)
+
+	def test_rejected_order_uses_an_attempt(self):
+		entry = self.make_entry()
+
+		with patch(
+			"optima.optima.utils.outbox.sync_sales_order_to_optima",
+			side_effect=frappe.ValidationError("Rejected by Optima")
+		):
+			self.assertEqual(dispatch_batch([entry]), {"completed": 0, "failed": 1, "parked": 0})
+
+		saved = self.get_entry(entry)
+		self.assertEqual((saved.status, saved.attempts), ("Pending", 1))
+		self.assertEqual(saved.last_error, "Rejected by Optima")
+
+	def test_entry_fails_after_its_last_attempt(self):
+		entry = self.make_entry(attempts=MAX_OUTBOX_ATTEMPTS - 1)
+
+		with patch(
+			"optima.optima.utils.outbox.sync_sales_order_to_optima",
+			side_effect=frappe.ValidationError("Rejected by Optima")
+		):
+			dispatch_batch([entry])
+
+		saved = self.get_entry(entry)
+		self.assertEqual((saved.status, saved.attempts), ("Failed", MAX_OUTBOX_ATTEMPTS))
+
+	def test_scheduled_flush_runs_on_the_long_queue_within_the_lock(self):
+		with patch("optima.optima.utils.outbox.frappe.enqueue") as enqueue:
+			enqueue_outbox_dispatch()
+
+		kwargs = enqueue.call_args.kwargs
+		self.assertEqual((kwargs["queue"], kwargs["timeout"]), ("long", DISPATCH_LOCK_TIMEOUT))
+
+	def test_expired_dispatch_lock_is_not_an_error(self):
+		# The lock ran out while the flush was still going
+		with patch("redis.lock.Lock.release", side_effect=LockNotOwnedError("Cannot release a lock that's no longer owned")):
+			self.assertIn("completed", dispatch_outbox(force=True))
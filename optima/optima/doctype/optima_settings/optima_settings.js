@@ -86,9 +86,13 @@ frappe.ui.form.on("Optima Settings", {
 												<div class="table-item">
 													<div class="table-header">
 														<span class="collapse-indicator">▶</span>
-														<span class="table-name">${table}</span>
+														<span class="table-name">${table.table_name}</span>
+														<span class="table-stats" title="${table.last_modified ? __('Last modified {0}', [table.last_modified]) : ''}">
+															${__('~{0} rows', [format_number(table.row_count, null, 0)])}
+															· ${formatTableSize(table.used_kb)} / ${formatTableSize(table.reserved_kb)}
+														</span>
 														<button class="btn btn-xs btn-default show-fields"
-															data-table="${table}">Show Fields</button>
+															data-table="${table.table_name}">Show Fields</button>
 													</div>
 													<div class="table-fields" style="display: none;"></div>
 												</div>`;
@@ -148,6 +152,19 @@ frappe.ui.form.on("Optima Settings", {
 			});
 		});
 
+		frm.add_custom_button(__('Refresh Schema Cache'), function() {
+			frappe.call({
+				method: 'refresh_schema_cache',
+				doc: frm.doc,
+				callback: function() {
+					frappe.show_alert({
+						message: __('Schema will be read again from the Optima server'),
+						indicator: 'green'
+					});
+				}
+			});
+		});
+
 		frm.add_custom_button(__('Dump Database Schema'), function() {
 			let d = new frappe.ui.Dialog({
 				title: 'Select Database to Dump',
@@ -158,32 +175,56 @@ frappe.ui.form.on("Optima Settings", {
 						fieldtype: 'Select',
 						options: [],
 						reqd: 1
+					},
+					{
+						label: 'Compress (gzip)',
+						fieldname: 'compress',
+						fieldtype: 'Check'
 					}
 				],
 				primary_action_label: 'Dump Schema',
 				primary_action(values) {
+					// The dump runs in the background and reports back over realtime
+					frappe.realtime.off('optima_schema_dump_done');
+					frappe.realtime.on('optima_schema_dump_done', function(result) {
+						frappe.realtime.off('optima_schema_dump_done');
+						frappe.hide_progress();
+						if (result.success) {
+							// Download the generated file
+							window.open(result.file_url);
+							frappe.msgprint({
+								title: __('Success'),
+								indicator: 'green',
+								message: __('Database schema has been generated successfully.')
+							});
+						} else {
+							frappe.msgprint({
+								title: __('Failed'),
+								indicator: 'red',
+								message: result.message || __('Failed to generate database schema.')
+							});
+						}
+					});
+
 					frappe.call({
 						method: 'dump_database_schema',
 						doc: frm.doc,
 						args: {
-							database: values.database
+							database: values.database,
+							compress: values.compress
 						},
-						freeze: true,
-						freeze_message: __('Generating database schema...'),
 						callback: function(r) {
 							if (r.message && r.message.success) {
-								// Download the generated file
-								window.open(r.message.file_url);
-								frappe.msgprint({
-									title: __('Success'),
-									indicator: 'green',
-									message: __('Database schema has been generated successfully.')
+								frappe.show_alert({
+									message: __('Generating database schema in the background...'),
+									indicator: 'blue'
 								});
 							} else {
+								frappe.realtime.off('optima_schema_dump_done');
 								frappe.msgprint({
 									title: __('Failed'),
 									indicator: 'red',
-									message: r.message.message || __('Failed to generate database schema.')
+									message: (r.message && r.message.message) || __('Failed to generate database schema.')
 								});
 							}
 							d.hide();
@@ -206,6 +247,80 @@ frappe.ui.form.on("Optima Settings", {
 			d.show();
 		}).addClass('btn-primary');
 
+		frm.add_custom_button(__('Export Table Data'), function() {
+			let d = new frappe.ui.Dialog({
+				title: 'Export Table Data',
+				fields: [
+					{
+						label: 'Table',
+						fieldname: 'table',
+						fieldtype: 'Data',
+						description: 'e.g. ITEMS or dbo.OPTIMA_Orders',
+						reqd: 1
+					},
+					{
+						label: 'Database',
+						fieldname: 'database',
+						fieldtype: 'Data',
+						default: frm.doc.database_name
+					},
+					{
+						label: 'Format',
+						fieldname: 'file_format',
+						fieldtype: 'Select',
+						options: ['CSV', 'Parquet'],
+						default: 'CSV',
+						reqd: 1
+					}
+				],
+				primary_action_label: 'Export',
+				primary_action(values) {
+					frappe.call({
+						method: 'optima.optima.utils.export.start_export',
+						args: values,
+						callback: function(r) {
+							if (!r.message) return;
+							let export_id = r.message;
+							d.hide();
+
+							frappe.realtime.on('optima_export_done', function handler(result) {
+								if (result.export_id !== export_id) return;
+								frappe.realtime.off('optima_export_done', handler);
+								frappe.hide_progress();
+								if (result.status === 'Completed') {
+									window.open(result.file_url);
+								}
+								frappe.msgprint({
+									title: __('Export {0}', [result.status]),
+									indicator: result.status === 'Completed' ? 'green' : 'red',
+									message: result.status === 'Failed'
+										? result.message
+										: __('{0} rows at {1} rows/s', [result.rows, result.rows_per_second || 0])
+								});
+							});
+
+							frappe.msgprint({
+								title: __('Exporting {0}', [values.table]),
+								indicator: 'blue',
+								message: __('The export runs in the background and the file opens when it is done.'),
+								primary_action: {
+									label: __('Cancel Export'),
+									action() {
+										frappe.call({
+											method: 'optima.optima.utils.export.cancel_export',
+											args: { export_id: export_id }
+										});
+										frappe.hide_msgprint();
+									}
+								}
+							});
+						}
+					});
+				}
+			});
+			d.show();
+		});
+
 		// Add Insert Test Order button
 		frm.add_custom_button(__('Insert Test Order'), function() {
 			frappe.confirm(
@@ -282,6 +397,11 @@ frappe.ui.form.on("Optima Settings", {
 					color: #555;
 					flex-grow: 1;
 				}
+				.table-stats {
+					color: #6c757d;
+					font-size: 0.85em;
+					margin-right: 10px;
+				}
 				.fields-list {
 					padding: 8px 24px;
 					background: #fff;
@@ -321,3 +441,10 @@ frappe.ui.form.on("Optima Settings", {
 		}
 	}
 });
+
+// Sizes from the table stats are in KB
+function formatTableSize(kb) {
+	if (kb >= 1024 * 1024) return `${(kb / 1024 / 1024).toFixed(1)} GB`;
+	if (kb >= 1024) return `${(kb / 1024).toFixed(1)} MB`;
+	return `${kb || 0} KB`;
+}
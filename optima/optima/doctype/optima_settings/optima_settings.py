@@ -2,10 +2,18 @@
 # For license information, please see license.txt
 import frappe
 from frappe import _
-import pymssql
-from frappe.utils import cint
 from frappe.model.document import Document
+from frappe.utils import cint
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta
+from optima.optima.utils.connection import get_connection, reset_pool
+from optima.optima.utils.order_sync import insert_order_header
+from optima.optima.utils.schema_cache import get_cached_schema, invalidate_schema_cache
+from optima.optima.utils.table_stats import fetch_table_stats
+
+SCHEMA_DUMP_TIMEOUT = 30 * 60  # seconds
+SCHEMA_DUMP_FETCH_SIZE = 1000  # catalog rows read per round trip
+SCHEMA_DUMP_PROGRESS_EVERY = 25  # tables between progress updates
 
 
 class OptimaSettings(Document):
@@ -14,52 +22,71 @@ class OptimaSettings(Document):
 		if not self.port.isdigit():
 			frappe.throw("Port must be a valid number")
 
-	def get_connection(self, with_database=True):
-		"""Get MSSQL connection for Optima."""
+	def on_update(self):
+		# Pooled connections were opened with the previous credentials, and
+		# cached schema may describe the previous server
+		reset_pool()
+		invalidate_schema_cache()
+
+	@contextmanager
+	def get_connection(self, with_database=True, database=None):
+		"""Get a pooled MSSQL connection for Optima."""
 		if not self.enabled:
 			frappe.throw(_("Optima Integration is not enabled"))
-		
-		try:
-			connection_params = {
-				'server': self.server_ip,
-				'port': cint(self.port),
-				'user': self.username,
-				'password': self.get_password('password')
-			}
-			
-			# Only include database if with_database is True and database_name is set
-			if with_database and self.database_name:
-				connection_params['database'] = self.database_name
-			
-			conn = pymssql.connect(**connection_params)
-			return conn
-		except Exception as e:
-			frappe.log_error(f"Optima Connection Error: {str(e)}", "Optima Integration")
-			
-			frappe.throw(_("Could not connect to Optima database. Please check settings and try again."))
+
+		# Only include database if with_database is True and database_name is set
+		if not database and with_database:
+			database = self.database_name
+
+		with ExitStack() as stack:
+			try:
+				conn = stack.enter_context(get_connection(
+					server=self.server_ip,
+					port=self.port,
+					user=self.username,
+					password=self.get_password('password'),
+					database=database
+				))
+			except Exception as e:
+				frappe.log_error(f"Optima Connection Error: {str(e)}", "Optima Integration")
+
+				frappe.throw(_("Could not connect to Optima database. Please check settings and try again."))
+
+			yield conn
+
+	def cached_schema(self, database, obj, loader, refresh=False):
+		"""Serve a catalog lookup on the Optima server from the schema cache."""
+		return get_cached_schema(
+			self.server_ip, self.port, self.username, self.get_password('password'),
+			database, obj, loader, refresh
+		)
+
+	@frappe.whitelist()
+	def refresh_schema_cache(self):
+		"""Forget cached schema metadata for the Optima server."""
+		frappe.only_for("System Manager")
+		invalidate_schema_cache(self.server_ip, self.port)
 
 	@frappe.whitelist()
 	def test_connection(self):
 		"""Test connection to Optima database."""
 		try:
 			# First test without database
-			conn = self.get_connection(with_database=False)
-			cursor = conn.cursor()
-			cursor.execute("SELECT @@VERSION")
-			version = cursor.fetchone()
+			with self.get_connection(with_database=False) as conn:
+				cursor = conn.cursor()
+				cursor.execute("SELECT @@VERSION")
+				version = cursor.fetchone()
+				cursor.close()
 			
 			# If database name is provided, try to use it
 			database_msg = ""
 			if self.database_name:
 				try:
-					cursor.execute(f"USE {self.database_name}")
-					database_msg = f"\nSuccessfully connected to database: {self.database_name}"
+					with self.get_connection():
+						database_msg = f"\nSuccessfully connected to database: {self.database_name}"
 				except Exception as e:
 					database_msg = f"\nWarning: Could not connect to database '{self.database_name}': {str(e)}"
 			
-			cursor.close()
-			conn.close()
-			
 			return {
 				"success": True,
 				"message": f"Successfully connected to SQL Server.\nSQL Server Version: {version[0]}{database_msg}"
@@ -71,20 +98,23 @@ class OptimaSettings(Document):
 			}
 
 	@frappe.whitelist()
-	def get_databases(self):
+	def get_databases(self, refresh=0):
 		"""Get list of available databases."""
 		try:
-			conn = self.get_connection(with_database=False)
-			cursor = conn.cursor()
-			cursor.execute("""
-				SELECT name 
-				FROM sys.databases 
-				WHERE database_id > 4  -- Exclude system databases
-				ORDER BY name
-			""")
-			databases = [row[0] for row in cursor.fetchall()]
-			cursor.close()
-			conn.close()
+			def load():
+				with self.get_connection(with_database=False) as conn:
+					cursor = conn.cursor()
+					cursor.execute("""
+						SELECT name 
+						FROM sys.databases 
+						WHERE database_id > 4  -- Exclude system databases
+						ORDER BY name
+					""")
+					databases = [row[0] for row in cursor.fetchall()]
+					cursor.close()
+				return databases
+
+			databases = self.cached_schema(None, "databases", load, refresh)
 			
 			return {
 				"success": True,
@@ -97,21 +127,17 @@ class OptimaSettings(Document):
 			}
 
 	@frappe.whitelist()
-	def get_tables(self, database):
-		"""Get list of tables in specified database."""
+	def get_tables(self, database, refresh=0):
+		"""Get list of tables in specified database with approximate row counts and sizes."""
 		try:
-			conn = self.get_connection(with_database=False)
-			cursor = conn.cursor()
-			cursor.execute(f"USE {database}")
-			cursor.execute("""
-				SELECT TABLE_NAME 
-				FROM INFORMATION_SCHEMA.TABLES 
-				WHERE TABLE_TYPE = 'BASE TABLE'
-				ORDER BY TABLE_NAME
-			""")
-			tables = [row[0] for row in cursor.fetchall()]
-			cursor.close()
-			conn.close()
+			def load():
+				with self.get_connection(database=database) as conn:
+					cursor = conn.cursor()
+					tables = fetch_table_stats(cursor)
+					cursor.close()
+				return tables
+
+			tables = self.cached_schema(database, "tables", load, refresh)
 			
 			return {
 				"success": True,
@@ -124,41 +150,43 @@ class OptimaSettings(Document):
 			}
 
 	@frappe.whitelist()
-	def get_table_fields(self, database, table):
+	def get_table_fields(self, database, table, refresh=0):
 		"""Get field information for a specific table."""
 		try:
-			conn = self.get_connection(with_database=False)
-			cursor = conn.cursor()
-			cursor.execute(f"USE {database}")
-			cursor.execute("""
-				SELECT 
-					c.name AS column_name,
-					t.name AS data_type,
-					c.is_nullable,
-					CASE WHEN i.index_id IS NOT NULL AND i.is_primary_key = 1 
-						THEN 1 ELSE 0 END AS is_primary_key
-				FROM sys.columns c
-				INNER JOIN sys.types t ON c.user_type_id = t.user_type_id
-				LEFT JOIN sys.index_columns ic ON ic.object_id = c.object_id 
-					AND ic.column_id = c.column_id
-				LEFT JOIN sys.indexes i ON ic.object_id = i.object_id 
-					AND ic.index_id = i.index_id
-				WHERE c.object_id = OBJECT_ID(%s)
-				ORDER BY c.column_id
-			""", (table,))
+			def load():
+				with self.get_connection(database=database) as conn:
+					cursor = conn.cursor()
+					cursor.execute("""
+						SELECT 
+							c.name AS column_name,
+							t.name AS data_type,
+							c.is_nullable,
+							CASE WHEN i.index_id IS NOT NULL AND i.is_primary_key = 1 
+								THEN 1 ELSE 0 END AS is_primary_key
+						FROM sys.columns c
+						INNER JOIN sys.types t ON c.user_type_id = t.user_type_id
+						LEFT JOIN sys.index_columns ic ON ic.object_id = c.object_id 
+							AND ic.column_id = c.column_id
+						LEFT JOIN sys.indexes i ON ic.object_id = i.object_id 
+							AND ic.index_id = i.index_id
+						WHERE c.object_id = OBJECT_ID(%s)
+						ORDER BY c.column_id
+					""", (table,))
 			
-			fields = [
-				{
-					'name': row[0],
-					'type': row[1],
-					'is_nullable': bool(row[2]),
-					'is_primary_key': bool(row[3])
-				}
-				for row in cursor.fetchall()
-			]
+					fields = [
+						{
+							'name': row[0],
+							'type': row[1],
+							'is_nullable': bool(row[2]),
+							'is_primary_key': bool(row[3])
+						}
+						for row in cursor.fetchall()
+					]
 			
-			cursor.close()
-			conn.close()
+					cursor.close()
+				return fields
+
+			fields = self.cached_schema(database, f"fields|{table}", load, refresh)
 			
 			return {
 				"success": True,
@@ -170,42 +198,44 @@ class OptimaSettings(Document):
 				"message": f"Failed to fetch table fields: {str(e)}"
 			}
 	@frappe.whitelist()
-	def get_table_relationships(self, database, table):
+	def get_table_relationships(self, database, table, refresh=0):
 		"""Get relationships for a specific table, identifying foreign key constraints."""
 		try:
-			conn = self.get_connection(with_database=False)
-			cursor = conn.cursor()
-			cursor.execute(f"USE {database}")
-			cursor.execute("""
-				SELECT 
-					fk.name AS foreign_key_name,
-					tp.name AS parent_table,
-					cp.name AS parent_column,
-					tr.name AS referenced_table,
-					cr.name AS referenced_column
-				FROM sys.foreign_keys AS fk
-				INNER JOIN sys.foreign_key_columns AS fkc ON fk.object_id = fkc.constraint_object_id
-				INNER JOIN sys.tables AS tp ON fk.parent_object_id = tp.object_id
-				INNER JOIN sys.columns AS cp ON fkc.parent_column_id = cp.column_id AND tp.object_id = cp.object_id
-				INNER JOIN sys.tables AS tr ON fk.referenced_object_id = tr.object_id
-				INNER JOIN sys.columns AS cr ON fkc.referenced_column_id = cr.column_id AND tr.object_id = cr.object_id
-				WHERE tp.name = %s
-				ORDER BY foreign_key_name
-			""", (table,))
+			def load():
+				with self.get_connection(database=database) as conn:
+					cursor = conn.cursor()
+					cursor.execute("""
+						SELECT 
+							fk.name AS foreign_key_name,
+							tp.name AS parent_table,
+							cp.name AS parent_column,
+							tr.name AS referenced_table,
+							cr.name AS referenced_column
+						FROM sys.foreign_keys AS fk
+						INNER JOIN sys.foreign_key_columns AS fkc ON fk.object_id = fkc.constraint_object_id
+						INNER JOIN sys.tables AS tp ON fk.parent_object_id = tp.object_id
+						INNER JOIN sys.columns AS cp ON fkc.parent_column_id = cp.column_id AND tp.object_id = cp.object_id
+						INNER JOIN sys.tables AS tr ON fk.referenced_object_id = tr.object_id
+						INNER JOIN sys.columns AS cr ON fkc.referenced_column_id = cr.column_id AND tr.object_id = cr.object_id
+						WHERE tp.name = %s
+						ORDER BY foreign_key_name
+					""", (table,))
 			
-			relationships = [
-				{
-					'foreign_key_name': row[0],
-					'parent_table': row[1],
-					'parent_column': row[2],
-					'referenced_table': row[3],
-					'referenced_column': row[4]
-				}
-				for row in cursor.fetchall()
-			]
+					relationships = [
+						{
+							'foreign_key_name': row[0],
+							'parent_table': row[1],
+							'parent_column': row[2],
+							'referenced_table': row[3],
+							'referenced_column': row[4]
+						}
+						for row in cursor.fetchall()
+					]
 			
-			cursor.close()
-			conn.close()
+					cursor.close()
+				return relationships
+
+			relationships = self.cached_schema(database, f"relationships|{table}", load, refresh)
 			
 			return {
 				"success": True,
@@ -218,154 +248,72 @@ class OptimaSettings(Document):
 			}
 
 	@frappe.whitelist()
-	def dump_database_schema(self, database):
-		"""Generate a detailed schema dump of the database including tables, fields, and relationships."""
-		try:
-			conn = self.get_connection(with_database=False)
-			cursor = conn.cursor()
-			cursor.execute(f"USE {database}")
-			
-			# Get all tables
-			cursor.execute("""
-				SELECT TABLE_NAME 
-				FROM INFORMATION_SCHEMA.TABLES 
-				WHERE TABLE_TYPE = 'BASE TABLE'
-				ORDER BY TABLE_NAME
-			""")
-			tables = [row[0] for row in cursor.fetchall()]
-			
-			# Prepare the schema content
-			content = f"Database Schema: {database}\n"
-			content += "=" * 50 + "\n\n"
-			
-			for table in tables:
-				content += f"Table: {table}\n"
-				content += "-" * 50 + "\n\n"
-				
-				# Get fields
-				cursor.execute("""
-					SELECT 
-						c.name AS column_name,
-						t.name AS data_type,
-						c.max_length,
-						c.is_nullable,
-						CASE WHEN i.index_id IS NOT NULL AND i.is_primary_key = 1 
-							THEN 1 ELSE 0 END AS is_primary_key,
-						CASE WHEN i.index_id IS NOT NULL AND i.is_unique = 1 
-							THEN 1 ELSE 0 END AS is_unique
-					FROM sys.columns c
-					INNER JOIN sys.types t ON c.user_type_id = t.user_type_id
-					LEFT JOIN sys.index_columns ic ON ic.object_id = c.object_id 
-						AND ic.column_id = c.column_id
-					LEFT JOIN sys.indexes i ON ic.object_id = i.object_id 
-						AND ic.index_id = i.index_id
-					WHERE c.object_id = OBJECT_ID(%s)
-					ORDER BY c.column_id
-				""", (table,))
-				
-				content += "Fields:\n"
-				for row in cursor.fetchall():
-					flags = []
-					if row[3]: flags.append("NULL")
-					if not row[3]: flags.append("NOT NULL")
-					if row[4]: flags.append("PRIMARY KEY")
-					if row[5]: flags.append("UNIQUE")
-					
-					length_info = f"({row[2]})" if row[2] != -1 else ""
-					content += f"  - {row[0]}: {row[1]}{length_info} {' '.join(flags)}\n"
-				
-				# Get foreign keys
-				cursor.execute("""
-					SELECT 
-						fk.name AS foreign_key_name,
-						cp.name AS parent_column,
-						tr.name AS referenced_table,
-						cr.name AS referenced_column
-					FROM sys.foreign_keys AS fk
-					INNER JOIN sys.foreign_key_columns AS fkc ON fk.object_id = fkc.constraint_object_id
-					INNER JOIN sys.tables AS tp ON fk.parent_object_id = tp.object_id
-					INNER JOIN sys.columns AS cp ON fkc.parent_column_id = cp.column_id AND tp.object_id = cp.object_id
-					INNER JOIN sys.tables AS tr ON fk.referenced_object_id = tr.object_id
-					INNER JOIN sys.columns AS cr ON fkc.referenced_column_id = cr.column_id AND tr.object_id = cr.object_id
-					WHERE tp.name = %s
-					ORDER BY foreign_key_name
-				""", (table,))
-				
-				relationships = cursor.fetchall()
-				if relationships:
-					content += "\nForeign Keys:\n"
-					for rel in relationships:
-						content += f"  - {rel[0]}: {rel[1]} -> {rel[2]}.{rel[3]}\n"
-				
-				content += "\n"
-			
-			cursor.close()
-			conn.close()
-			
-			# Save the content to a file
-			filename = f"schema_{database}_{frappe.utils.now().split()[0]}.txt"
-			file_url = save_file(filename, content)
-			
-			return {
-				"success": True,
-				"file_url": file_url
-			}
-		except Exception as e:
+	def dump_database_schema(self, database, compress=0):
+		"""Queue a schema dump of the database; progress and the file URL arrive over realtime."""
+		frappe.only_for("System Manager")
+
+		job = frappe.enqueue(
+			"optima.optima.doctype.optima_settings.optima_settings.run_schema_dump",
+			queue="long",
+			timeout=SCHEMA_DUMP_TIMEOUT,
+			job_id=f"optima_schema_dump|{database}",
+			deduplicate=True,
+			database=database,
+			compress=cint(compress)
+		)
+		if not job:
 			return {
 				"success": False,
-				"message": f"Failed to generate schema: {str(e)}"
+				"message": _("A schema dump of {0} is already running").format(database)
 			}
 
+		return {
+			"success": True,
+			"queued": True
+		}
+
 	@frappe.whitelist()
 	def insert_test_order(self):
 		"""Insert a test order into Optima database."""
 		try:
-			conn = self.get_connection()
-			cursor = conn.cursor()
+			with self.get_connection() as conn:
+				cursor = conn.cursor()
 			
-			# Generate shorter unique order reference (12 chars max for ORDINE column)
-			order_ref = f"T{datetime.now().strftime('%y%m%d%H%M')}"  # e.g. T2411141023
-			
-			# Insert into OPTIMA_Orders
-			cursor.execute("""
-				INSERT INTO OPTIMA_Orders (
-					CLIENTE, RIFCLI, DATAORD, DATACONS, DEF, NOTES, ID_ORDINI,
-					DESCR_TIPICAUDOC
-				) VALUES (
-					1, %s, %s, %s, 'Y', 'Test Order', 1,
-					'TEST'
-				)
-			""", (
-				order_ref,
-				datetime.now(),
-				datetime.now() + timedelta(days=7)
-			))
+				# Generate shorter unique order reference (12 chars max for ORDINE column)
+				order_ref = f"T{datetime.now().strftime('%y%m%d%H%M')}"  # e.g. T2411141023
 			
-			# Get the ID of inserted order
-			cursor.execute("SELECT @@IDENTITY")
-			order_id = cursor.fetchone()[0]
+				# Insert into OPTIMA_Orders
+				order_id = insert_order_header(cursor, {
+					"CLIENTE": 1,
+					"RIFCLI": order_ref,
+					"DATAORD": datetime.now(),
+					"DATACONS": datetime.now() + timedelta(days=7),
+					"DEF": 'Y',
+					"NOTES": 'Test Order',
+					"ID_ORDINI": 1,
+					"DESCR_TIPICAUDOC": 'TEST'
+				})
 			
-			# Insert test order items
-			cursor.execute("""
-				INSERT INTO OPTIMA_OrderItems (
-					POSPZ, ID_UM, CODMAT, QTAPZ, DIMXPZ, DIMYPZ, 
-					SAGOMA, ORDINE, CLIENTE, DATACONS, RIFCLI,
-					NOTES, ID_ORDINI
-				) VALUES (
-					1, 1, 'GLASS001', 1, 1000.0, 2000.0,
-					'RECT', %s, '1', %s, %s,
-					'Test Item', %s
-				)
-			""", (
-				order_ref,
-				datetime.now() + timedelta(days=7),
-				order_ref,
-				order_id
-			))
+				# Insert test order items
+				cursor.execute("""
+					INSERT INTO OPTIMA_OrderItems (
+						POSPZ, ID_UM, CODMAT, QTAPZ, DIMXPZ, DIMYPZ, 
+						SAGOMA, ORDINE, CLIENTE, DATACONS, RIFCLI,
+						NOTES, ID_ORDINI
+					) VALUES (
+						1, 1, 'GLASS001', 1, 1000.0, 2000.0,
+						'RECT', %s, '1', %s, %s,
+						'Test Item', %s
+					)
+				""", (
+					order_ref,
+					datetime.now() + timedelta(days=7),
+					order_ref,
+					order_id
+				))
 			
-			conn.commit()
-			cursor.close()
-			conn.close()
+				conn.commit()
+				cursor.close()
 			
 			return {
 				"success": True,
@@ -377,17 +325,146 @@ class OptimaSettings(Document):
 				"message": f"Failed to create test order: {str(e)}"
 			}
 
-def save_file(filename, content):
-	"""Save content to a file in the site's public folder."""
+def run_schema_dump(database, compress=False):
+	"""Write a detailed schema dump of the database including tables, fields, and relationships.
+
+	Columns and foreign keys of every table come from one catalog query each,
+	and the dump is streamed to the file table by table.
+	"""
+	settings = frappe.get_single("Optima Settings")
+	user = frappe.session.user
+
+	try:
+		with settings.get_connection(database=database) as conn:
+			cursor = conn.cursor()
+
+			cursor.execute("SELECT COUNT(*) FROM sys.tables")
+			table_count = cursor.fetchone()[0]
+
+			# Get foreign keys of every table
+			cursor.execute("""
+				SELECT 
+					tp.name AS parent_table,
+					fk.name AS foreign_key_name,
+					cp.name AS parent_column,
+					tr.name AS referenced_table,
+					cr.name AS referenced_column
+				FROM sys.foreign_keys AS fk
+				INNER JOIN sys.foreign_key_columns AS fkc ON fk.object_id = fkc.constraint_object_id
+				INNER JOIN sys.tables AS tp ON fk.parent_object_id = tp.object_id
+				INNER JOIN sys.columns AS cp ON fkc.parent_column_id = cp.column_id AND tp.object_id = cp.object_id
+				INNER JOIN sys.tables AS tr ON fk.referenced_object_id = tr.object_id
+				INNER JOIN sys.columns AS cr ON fkc.referenced_column_id = cr.column_id AND tr.object_id = cr.object_id
+				ORDER BY tp.name, fk.name
+			""")
+			relationships = {}
+			for row in cursor.fetchall():
+				relationships.setdefault(row[0], []).append(row[1:])
+
+			# Get fields of every table, one row per column
+			cursor.execute("""
+				SELECT 
+					tb.name AS table_name,
+					c.name AS column_name,
+					t.name AS data_type,
+					c.max_length,
+					c.is_nullable,
+					CASE WHEN EXISTS (
+						SELECT 1 FROM sys.index_columns ic
+						INNER JOIN sys.indexes i ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+						WHERE ic.object_id = c.object_id AND ic.column_id = c.column_id AND i.is_primary_key = 1
+					) THEN 1 ELSE 0 END AS is_primary_key,
+					CASE WHEN EXISTS (
+						SELECT 1 FROM sys.index_columns ic
+						INNER JOIN sys.indexes i ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+						WHERE ic.object_id = c.object_id AND ic.column_id = c.column_id AND i.is_unique = 1
+					) THEN 1 ELSE 0 END AS is_unique
+				FROM sys.tables tb
+				INNER JOIN sys.columns c ON c.object_id = tb.object_id
+				INNER JOIN sys.types t ON c.user_type_id = t.user_type_id
+				ORDER BY tb.name, c.column_id
+			""")
+
+			filename = f"schema_{database}_{frappe.utils.now().split()[0]}.txt" + (".gz" if compress else "")
+			with open_schema_file(filename, compress) as f:
+				f.write(f"Database Schema: {database}\n")
+				f.write("=" * 50 + "\n\n")
+
+				current_table = None
+				done = 0
+				while True:
+					rows = cursor.fetchmany(SCHEMA_DUMP_FETCH_SIZE)
+					if not rows:
+						break
+
+					for row in rows:
+						if row[0] != current_table:
+							if current_table is not None:
+								write_table_relationships(f, relationships.get(current_table))
+								done += 1
+								if done % SCHEMA_DUMP_PROGRESS_EVERY == 0:
+									publish_dump_progress(database, done, table_count)
+
+							current_table = row[0]
+							f.write(f"Table: {current_table}\n")
+							f.write("-" * 50 + "\n\n")
+							f.write("Fields:\n")
+
+						flags = []
+						if row[4]: flags.append("NULL")
+						if not row[4]: flags.append("NOT NULL")
+						if row[5]: flags.append("PRIMARY KEY")
+						if row[6]: flags.append("UNIQUE")
+
+						length_info = f"({row[3]})" if row[3] != -1 else ""
+						f.write(f"  - {row[1]}: {row[2]}{length_info} {' '.join(flags)}\n")
+
+				if current_table is not None:
+					write_table_relationships(f, relationships.get(current_table))
+					done += 1
+
+			cursor.close()
+
+		publish_dump_progress(database, done, table_count)
+		result = {
+			"success": True,
+			"database": database,
+			"file_url": f"/files/{filename}"
+		}
+	except Exception as e:
+		frappe.log_error(frappe.get_traceback(), "Optima Schema Dump")
+		result = {
+			"success": False,
+			"database": database,
+			"message": f"Failed to generate schema: {str(e)}"
+		}
+
+	frappe.publish_realtime("optima_schema_dump_done", result, user=user)
+	return result
+
+def write_table_relationships(f, relationships):
+	if relationships:
+		f.write("\nForeign Keys:\n")
+		for rel in relationships:
+			f.write(f"  - {rel[0]}: {rel[1]} -> {rel[2]}.{rel[3]}\n")
+	f.write("\n")
+
+def publish_dump_progress(database, done, total):
+	frappe.publish_progress(
+		done * 100 / (total or 1),
+		title=_("Dumping schema of {0}").format(database),
+		description=_("{0} of {1} tables").format(done, total)
+	)
+
+def open_schema_file(filename, compress=False):
+	"""Open a file in the site's public folder for writing, gzip-compressed if asked."""
 	from frappe.utils import get_files_path
+	import gzip
 	import os
 	
 	# Create the file path
 	file_path = os.path.join(get_files_path(), filename)
 	
-	# Write the content to the file
-	with open(file_path, 'w') as f:
-		f.write(content)
-	
-	# Return the URL to access the file
-	return f"/files/{filename}"
+	if compress:
+		return gzip.open(file_path, 'wt', encoding='utf-8')
+	return open(file_path, 'w', encoding='utf-8')
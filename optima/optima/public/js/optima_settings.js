@@ -29,7 +29,7 @@ frappe.ui.form.on('Optima Settings', {
                 callback: function(r) {
                     if (r.message.success) {
                         frappe.show_alert({
-                            message: __('Items synced successfully'),
+                            message: r.message.message,
                             indicator: 'green'
                         });
                     } else {
@@ -47,7 +47,7 @@ frappe.ui.form.on('Optima Settings', {
                 callback: function(r) {
                     if (r.message.success) {
                         frappe.show_alert({
-                            message: __('Customers synced successfully'),
+                            message: r.message.message,
                             indicator: 'green'
                         });
                     } else {
@@ -56,5 +56,49 @@ frappe.ui.form.on('Optima Settings', {
                 }
             });
         }, __('Sync'));
+
+        frm.add_custom_button(__('Flush Order Outbox'), function() {
+            frappe.call({
+                method: 'optima.optima.utils.outbox.flush_outbox'
+            });
+        }, __('Sync'));
+
+        showCircuitState(frm);
     }
-}); 
\ No newline at end of file
+});
+
+function showCircuitState(frm) {
+    frappe.call({
+        method: 'optima.optima.utils.circuit_breaker.get_circuit_state',
+        callback: function(r) {
+            if (!r.message) return;
+
+            const circuit = r.message;
+            if (circuit.state === 'Closed') {
+                frm.dashboard.set_headline_alert(
+                    __('Optima connection circuit: Closed'), 'green'
+                );
+                return;
+            }
+
+            const retry_at = frappe.datetime.str_to_user(
+                frappe.datetime.get_datetime_as_string(new Date(circuit.retry_at * 1000))
+            );
+            frm.dashboard.set_headline_alert(
+                circuit.state === 'Open'
+                    ? __('Optima connection circuit: Open after {0} failed connects. Next attempt at {1}.', [circuit.failures, retry_at])
+                    : __('Optima connection circuit: Half-Open, waiting for a test connection to succeed.'),
+                circuit.state === 'Open' ? 'red' : 'orange'
+            );
+
+            frm.add_custom_button(__('Reset Circuit Breaker'), function() {
+                frappe.call({
+                    method: 'optima.optima.utils.circuit_breaker.reset_circuit',
+                    callback: function() {
+                        frm.reload_doc();
+                    }
+                });
+            });
+        }
+    });
+} 
\ No newline at end of file
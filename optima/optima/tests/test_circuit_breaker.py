@@ -0,0 +1,68 @@
+import frappe
+import time
+from frappe.tests.utils import FrappeTestCase
+from unittest.mock import patch
+from optima.optima.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class TestCircuitBreaker(FrappeTestCase):
+	def setUp(self):
+		self.circuit = CircuitBreaker(f"optima-test-{frappe.generate_hash(length=6)}", failure_threshold=2, reset_timeout=60)
+
+	def tearDown(self):
+		self.circuit.reset()
+
+	def state(self):
+		return self.circuit.get_state()["state"]
+
+	def open_circuit(self):
+		for _attempt in range(self.circuit.failure_threshold):
+			self.circuit.record_failure()
+
+	def after_reset_timeout(self):
+		return patch(
+			"optima.optima.utils.circuit_breaker.time.time",
+			return_value=time.time() + self.circuit.reset_timeout + 1
+		)
+
+	def test_opens_after_consecutive_failures(self):
+		self.circuit.record_failure()
+		self.assertEqual(self.state(), "Closed")
+		self.circuit.before_call()
+
+		self.circuit.record_failure()
+		self.assertEqual(self.state(), "Open")
+		self.assertTrue(self.circuit.is_open())
+		self.assertRaises(CircuitOpenError, self.circuit.before_call)
+
+	def test_success_resets_the_failure_count(self):
+		self.circuit.record_failure()
+		self.circuit.record_success()
+		self.circuit.record_failure()
+
+		self.assertEqual(self.state(), "Closed")
+		self.assertEqual(self.circuit.get_state()["failures"], 1)
+
+	def test_half_open_lets_a_single_probe_through(self):
+		self.open_circuit()
+
+		with self.after_reset_timeout():
+			self.assertEqual(self.state(), "Half-Open")
+			self.circuit.before_call()
+			# Everyone else keeps failing fast while the probe is out
+			self.assertRaises(CircuitOpenError, self.circuit.before_call)
+			self.circuit.record_success()
+
+		self.assertEqual(self.state(), "Closed")
+		self.assertEqual(self.circuit.get_state()["failures"], 0)
+		self.circuit.before_call()
+
+	def test_failed_probe_opens_the_circuit_again(self):
+		self.open_circuit()
+
+		with self.after_reset_timeout():
+			self.circuit.before_call()
+			self.circuit.record_failure()
+
+			self.assertEqual(self.state(), "Open")
+			self.assertRaises(CircuitOpenError, self.circuit.before_call)
@@ -0,0 +1,122 @@
+import frappe
+import time
+from unittest.mock import patch
+from optima.optima.tests.utils import FakeOptimaTestCase
+from optima.optima.utils import fake_mssql
+from optima.optima.utils.circuit_breaker import get_circuit_breaker
+from optima.optima.utils.connection import POOL_PROBE_INTERVAL, OptimaConnectionPool, open_connection
+
+POOL_PARAMS = {"server": "optima-test", "user": "test", "password": "test", "autocommit": False}
+
+
+class TestOptimaConnectionPool(FakeOptimaTestCase):
+	def setUp(self):
+		super().setUp()
+		self.pool = OptimaConnectionPool(max_size=2, idle_timeout=60)
+
+	def tearDown(self):
+		self.pool.close_all()
+		super().tearDown()
+
+	def later(self, seconds):
+		"""Pretend `seconds` have passed for the pool's clock."""
+		return patch("optima.optima.utils.connection.time.monotonic", return_value=time.monotonic() + seconds)
+
+	def test_released_connection_is_reused(self):
+		conn = self.pool.acquire(**POOL_PARAMS)
+		self.pool.release(conn)
+
+		self.assertIs(self.pool.acquire(**POOL_PARAMS), conn)
+		stats = self.pool.get_stats()
+		self.assertEqual((stats["created"], stats["reused"], stats["open"]), (1, 1, 1))
+
+	def test_checkout_times_out_when_pool_is_exhausted(self):
+		self.pool.acquire(**POOL_PARAMS)
+		self.pool.acquire(**POOL_PARAMS)
+
+		with patch("optima.optima.utils.connection.POOL_CHECKOUT_TIMEOUT", 0.1):
+			self.assertRaises(frappe.ValidationError, self.pool.acquire, **POOL_PARAMS)
+		self.assertEqual(self.pool.get_stats()["open"], 2)
+
+	def test_full_pool_hands_out_a_released_connection(self):
+		conn = self.pool.acquire(**POOL_PARAMS)
+		self.pool.acquire(**POOL_PARAMS)
+		self.pool.release(conn)
+
+		with patch("optima.optima.utils.connection.POOL_CHECKOUT_TIMEOUT", 0.1):
+			self.assertIs(self.pool.acquire(**POOL_PARAMS), conn)
+
+	def test_idle_connection_is_evicted_after_timeout(self):
+		conn = self.pool.acquire(**POOL_PARAMS)
+		self.pool.release(conn)
+
+		with self.later(self.pool.idle_timeout + 1):
+			fresh = self.pool.acquire(**POOL_PARAMS)
+
+		self.assertIsNot(fresh, conn)
+		stats = self.pool.get_stats()
+		self.assertEqual((stats["evicted"], stats["created"], stats["open"]), (1, 2, 1))
+
+	def test_recently_used_connection_is_not_probed(self):
+		conn = self.pool.acquire(**POOL_PARAMS)
+		self.pool.release(conn)
+
+		with patch("optima.optima.utils.connection._is_alive") as is_alive:
+			self.assertIs(self.pool.acquire(**POOL_PARAMS), conn)
+		is_alive.assert_not_called()
+
+	def test_dead_idle_connection_is_replaced_after_probe(self):
+		conn = self.pool.acquire(**POOL_PARAMS)
+		self.pool.release(conn)
+		# Dropped by the server while it sat in the pool
+		conn.close()
+
+		with self.later(POOL_PROBE_INTERVAL + 1):
+			fresh = self.pool.acquire(**POOL_PARAMS)
+
+		self.assertIsNot(fresh, conn)
+		stats = self.pool.get_stats()
+		self.assertEqual((stats["probe_failures"], stats["created"], stats["open"]), (1, 2, 1))
+
+	def test_connections_are_not_shared_across_parameters(self):
+		conn = self.pool.acquire(**POOL_PARAMS)
+		self.pool.release(conn)
+
+		other = self.pool.acquire(**{**POOL_PARAMS, "database": "CONNECTOR_ORDERS"})
+		self.assertIsNot(other, conn)
+
+
+class TestOpenConnection(FakeOptimaTestCase):
+	def setUp(self):
+		super().setUp()
+		self.circuit = get_circuit_breaker(POOL_PARAMS["server"])
+		self.circuit.reset()
+
+	def tearDown(self):
+		self.circuit.reset()
+		super().tearDown()
+
+	def connect_failing_with(self, error):
+		with patch.object(fake_mssql, "connect", side_effect=error):
+			self.assertRaises(type(error), open_connection, POOL_PARAMS)
+
+	def test_unreachable_server_counts_as_a_failure(self):
+		self.connect_failing_with(fake_mssql.OperationalError((20009, b"Adaptive Server is unavailable or does not exist")))
+		self.assertEqual(self.circuit.get_state()["failures"], 1)
+
+	def test_refused_login_does_not_open_the_circuit(self):
+		for _attempt in range(self.circuit.failure_threshold + 1):
+			self.connect_failing_with(fake_mssql.OperationalError((18456, b"Login failed for user 'test'.")))
+
+		state = self.circuit.get_state()
+		self.assertEqual((state["state"], state["failures"]), ("Closed", 0))
+
+	def test_connection_without_circuit_neither_trips_nor_honours_it(self):
+		for _attempt in range(self.circuit.failure_threshold):
+			self.circuit.record_failure()
+		self.assertTrue(self.circuit.is_open())
+
+		open_connection(POOL_PARAMS, use_circuit=False).close()
+		with patch.object(fake_mssql, "connect", side_effect=fake_mssql.OperationalError("unreachable")):
+			self.assertRaises(fake_mssql.OperationalError, open_connection, POOL_PARAMS, use_circuit=False)
+		self.assertEqual(self.circuit.get_state()["failures"], self.circuit.failure_threshold)
@@ -0,0 +1,26 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_files_path
+import os
+from unittest.mock import patch
+from optima.optima.utils.export import save_export_file
+
+
+class TestSaveExportFile(FrappeTestCase):
+	def test_export_larger_than_max_file_size_is_registered_without_reading_it(self):
+		file_name = f"optima_export_test_{frappe.generate_hash(length=6)}.csv"
+		file_path = get_files_path(file_name, is_private=1)
+		with open(file_path, "w") as f:
+			f.write("id\n" + "\n".join(str(idx) for idx in range(1000)))
+		self.addCleanup(os.remove, file_path)
+
+		with patch.dict(frappe.conf, {"max_file_size": 100}), patch(
+			"frappe.core.doctype.file.file.File.get_content",
+			side_effect=AssertionError("export was read into memory")
+		):
+			file_url = save_export_file(file_name, file_path)
+
+		file_doc = frappe.get_doc("File", {"file_url": file_url})
+		self.assertEqual(file_doc.file_size, os.path.getsize(file_path))
+		self.assertGreater(file_doc.file_size, 100)
+		self.assertEqual(file_doc.is_private, 1)
@@ -0,0 +1,22 @@
+import frappe
+from optima.optima.tests.utils import FakeOptimaTestCase, make_test_sales_order
+from optima.optima.utils.load_test import LOAD_TEST_PREFIX, delete_load_test_orders
+
+test_dependencies = ["Sales Order"]
+
+
+class TestLoadTestCleanup(FakeOptimaTestCase):
+	def make_tagged_order(self, run_id, idx):
+		so = make_test_sales_order(lines=1)
+		frappe.db.set_value("Sales Order", so.name, "po_no", f"{LOAD_TEST_PREFIX}-{run_id}-{idx:05d}")
+		return so.name
+
+	def test_only_the_runs_orders_are_deleted(self):
+		run_orders = [self.make_tagged_order("run1", idx) for idx in (1, 2)]
+		other_order = self.make_tagged_order("run2", 1)
+
+		self.assertEqual(delete_load_test_orders("run1"), 2)
+
+		for name in run_orders:
+			self.assertFalse(frappe.db.exists("Sales Order", name))
+		self.assertTrue(frappe.db.exists("Sales Order", other_order))
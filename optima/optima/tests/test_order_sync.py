@@ -0,0 +1,154 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from unittest.mock import patch
+from optima.optima.tests.utils import FakeOptimaTestCase, make_test_sales_order
+from optima.optima.utils import fake_mssql
+from optima.optima.utils.bulk_push import bulk_push, get_already_pushed
+from optima.optima.utils.order_sync import (
+	MAX_INSERT_PARAMS,
+	ORDER_LINE_COLUMNS,
+	compute_payload_hash,
+	get_order_item_rows,
+	insert_order_lines,
+	prepare_order_line,
+	reconcile_order_items,
+	sync_sales_order_to_optima
+)
+
+test_dependencies = ["Sales Order"]
+
+ROWS_PER_STATEMENT = MAX_INSERT_PARAMS // len(ORDER_LINE_COLUMNS)
+
+
+def make_lines(count, order_id=1001):
+	item = frappe._dict(item_code="GLASS-4MM", item_name="4mm float glass", description=None, qty=1)
+	return [prepare_order_line(idx, item, order_id) for idx in range(1, count + 1)]
+
+
+class TestInsertOrderLines(FakeOptimaTestCase):
+	def insert(self, count):
+		"""Insert `count` lines and return the parameter count of every statement sent."""
+		conn = fake_mssql.connect()
+		cursor = conn.cursor()
+		try:
+			with patch.object(cursor, "execute", wraps=cursor.execute) as execute:
+				insert_order_lines(cursor, make_lines(count))
+			conn.commit()
+		finally:
+			conn.close()
+
+		self.assertEqual(self.fake_query("SELECT COUNT(*) FROM OPTIMA_OrderLines")[0][0], count)
+		return [len(call.args[1]) for call in execute.call_args_list]
+
+	def test_lines_are_chunked_under_the_parameter_limit(self):
+		statements = self.insert(500)
+
+		self.assertEqual(len(statements), -(-500 // ROWS_PER_STATEMENT))
+		self.assertTrue(all(params < 2100 for params in statements))
+
+	def test_chunk_boundary(self):
+		self.assertEqual(len(self.insert(ROWS_PER_STATEMENT)), 1)
+
+	def test_one_line_over_the_boundary_starts_a_new_statement(self):
+		self.assertEqual(
+			self.insert(ROWS_PER_STATEMENT + 1),
+			[ROWS_PER_STATEMENT * len(ORDER_LINE_COLUMNS), len(ORDER_LINE_COLUMNS)]
+		)
+
+
+class TestPayloadHash(FrappeTestCase):
+	header = {"CLIENTE": 1, "DATAORD": "2026-01-05", "NOTES": "SAL-ORD-0001"}
+
+	def test_hash_ignores_push_assigned_fields_and_key_order(self):
+		lines = make_lines(3, order_id=None)
+		pushed = [{**line, "ID_ORDINI": 4711} for line in lines]
+
+		self.assertEqual(
+			compute_payload_hash(self.header, lines),
+			compute_payload_hash(
+				dict(reversed(list({**self.header, "RIFCLI": "S2601051200", "ID_ORDINI": 4711}.items()))),
+				pushed
+			)
+		)
+
+	def test_hash_changes_with_the_content(self):
+		lines = make_lines(3, order_id=None)
+		changed = [dict(line) for line in lines]
+		changed[1]["QTAPZ"] = 5
+
+		self.assertNotEqual(compute_payload_hash(self.header, lines), compute_payload_hash(self.header, changed))
+		self.assertNotEqual(
+			compute_payload_hash(self.header, lines),
+			compute_payload_hash({**self.header, "NOTES": "SAL-ORD-0002"}, lines)
+		)
+
+
+class TestSalesOrderPush(FakeOptimaTestCase):
+	def setUp(self):
+		super().setUp()
+		self.sales_order = make_test_sales_order(lines=3)
+
+	def test_push_writes_the_order_and_hands_it_to_the_poller(self):
+		result = sync_sales_order_to_optima(self.sales_order)
+
+		self.assertTrue(result["success"])
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 1)
+		optima_order = frappe.get_doc("Optima Order", self.sales_order.name)
+		self.assertEqual((optima_order.sync_status, optima_order.status), ("In Progress", "Pending"))
+		self.assertEqual(optima_order.optima_operation_id, str(result["order_id"]))
+		self.assertEqual(len(optima_order.items), 3)
+
+	def test_unchanged_order_is_skipped_without_connecting(self):
+		sync_sales_order_to_optima(self.sales_order)
+		logs = frappe.db.count("Optima Sync Log", {"reference_name": self.sales_order.name})
+
+		with patch("optima.optima.utils.order_sync.get_optima_connection") as connect:
+			result = sync_sales_order_to_optima(self.sales_order)
+
+		connect.assert_not_called()
+		self.assertTrue(result.get("skipped"))
+		self.assertEqual(frappe.db.count("Optima Sync Log", {"reference_name": self.sales_order.name}), logs)
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 1)
+
+	def test_changed_or_forced_order_is_pushed_again(self):
+		sync_sales_order_to_optima(self.sales_order)
+
+		sync_sales_order_to_optima(self.sales_order, force=True)
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 2)
+
+		self.sales_order.items[0].qty = 10
+		sync_sales_order_to_optima(self.sales_order)
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 3)
+
+	def test_reconcile_order_items_writes_only_the_differences(self):
+		sync_sales_order_to_optima(self.sales_order)
+		name = self.sales_order.name
+		items = get_order_item_rows(self.sales_order, "Synced")
+
+		self.assertEqual(reconcile_order_items(name, items), 0)
+
+		# One row changed, the last one dropped
+		items[1]["qty"] = 7
+		self.assertEqual(reconcile_order_items(name, items[:2]), 2)
+		rows = frappe.get_all("Optima Order Item", filters={"parent": name}, fields=["idx", "qty"], order_by="idx")
+		self.assertEqual([(row.idx, row.qty) for row in rows], [(1, items[0]["qty"]), (2, 7)])
+
+		# Every row flips to Failed and the dropped row comes back
+		self.assertEqual(reconcile_order_items(name, get_order_item_rows(self.sales_order, "Failed")), 3)
+		self.assertEqual(
+			frappe.get_all("Optima Order Item", filters={"parent": name}, pluck="optima_sync_status"),
+			["Failed"] * 3
+		)
+
+
+class TestBulkPushSelection(FakeOptimaTestCase):
+	def test_bulk_push_needs_orders_or_filters(self):
+		self.assertRaises(frappe.ValidationError, bulk_push)
+
+	def test_orders_already_in_optima_are_left_out(self):
+		new, legacy, pushed = (make_test_sales_order(lines=1) for _order in range(3))
+		# Pushed before payload hashes were kept: only the Sales Order knows
+		frappe.db.set_value("Sales Order", legacy.name, "custom_optima_order", "4711")
+		sync_sales_order_to_optima(pushed)
+
+		self.assertEqual(get_already_pushed([new.name, legacy.name, pushed.name]), {legacy.name, pushed.name})
@@ -0,0 +1,67 @@
+import frappe
+import os
+from unittest.mock import patch
+from optima.optima.tests.utils import FakeOptimaTestCase, make_test_sales_order
+from optima.optima.utils.connection import get_optima_connection
+from optima.optima.utils.order_sync import (
+	compute_payload_hash,
+	get_shipping_details,
+	prepare_order_header,
+	prepare_order_line
+)
+from optima.optima.utils.spool import has_spooled_orders, replay_batch, replay_spool, spool_order
+
+test_dependencies = ["Sales Order"]
+
+
+class TestSpoolReplay(FakeOptimaTestCase):
+	def setUp(self):
+		super().setUp()
+		patcher = patch(
+			"optima.optima.utils.spool.get_spool_folder",
+			return_value=os.path.join(self.fake_dir, "spool")
+		)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.sales_order = make_test_sales_order(lines=2)
+
+	def make_entry(self):
+		shipping_details = get_shipping_details(self.sales_order)
+		header = prepare_order_header(self.sales_order, shipping_details)
+		lines = [prepare_order_line(idx, item, None) for idx, item in enumerate(self.sales_order.items, 1)]
+		return {
+			"sales_order": self.sales_order.name,
+			"header": header,
+			"lines": lines,
+			"shipping_details": shipping_details,
+			"payload_hash": compute_payload_hash(header, lines)
+		}
+
+	def spool(self):
+		entry = self.make_entry()
+		spool_order(
+			entry["sales_order"], entry["header"], entry["lines"], entry["shipping_details"], entry["payload_hash"]
+		)
+
+	def test_spooled_order_is_pushed_once(self):
+		self.spool()
+
+		self.assertEqual(replay_spool(), {"replayed": 1})
+		self.assertFalse(has_spooled_orders())
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 1)
+		self.assertEqual(self.fake_query("SELECT COUNT(*) FROM OPTIMA_OrderLines")[0][0], 2)
+		self.assertEqual(frappe.db.get_value("Optima Order", self.sales_order.name, "sync_status"), "In Progress")
+
+		# Spooled a second time, e.g. saved again while Optima was still down
+		self.spool()
+		self.assertEqual(replay_spool(), {"replayed": 1})
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 1)
+
+	def test_replaying_a_committed_batch_again_writes_nothing(self):
+		entry = self.make_entry()
+
+		with get_optima_connection() as conn:
+			replay_batch(conn, [entry])
+			replay_batch(conn, [entry])
+
+		self.assertEqual(self.count_pushed_orders(self.sales_order.name), 1)
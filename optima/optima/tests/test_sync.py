@@ -0,0 +1,56 @@
+import frappe
+from unittest.mock import patch
+from optima.optima.tests.utils import FakeOptimaTestCase
+from optima.optima.utils import fake_mssql
+from optima.optima.utils.sync import get_watermark, sync_items
+
+
+class TestMasterDataSync(FakeOptimaTestCase):
+	def setUp(self):
+		super().setUp()
+		if not frappe.db.exists("Item Group", "Products"):
+			frappe.get_doc({
+				"doctype": "Item Group",
+				"item_group_name": "Products",
+				"parent_item_group": "All Item Groups"
+			}).insert(ignore_permissions=True)
+		self.prefix = f"_Test Optima {frappe.generate_hash(length=6)}"
+		self._watermark = get_watermark("items_watermark")
+
+	def tearDown(self):
+		frappe.db.delete("Optima Item Mapping", {"name": ["like", f"{self.prefix}%"]})
+		frappe.db.delete("Item", {"name": ["like", f"{self.prefix}%"]})
+		frappe.db.set_single_value("Optima Settings", "items_watermark", self._watermark)
+		frappe.db.commit()
+		super().tearDown()
+
+	def add_optima_items(self, count, changed="2026-10-01 08:00:00"):
+		conn = fake_mssql.connect()
+		cursor = conn.cursor()
+		for idx in range(count):
+			cursor.execute(
+				"INSERT INTO ITEMS (GMCQ_BARCODE, NOTES, LASTDATE) VALUES (%s, %s, %s)",
+				(f"{self.prefix}-{idx}", f"Article {idx}", changed)
+			)
+		conn.commit()
+		conn.close()
+
+	def test_completed_run_is_reported_and_logged(self):
+		self.add_optima_items(2)
+
+		result = sync_items()
+
+		self.assertTrue(result["success"])
+		self.assertEqual((result["created"], result["failed"], result["lookups_saved"]), (2, 0, 1))
+		self.assertIn("2 created, 0 failed, 1 mapping lookups saved", result["message"])
+		log = frappe.get_last_doc("Optima Sync Log", filters={"reference_doctype": "Item"})
+		self.assertEqual((log.status, log.message), ("Completed", result["message"]))
+
+	def test_watermark_stays_put_when_the_run_cannot_be_logged(self):
+		self.add_optima_items(1, changed="2099-01-01 00:00:00")
+
+		with patch("optima.optima.utils.sync.create_sync_log", side_effect=[frappe.ValidationError("log failed"), None]):
+			result = sync_items(delta=True)
+
+		self.assertFalse(result["success"])
+		self.assertEqual(get_watermark("items_watermark"), self._watermark)
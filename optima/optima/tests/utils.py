@@ -0,0 +1,61 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+import os
+import shutil
+import tempfile
+from optima.optima.utils import fake_mssql, id_allocator
+from optima.optima.utils.circuit_breaker import get_optima_circuit
+from optima.optima.utils.connection import reset_pool
+
+
+class FakeOptimaTestCase(FrappeTestCase):
+	"""Runs each test against an empty SQLite stand-in for the Optima server."""
+
+	def setUp(self):
+		super().setUp()
+		self.fake_dir = tempfile.mkdtemp(prefix="optima-test-")
+		self._fake_conf = frappe.conf.get("optima_fake_mssql")
+		frappe.conf.optima_fake_mssql = os.path.join(self.fake_dir, "optima.sqlite")
+
+		# Pooled connections and cached ID blocks belong to the previous test's database
+		reset_pool()
+		id_allocator._allocators.clear()
+		get_optima_circuit().reset()
+
+	def tearDown(self):
+		reset_pool()
+		id_allocator._allocators.clear()
+		frappe.conf.optima_fake_mssql = self._fake_conf
+		shutil.rmtree(self.fake_dir, ignore_errors=True)
+		super().tearDown()
+
+	def fake_query(self, query, params=None):
+		"""Run a query straight against the fake server and return its rows."""
+		conn = fake_mssql.connect()
+		try:
+			cursor = conn.cursor()
+			cursor.execute(query, params)
+			return cursor.fetchall()
+		finally:
+			conn.close()
+
+	def count_pushed_orders(self, sales_order):
+		"""OPTIMA_Orders rows written for a Sales Order."""
+		return self.fake_query("SELECT COUNT(*) FROM OPTIMA_Orders WHERE NOTES = %s", (sales_order[:64],))[0][0]
+
+
+def make_test_sales_order(lines=3):
+	"""Insert a draft Sales Order for _Test Customer with `lines` rows of _Test Item."""
+	from erpnext.selling.doctype.sales_order.test_sales_order import make_sales_order
+
+	so = make_sales_order(qty=1, do_not_save=True)
+	for qty in range(2, lines + 1):
+		so.append("items", {
+			"item_code": so.items[0].item_code,
+			"warehouse": so.items[0].warehouse,
+			"delivery_date": so.delivery_date,
+			"qty": qty,
+			"rate": 100
+		})
+	so.insert()
+	return so
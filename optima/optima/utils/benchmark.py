@@ -0,0 +1,219 @@
+import frappe
+from frappe import _
+from frappe.utils import cint
+from datetime import date
+import time
+from . import fake_mssql
+from .connection import get_optima_connection
+from .mapping import fetch_optima_customers, fetch_optima_items
+from .order_sync import (
+    ORDER_LINE_COLUMNS,
+    insert_order_header,
+    insert_order_lines,
+    prepare_order_line,
+    sync_sales_order_to_optima
+)
+from .sync import STATUS_CHECK_CHUNK_SIZE, fetch_optima_sync_statuses, sync_customers, sync_items
+
+def make_order_items(count):
+    """Build synthetic Sales Order item rows for benchmarking."""
+    return [
+        frappe._dict({
+            "item_code": f"BENCH-GLASS-{idx:04d}",
+            "item_name": f"Benchmark Glass {idx}",
+            "description": f"Benchmark float glass 4mm, pane {idx}",
+            "qty": 1 + idx % 5,
+            "width": 400 + idx % 1200,
+            "height": 600 + idx % 1800
+        })
+        for idx in range(1, count + 1)
+    ]
+
+def insert_order_lines_row_by_row(cursor, lines):
+    """Baseline: one INSERT round trip per order line."""
+    placeholders = ", ".join(["%s"] * len(ORDER_LINE_COLUMNS))
+    for line in lines:
+        cursor.execute(
+            f"INSERT INTO OPTIMA_OrderLines ({', '.join(ORDER_LINE_COLUMNS)}) VALUES ({placeholders})",
+            tuple(line[column] for column in ORDER_LINE_COLUMNS)
+        )
+
+def insert_order_lines_executemany(cursor, lines):
+    """Single executemany call over all order lines."""
+    placeholders = ", ".join(["%s"] * len(ORDER_LINE_COLUMNS))
+    cursor.executemany(
+        f"INSERT INTO OPTIMA_OrderLines ({', '.join(ORDER_LINE_COLUMNS)}) VALUES ({placeholders})",
+        [tuple(line[column] for column in ORDER_LINE_COLUMNS) for line in lines]
+    )
+
+LINE_WRITERS = {
+    "row_by_row": insert_order_lines_row_by_row,
+    "executemany": insert_order_lines_executemany,
+    "multi_row_values": insert_order_lines,
+}
+
+def benchmark_order_lines(lines=500, repeat=3):
+    """Compare order line writers against the fake Optima server.
+
+    Every run happens inside a transaction that is rolled back, so nothing is left
+    behind in OPTIMA_Orders/OPTIMA_OrderLines. Run with:
+
+        bench --site <site> execute optima.optima.utils.benchmark.benchmark_order_lines --kwargs "{'lines': 500}"
+    """
+    require_fake_backend()
+    lines, repeat = int(lines), int(repeat)
+    items = make_order_items(lines)
+    results = {}
+
+    with get_optima_connection() as conn:
+        cursor = conn.cursor()
+
+        for name, writer in LINE_WRITERS.items():
+            timings = []
+            for _run in range(repeat):
+                # Throwaway header so the lines have a parent to point at
+                order_id = insert_order_header(cursor, {
+                    "CLIENTE": 1,
+                    "RIFCLI": 'BENCH',
+                    "DATAORD": date.today(),
+                    "DEF": 'N',
+                    "NOTES": 'Benchmark',
+                    "ID_ORDINI": 1,
+                    "DESCR_TIPICAUDOC": 'BENCH'
+                })
+                order_lines = [prepare_order_line(idx, item, order_id) for idx, item in enumerate(items, 1)]
+
+                started = time.perf_counter()
+                writer(cursor, order_lines)
+                timings.append(time.perf_counter() - started)
+                conn.rollback()
+
+            best = min(timings)
+            results[name] = {
+                "best_seconds": round(best, 4),
+                "avg_seconds": round(sum(timings) / len(timings), 4),
+                "lines_per_second": round(lines / best, 1) if best else None
+            }
+
+        cursor.close()
+
+    baseline = results["row_by_row"]["best_seconds"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["best_seconds"], 2) if result["best_seconds"] else None
+
+    return {"lines": lines, "repeat": repeat, "results": results}
+
+def require_fake_backend():
+    """The benchmarks write orders, so never point them at the plant server."""
+    if not fake_mssql.is_enabled():
+        frappe.throw(_("Set optima_fake_mssql in site_config.json before running this benchmark"))
+
+def rate(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+def benchmark_order_sync(orders=20, sales_orders=None):
+    """Orders and lines per second through sync_sales_order_to_optima on the fake server.
+
+    Pushes the latest submitted Sales Orders, or the given names, with force=True
+    so the payload hash doesn't short-circuit repeat runs. The local Optima Order
+    and sync log writes are real, so run it on a test site.
+    """
+    require_fake_backend()
+
+    names = frappe.parse_json(sales_orders) if sales_orders else frappe.get_all(
+        "Sales Order",
+        filters={"docstatus": 1},
+        order_by="creation desc",
+        limit=cint(orders),
+        pluck="name"
+    )
+    if not names:
+        frappe.throw(_("No submitted Sales Orders to push"))
+
+    docs = [frappe.get_doc("Sales Order", name) for name in names]
+    lines = sum(len(doc.items) for doc in docs)
+
+    started = time.perf_counter()
+    with get_optima_connection() as conn:
+        for doc in docs:
+            sync_sales_order_to_optima(doc, conn=conn, force=True)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "orders": len(docs),
+        "lines": lines,
+        "seconds": round(elapsed, 4),
+        "orders_per_second": rate(len(docs), elapsed),
+        "lines_per_second": rate(lines, elapsed)
+    }
+
+def benchmark_status_lookup(orders=2000):
+    """Orders per second the status poller's Optima lookup resolves on the fake server.
+
+    Only the batched SELECT against OPTIMA_Orders is timed, not the local
+    updates that check_optima_sync_status makes afterwards.
+    """
+    require_fake_backend()
+
+    operation_ids = fake_mssql.seed_orders(cint(orders))
+    fake_mssql.process_orders()
+
+    started = time.perf_counter()
+    found = 0
+    with get_optima_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(operation_ids), STATUS_CHECK_CHUNK_SIZE):
+            found += len(fetch_optima_sync_statuses(cursor, operation_ids[start:start + STATUS_CHECK_CHUNK_SIZE]))
+        cursor.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "orders": len(operation_ids),
+        "found": found,
+        "seconds": round(elapsed, 4),
+        "orders_per_second": rate(len(operation_ids), elapsed)
+    }
+
+def benchmark_master_sync(items=5000, customers=1000, include_erpnext=0):
+    """Rows per second streamed from ITEMS/ERP_Customers on the fake server.
+
+    With include_erpnext=1 the full sync_items/sync_customers run is timed as
+    well, which creates real Items and Customers on this site.
+    """
+    require_fake_backend()
+    fake_mssql.seed_master_data(items=cint(items), customers=cint(customers))
+
+    results = {}
+    for name, fetch in (("items", fetch_optima_items), ("customers", fetch_optima_customers)):
+        started = time.perf_counter()
+        rows = sum(1 for _row in fetch())
+        elapsed = time.perf_counter() - started
+        results[f"fetch_{name}"] = {
+            "rows": rows,
+            "seconds": round(elapsed, 4),
+            "rows_per_second": rate(rows, elapsed)
+        }
+
+    if cint(include_erpnext):
+        for name, sync in (("items", sync_items), ("customers", sync_customers)):
+            started = time.perf_counter()
+            outcome = sync()
+            results[f"sync_{name}"] = {
+                "seconds": round(time.perf_counter() - started, 4),
+                "message": outcome.get("message")
+            }
+
+    return results
+
+def run_all(orders=20, lines=500):
+    """Run every benchmark against the fake server.
+
+        bench --site <site> execute optima.optima.utils.benchmark.run_all
+    """
+    require_fake_backend()
+    return {
+        "order_lines": benchmark_order_lines(lines=lines),
+        "order_sync": benchmark_order_sync(orders=orders),
+        "status_lookup": benchmark_status_lookup(),
+        "master_sync": benchmark_master_sync()
+    }
@@ -0,0 +1,167 @@
+import frappe
+from frappe import _
+from frappe.utils import cint
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .connection import _is_alive, get_optima_connection, get_pool
+from .order_sync import PUSHED_SYNC_STATUSES, OrderSyncLocked, sync_sales_order_to_optima
+
+DEFAULT_BULK_CONCURRENCY = 4
+MAX_BULK_CONCURRENCY = 16  # hard cap whatever the settings say, the plant server is shared
+BULK_PUSH_TIMEOUT = 4 * 60 * 60  # seconds
+BULK_PUSH_RESULT_KEY = "optima_bulk_push|last_result"
+
+@frappe.whitelist()
+def enqueue_bulk_push(sales_orders=None, filters=None, concurrency=None, force=0):
+    """Queue a bulk push of the given Sales Orders, or of those matching `filters`."""
+    frappe.only_for("System Manager")
+    if not sales_orders and not filters:
+        frappe.throw(_("Select the Sales Orders to push, or filters to choose them by"))
+
+    job = frappe.enqueue(
+        "optima.optima.utils.bulk_push.bulk_push",
+        queue="long",
+        timeout=BULK_PUSH_TIMEOUT,
+        job_id="optima_bulk_push",
+        deduplicate=True,
+        sales_orders=frappe.parse_json(sales_orders) if sales_orders else None,
+        filters=frappe.parse_json(filters) if filters else None,
+        concurrency=concurrency,
+        force=cint(force)
+    )
+    if not job:
+        frappe.msgprint(_("A bulk push is already running."))
+        return
+
+    frappe.msgprint(_("Bulk push has been queued. Results will be shown when it finishes."))
+
+@frappe.whitelist()
+def get_bulk_push_result():
+    """Return the report of the last finished bulk push."""
+    frappe.only_for("System Manager")
+    return frappe.cache().get_value(BULK_PUSH_RESULT_KEY)
+
+def get_bulk_concurrency(concurrency=None):
+    """Number of push workers, capped at the connection pool size.
+
+    Every worker holds a connection from this process's pool for the whole run,
+    so more workers than pool slots would only block on checkout.
+    """
+    if not cint(concurrency):
+        concurrency = frappe.get_cached_doc("Optima Settings").get("bulk_push_concurrency")
+    limit = min(MAX_BULK_CONCURRENCY, get_pool().max_size)
+    return min(max(cint(concurrency) or DEFAULT_BULK_CONCURRENCY, 1), limit)
+
+def bulk_push(sales_orders=None, filters=None, concurrency=None, force=False):
+    """Push many Sales Orders through a bounded pool of worker threads.
+
+    Each worker holds one Optima connection for the whole run and pulls the
+    next order from a shared queue, so at most `concurrency` connections hit
+    the server however long the list is. Returns per-order results.
+
+    Orders already in Optima are skipped, including those pushed before payload
+    hashes were kept; `force` re-pushes them only when they are named in
+    `sales_orders`, never when picked by `filters`.
+    """
+    if not sales_orders and not filters:
+        frappe.throw(_("Select the Sales Orders to push, or filters to choose them by"))
+
+    names = sales_orders or frappe.get_all("Sales Order", filters=filters, order_by="creation asc", pluck="name")
+    already_pushed = set() if force and sales_orders else get_already_pushed(names)
+    to_push = [name for name in names if name not in already_pushed]
+    concurrency = min(get_bulk_concurrency(concurrency), len(to_push) or 1)
+
+    work = queue.Queue()
+    for name in to_push:
+        work.put(name)
+
+    results = {name: {"status": "Skipped", "message": _("Already in Optima")} for name in already_pushed}
+    site, user = frappe.local.site, frappe.session.user
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="optima-bulk-push") as pool:
+        workers = [pool.submit(push_worker, site, user, work, results, force) for _worker in range(concurrency)]
+        for worker in workers:
+            worker.result()
+
+    elapsed = time.perf_counter() - started
+
+    # Left over when every worker lost its connection
+    for name in names:
+        results.setdefault(name, {"status": "Not Attempted", "message": _("No Optima connection available")})
+
+    report = {
+        "orders": len(names),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "orders_per_second": round(len(names) / elapsed, 2) if elapsed else None,
+        "counts": {},
+        "results": [{"sales_order": name, **results[name]} for name in names]
+    }
+    for result in results.values():
+        report["counts"][result["status"]] = report["counts"].get(result["status"], 0) + 1
+
+    frappe.cache().set_value(BULK_PUSH_RESULT_KEY, report)
+    frappe.publish_realtime("optima_bulk_push_done", report["counts"], user=user)
+    return report
+
+def get_already_pushed(names):
+    """Sales Orders among `names` that already have an order in Optima."""
+    if not names:
+        return set()
+
+    pushed = set(frappe.get_all(
+        "Sales Order",
+        filters={"name": ["in", names], "custom_optima_order": ["is", "set"]},
+        pluck="name"
+    ))
+    pushed.update(frappe.get_all(
+        "Optima Order",
+        filters={"sales_order": ["in", names], "sync_status": ["in", PUSHED_SYNC_STATUSES]},
+        pluck="sales_order"
+    ))
+    return pushed
+
+def push_worker(site, user, work, results, force):
+    """Drain the shared queue on this thread's own site connection and Optima connection."""
+    frappe.init(site=site)
+    frappe.connect()
+    frappe.set_user(user)
+
+    try:
+        while not work.empty():
+            try:
+                with get_optima_connection() as conn:
+                    while push_next(work, results, conn, force):
+                        pass
+            except Exception:
+                # Could not (re)connect, leave what's left to the other workers
+                frappe.log_error(frappe.get_traceback(), "Optima Bulk Push")
+                return
+    finally:
+        frappe.destroy()
+
+def push_next(work, results, conn, force):
+    """Push one order; False once the queue is empty or the connection died."""
+    try:
+        name = work.get_nowait()
+    except queue.Empty:
+        return False
+
+    try:
+        result = sync_sales_order_to_optima(frappe.get_doc("Sales Order", name), conn=conn, force=force)
+        results[name] = {
+            "status": "Skipped" if result.get("skipped") else "Completed",
+            "order_id": result.get("order_id")
+        }
+    except OrderSyncLocked as e:
+        results[name] = {"status": "Locked", "message": str(e)}
+    except Exception as e:
+        frappe.db.rollback()
+        results[name] = {"status": "Failed", "message": str(e)[:140]}
+        if not _is_alive(conn):
+            # Reconnect before the next order instead of failing all of them
+            return False
+
+    return True
@@ -0,0 +1,124 @@
+import frappe
+from frappe import _
+from frappe.utils import cint
+import time
+
+DEFAULT_FAILURE_THRESHOLD = 5  # consecutive connect failures before the circuit opens
+DEFAULT_RESET_TIMEOUT = 60  # seconds the circuit stays open before a half-open probe
+
+class CircuitOpenError(frappe.ValidationError):
+    pass
+
+
+class CircuitBreaker:
+    """Circuit breaker around connecting to one SQL Server, shared through Redis.
+
+    After `failure_threshold` consecutive failed connects the circuit opens and
+    every worker fails fast instead of waiting for the login timeout. Once
+    `reset_timeout` has passed a single caller is let through as a half-open
+    probe: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(cint(failure_threshold), 1)
+        self.reset_timeout = max(cint(reset_timeout), 1)
+
+        cache = frappe.cache()
+        self._failures_key = cache.make_key(f"optima_circuit|{name}|failures")
+        self._opened_key = cache.make_key(f"optima_circuit|{name}|opened_at")
+        self._probe_key = cache.make_key(f"optima_circuit|{name}|probe")
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a connect attempt may go ahead."""
+        cache = frappe.cache()
+        opened_at = cache.get(self._opened_key)
+        if not opened_at:
+            return
+
+        if time.time() - float(opened_at) < self.reset_timeout:
+            raise CircuitOpenError(self._open_message())
+
+        # Half-open: only the caller that wins the probe token tries to connect.
+        # The token expires, so a probe that never reports back is retried.
+        if not cache.set(self._probe_key, 1, nx=True, ex=self.reset_timeout):
+            raise CircuitOpenError(self._open_message())
+
+    def record_success(self):
+        frappe.cache().delete(self._failures_key, self._opened_key, self._probe_key)
+
+    def record_failure(self):
+        cache = frappe.cache()
+        failures = cache.incr(self._failures_key)
+        if failures >= self.failure_threshold or cache.get(self._probe_key):
+            if not cache.get(self._opened_key):
+                frappe.log_error(
+                    f"Optima circuit {self.name} opened after {failures} consecutive connection failures",
+                    "Optima Circuit Breaker"
+                )
+            cache.set(self._opened_key, time.time())
+            cache.delete(self._probe_key)
+
+    def reset(self):
+        self.record_success()
+
+    def is_open(self):
+        """True while calls are being rejected outright, i.e. not yet probing."""
+        return self.get_state()["state"] == "Open"
+
+    def get_state(self):
+        failures, opened_at, probing = frappe.cache().mget(
+            [self._failures_key, self._opened_key, self._probe_key]
+        )
+        opened_at = float(opened_at) if opened_at else None
+
+        if not opened_at:
+            state = "Closed"
+        elif probing or time.time() - opened_at >= self.reset_timeout:
+            state = "Half-Open"
+        else:
+            state = "Open"
+
+        return {
+            "name": self.name,
+            "state": state,
+            "failures": cint(failures),
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "opened_at": opened_at,
+            "retry_at": opened_at + self.reset_timeout if opened_at else None
+        }
+
+    def _open_message(self):
+        return _("Optima server {0} is unreachable, not trying again for now").format(self.name)
+
+
+def circuit_name(server, port=None):
+    return f"{server}:{cint(port)}" if port else str(server)
+
+def get_circuit_breaker(server, port=None):
+    """Return the breaker for a server, configured from Optima Settings."""
+    settings = frappe.get_cached_doc("Optima Settings")
+    return CircuitBreaker(
+        circuit_name(server, port),
+        failure_threshold=settings.get("circuit_failure_threshold") or DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout=settings.get("circuit_reset_timeout") or DEFAULT_RESET_TIMEOUT
+    )
+
+def get_optima_circuit():
+    """Return the breaker guarding the configured Optima server."""
+    settings = frappe.get_cached_doc("Optima Settings")
+    return get_circuit_breaker(settings.server_ip, settings.port)
+
+@frappe.whitelist()
+def get_circuit_state():
+    """Return the state of the Optima server's circuit breaker."""
+    return get_optima_circuit().get_state()
+
+@frappe.whitelist()
+def reset_circuit():
+    """Close the Optima circuit by hand, e.g. once the server is known to be back."""
+    frappe.only_for("System Manager")
+    circuit = get_optima_circuit()
+    circuit.reset()
+    return circuit.get_state()
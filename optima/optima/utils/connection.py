@@ -3,7 +3,285 @@ from frappe import _
 import pymssql
 from frappe.utils import cint
 from contextlib import contextmanager
+import threading
 import time
+from . import fake_mssql
+from .circuit_breaker import get_circuit_breaker
+
+DEFAULT_POOL_MAX_SIZE = 5
+DEFAULT_POOL_IDLE_TIMEOUT = 300  # seconds
+POOL_PROBE_INTERVAL = 30  # idle seconds after which a connection is probed before reuse
+POOL_CHECKOUT_TIMEOUT = 30  # seconds to wait for a free slot when the pool is exhausted
+
+# SQL Server errors that mean the server answered but refused the login
+# (bad credentials, unknown database, disabled or expired account). They say
+# nothing about whether the server is reachable.
+LOGIN_ERROR_CODES = {4060, 18452, 18456, 18470, 18486, 18487, 18488}
+
+
+class OptimaConnectionPool:
+    """Per-worker pool of warm MSSQL connections.
+
+    Connections are keyed by their connection parameters, so the Optima Settings
+    connection, the schema explorer and the External Database Viewer can all share
+    one pool without handing a connection to the wrong server or database.
+    """
+
+    def __init__(self, max_size=DEFAULT_POOL_MAX_SIZE, idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT):
+        self.max_size = max(cint(max_size), 1)
+        self.idle_timeout = max(cint(idle_timeout), 0)
+        self._idle = {}  # key -> list of (conn, last_used)
+        self._keys = {}  # id(conn) -> key, pymssql connections don't take attributes
+        self._open = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self.stats = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "evicted": 0,
+            "probe_failures": 0,
+            "discarded": 0,
+            "checkout_time_total_ms": 0.0,
+            "checkout_time_max_ms": 0.0,
+        }
+
+    def acquire(self, use_circuit=True, **params):
+        """Check out a live connection for the given parameters."""
+        key = _pool_key(params)
+        started = time.monotonic()
+        deadline = started + POOL_CHECKOUT_TIMEOUT
+
+        while True:
+            with self._lock:
+                self._evict_idle()
+                idle = self._idle.get(key)
+                conn, last_used = idle.pop() if idle else (None, None)
+                if not conn:
+                    if self._open >= self.max_size and not self._close_one_idle():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise frappe.ValidationError(_("No free Optima connection available"))
+                        self._lock.wait(remaining)
+                        continue
+                    # Reserve the slot before connecting outside the lock
+                    self._open += 1
+
+            if conn:
+                if time.monotonic() - last_used < POOL_PROBE_INTERVAL or _is_alive(conn):
+                    self._record_checkout(started, reused=True)
+                    return conn
+                with self._lock:
+                    self.stats["probe_failures"] += 1
+                    self._discard(conn)
+                continue
+
+            try:
+                conn = open_connection(params, use_circuit=use_circuit)
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._keys[id(conn)] = key
+            self._record_checkout(started, reused=False)
+            return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if it is no longer usable."""
+        with self._lock:
+            if discard or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.setdefault(self._keys[id(conn)], []).append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def close_all(self):
+        """Close every idle connection, e.g. after the Optima Settings change."""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _last_used in idle:
+                    self._discard(conn)
+            self._idle = {}
+            self._closed = True
+            self._lock.notify_all()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "open": self._open,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "max_size": self.max_size,
+                "idle_timeout": self.idle_timeout,
+                "checkout_time_avg_ms": (
+                    stats["checkout_time_total_ms"] / stats["checkouts"] if stats["checkouts"] else 0.0
+                ),
+            })
+            return stats
+
+    def _record_checkout(self, started, reused):
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["reused" if reused else "created"] += 1
+            self.stats["checkout_time_total_ms"] += elapsed_ms
+            self.stats["checkout_time_max_ms"] = max(self.stats["checkout_time_max_ms"], elapsed_ms)
+
+    def _evict_idle(self):
+        if not self.idle_timeout:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        for key, idle in self._idle.items():
+            expired = [entry for entry in idle if entry[1] < cutoff]
+            if expired:
+                self._idle[key] = [entry for entry in idle if entry[1] >= cutoff]
+                for conn, _last_used in expired:
+                    self.stats["evicted"] += 1
+                    self._discard(conn)
+
+    def _close_one_idle(self):
+        """Free a slot held by an idle connection for another key."""
+        for idle in self._idle.values():
+            if idle:
+                conn, _last_used = idle.pop(0)
+                self.stats["evicted"] += 1
+                self._discard(conn)
+                return True
+        return False
+
+    def _discard(self, conn):
+        self._keys.pop(id(conn), None)
+        self._open -= 1
+        self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this worker's connection pool, creating it from Optima Settings."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings = frappe.get_cached_doc("Optima Settings")
+                _pool = OptimaConnectionPool(
+                    max_size=settings.get("pool_max_size") or DEFAULT_POOL_MAX_SIZE,
+                    idle_timeout=settings.get("pool_idle_timeout") or DEFAULT_POOL_IDLE_TIMEOUT,
+                )
+    return _pool
+
+
+def reset_pool():
+    """Drop the pool so the next checkout picks up new settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+
+def get_driver():
+    """Return pymssql, or the SQLite stand-in when the site is configured for it."""
+    return fake_mssql if fake_mssql.is_enabled() else pymssql
+
+
+def open_connection(params, use_circuit=True):
+    """Open a new MSSQL connection, through the server's circuit breaker unless told not to."""
+    if not use_circuit:
+        return get_driver().connect(**params)
+
+    circuit = get_circuit_breaker(params["server"], params.get("port"))
+    # Fails fast with CircuitOpenError while the server is known to be down
+    circuit.before_call()
+    try:
+        conn = get_driver().connect(**params)
+    except Exception as e:
+        if is_login_error(e):
+            # The server is up, it just refused these credentials
+            circuit.record_success()
+        else:
+            circuit.record_failure()
+        raise
+    circuit.record_success()
+    return conn
+
+
+def is_login_error(error):
+    """True when a connect failed because the login was refused, not because the server is unreachable."""
+    codes = set()
+    for arg in getattr(error, "args", ()):
+        if isinstance(arg, tuple) and arg and isinstance(arg[0], int):
+            codes.add(arg[0])
+    if codes & LOGIN_ERROR_CODES:
+        return True
+    # pymssql reports the server's message chain when the login is refused
+    message = str(error)
+    return "Login failed" in message or "Cannot open database" in message
+
+
+def _pool_key(params):
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+def _is_alive(conn):
+    """Cheap liveness probe run before handing out a connection that sat idle."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def connection_params(server, user, password, port=None, database=None, autocommit=False):
+    params = {
+        "server": server,
+        "user": user,
+        "password": password,
+        "autocommit": autocommit,
+    }
+    if port:
+        params["port"] = cint(port)
+    if database:
+        params["database"] = database
+    return params
+
+
+@contextmanager
+def get_connection(server, user, password, port=None, database=None, autocommit=False, use_circuit=True):
+    """Check out a pooled MSSQL connection for the given server and credentials.
+
+    Pass `use_circuit=False` for ad-hoc connections with user-typed details, such
+    as the External Database Viewer, so they neither trip nor honour the breaker
+    guarding the Optima server.
+    """
+    params = connection_params(server, user, password, port, database, autocommit)
+
+    pool = get_pool()
+    conn = pool.acquire(use_circuit=use_circuit, **params)
+    broken = False
+
+    try:
+        yield conn
+    finally:
+        if not autocommit:
+            # Leave no open transaction behind for the next borrower
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        pool.release(conn, discard=broken)
+
 
 def get_optima_settings():
     """Get Optima settings from the doctype."""
@@ -13,37 +291,62 @@ def get_optima_settings():
     return settings
 
 @contextmanager
-def get_optima_connection():
+def get_optima_connection(database='CONNECTOR_ORDERS', autocommit=False):
     """Get connection to Optima database."""
     settings = frappe.get_doc("Optima Settings")
-    conn = None
-    
+
+    with get_connection(
+        server=settings.server_ip,
+        port=settings.port,
+        user=settings.username,
+        password=settings.get_password('password'),
+        database=database,
+        autocommit=autocommit
+    ) as conn:
+        yield conn
+
+@contextmanager
+def get_dedicated_optima_connection(database='CONNECTOR_ORDERS', autocommit=True):
+    """Open an Optima connection outside the pool and close it afterwards.
+
+    For short housekeeping work done while the caller may already hold pooled
+    connections, so it can never wait on a pool slot the caller itself holds.
+    """
+    settings = frappe.get_doc("Optima Settings")
+    conn = open_connection(connection_params(
+        server=settings.server_ip,
+        port=settings.port,
+        user=settings.username,
+        password=settings.get_password('password'),
+        database=database,
+        autocommit=autocommit
+    ))
     try:
-        conn = pymssql.connect(
-            server=settings.server_ip,
-            user=settings.username,
-            password=settings.get_password('password'),
-            database='CONNECTOR_ORDERS',
-            autocommit=False
-        )
         yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise
     finally:
-        if conn:
+        try:
             conn.close()
+        except Exception:
+            pass
 
+def quote_identifier(name):
+    """Bracket-quote a table or column name for SQL Server."""
+    return "[" + name.replace("]", "]]") + "]"
+
+@frappe.whitelist()
+def get_pool_stats():
+    """Return checkout counters and latency for this worker's connection pool."""
+    return get_pool().get_stats()
+
+@frappe.whitelist()
 def test_connection():
     """Test connection to Optima database."""
     try:
-        conn = get_optima_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT @@VERSION")
-        version = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with get_optima_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT @@VERSION")
+            version = cursor.fetchone()
+            cursor.close()
         return {
             "success": True,
             "message": f"Successfully connected to Optima database.\nSQL Server Version: {version[0]}"
@@ -52,7 +355,7 @@ def test_connection():
         return {
             "success": False,
             "message": f"Connection failed: {str(e)}"
-        } 
+        }
 
 def verify_permissions(cursor):
     """Verify user has proper permissions"""
@@ -61,10 +364,10 @@ def verify_permissions(cursor):
             SELECT HAS_PERMS_BY_NAME('CONNECTOR_ORDERS', 'SCHEMA', 'INSERT')
         """)
         has_insert = cursor.fetchone()[0]
-        
+
         if not has_insert:
             raise Exception("User does not have required permissions on CONNECTOR_ORDERS schema")
-            
+
     except Exception as e:
         frappe.log_error(f"Permission verification error: {str(e)}", "Optima Permissions Error")
-        raise 
\ No newline at end of file
+        raise
@@ -0,0 +1,270 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, get_files_path, now_datetime
+import csv
+import datetime
+import hashlib
+import os
+import time
+from decimal import Decimal
+from .connection import quote_identifier
+
+EXPORT_FORMATS = ("CSV", "Parquet")
+DEFAULT_EXPORT_CHUNK_SIZE = 10000  # rows per fetchmany, and per Parquet row group
+MAX_EXPORT_CHUNK_SIZE = 100000
+EXPORT_TIMEOUT = 4 * 60 * 60  # seconds
+EXPORT_STATUS_TTL = 24 * 60 * 60  # seconds an export's status is kept
+
+@frappe.whitelist()
+def start_export(table, file_format="CSV", database=None, columns=None, chunk_size=DEFAULT_EXPORT_CHUNK_SIZE):
+    """Queue an export of an Optima table to a private File and return its export ID.
+
+    Progress, including rows per second, is published while the job runs and
+    the result is sent as the `optima_export_done` realtime event.
+    """
+    frappe.only_for("System Manager")
+    if file_format not in EXPORT_FORMATS:
+        frappe.throw(_("Export format must be one of {0}").format(", ".join(EXPORT_FORMATS)))
+    if file_format == "Parquet":
+        get_pyarrow()
+
+    export_id = frappe.generate_hash(length=10)
+    set_export_status(export_id, {"status": "Queued", "table": table, "format": file_format})
+
+    frappe.enqueue(
+        "optima.optima.utils.export.run_export",
+        queue="long",
+        timeout=EXPORT_TIMEOUT,
+        job_id=f"optima_export|{export_id}",
+        export_id=export_id,
+        table=table,
+        file_format=file_format,
+        database=database,
+        columns=frappe.parse_json(columns) if columns else None,
+        chunk_size=chunk_size
+    )
+    return export_id
+
+@frappe.whitelist()
+def cancel_export(export_id):
+    """Ask a running export to stop after its current chunk."""
+    frappe.only_for("System Manager")
+    frappe.cache().set_value(export_key(export_id, "cancel"), 1, expires_in_sec=EXPORT_STATUS_TTL)
+
+@frappe.whitelist()
+def get_export_status(export_id):
+    frappe.only_for("System Manager")
+    return frappe.cache().get_value(export_key(export_id))
+
+def export_key(export_id, suffix="status"):
+    return f"optima_export|{export_id}|{suffix}"
+
+def set_export_status(export_id, status):
+    frappe.cache().set_value(export_key(export_id), status, expires_in_sec=EXPORT_STATUS_TTL)
+
+def get_pyarrow():
+    """Import pyarrow on demand, it is only needed for Parquet exports."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        frappe.throw(_("Parquet export needs the pyarrow package, install it with: bench pip install pyarrow"))
+    return pyarrow
+
+def run_export(export_id, table, file_format="CSV", database=None, columns=None, chunk_size=DEFAULT_EXPORT_CHUNK_SIZE):
+    """Stream a table from the Optima server into a CSV or Parquet File.
+
+    Rows are read `chunk_size` at a time and written out before the next
+    chunk is fetched, so memory stays flat however big the table is.
+    """
+    chunk_size = min(max(cint(chunk_size), 1), MAX_EXPORT_CHUNK_SIZE)
+    user = frappe.session.user
+    extension = "csv" if file_format == "CSV" else "parquet"
+    file_name = f"{table.replace('.', '_')}_{now_datetime():%Y%m%d%H%M%S}.{extension}"
+    file_path = get_files_path(file_name, is_private=1)
+    status = {"status": "Running", "table": table, "format": file_format, "rows": 0}
+
+    try:
+        settings = frappe.get_single("Optima Settings")
+        with settings.get_connection(database=database) as conn:
+            cursor = conn.cursor()
+            approx_rows = get_approx_row_count(cursor, table)
+
+            source = ".".join(quote_identifier(part) for part in table.split("."))
+            select = ", ".join(quote_identifier(column) for column in columns) if columns else "*"
+            cursor.execute(f"SELECT {select} FROM {source}")
+            column_names = [desc[0] for desc in cursor.description]
+
+            writer = CsvChunkWriter(file_path, column_names) if file_format == "CSV" \
+                else ParquetChunkWriter(file_path, column_names)
+            started = time.monotonic()
+            cancelled = False
+            try:
+                while True:
+                    if frappe.cache().get_value(export_key(export_id, "cancel")):
+                        cancelled = True
+                        break
+
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+
+                    writer.write(rows)
+                    status["rows"] += len(rows)
+                    status["rows_per_second"] = round(status["rows"] / ((time.monotonic() - started) or 1), 1)
+                    publish_export_progress(export_id, table, status, approx_rows)
+            finally:
+                writer.close()
+                cursor.close()
+
+        if cancelled:
+            os.remove(file_path)
+            status["status"] = "Cancelled"
+        else:
+            status["status"] = "Completed"
+            status["file_url"] = save_export_file(file_name, file_path)
+        status["seconds"] = round(time.monotonic() - started, 2)
+    except Exception as e:
+        frappe.log_error(frappe.get_traceback(), "Optima Table Export")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        status["status"] = "Failed"
+        status["message"] = str(e)[:140]
+
+    set_export_status(export_id, status)
+    frappe.publish_realtime("optima_export_done", {"export_id": export_id, **status}, user=user)
+    return status
+
+def get_approx_row_count(cursor, table):
+    """Row count from partition metadata, without scanning the table."""
+    try:
+        cursor.execute("""
+            SELECT SUM(p.rows)
+            FROM sys.partitions p
+            WHERE p.object_id = OBJECT_ID(%s) AND p.index_id IN (0, 1)
+        """, (table,))
+        row = cursor.fetchone()
+        return cint(row[0]) if row else None
+    except Exception:
+        # Only a progress estimate, the export works without it
+        return None
+
+def publish_export_progress(export_id, table, status, approx_rows):
+    set_export_status(export_id, status)
+    frappe.publish_progress(
+        min(status["rows"] * 100 / approx_rows, 99) if approx_rows else 0,
+        title=_("Exporting {0}").format(table),
+        description=_("{0} rows, {1} rows/s").format(status["rows"], status["rows_per_second"])
+    )
+
+def save_export_file(file_name, file_path):
+    """Register an exported file as a private File and return its URL.
+
+    File.insert would read the whole file back into memory and reject it
+    above max_file_size, so the record is written directly for the file
+    already on disk, hashed here in blocks.
+    """
+    content_hash = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            content_hash.update(block)
+
+    file_doc = frappe.new_doc("File")
+    file_doc.update({
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+        "folder": "Home",
+        "file_type": file_name.rsplit(".", 1)[-1].upper(),
+        "file_size": os.path.getsize(file_path),
+        "content_hash": content_hash.hexdigest()
+    })
+    file_doc.set_new_name()
+    file_doc.set_user_and_timestamp()
+    file_doc.db_insert()
+    frappe.db.commit()
+    return file_doc.file_url
+
+
+class CsvChunkWriter:
+    def __init__(self, file_path, column_names):
+        self._file = open(file_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(column_names)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetChunkWriter:
+    """Write each chunk as one Parquet row group.
+
+    The schema is inferred from the first chunk: Decimals are written as
+    doubles and columns that are entirely NULL there as strings.
+    """
+
+    def __init__(self, file_path, column_names):
+        self.file_path = file_path
+        self.column_names = column_names
+        self._pa = get_pyarrow()
+        self._writer = None
+        self._converters = None
+
+    def write(self, rows):
+        pa = self._pa
+        if self._writer is None:
+            types = [self.arrow_type(column_values(rows, idx)) for idx in range(len(self.column_names))]
+            self._converters = [converter_for(pa, arrow_type) for arrow_type in types]
+            self._writer = pa.parquet.ParquetWriter(
+                self.file_path,
+                pa.schema(list(zip(self.column_names, types))),
+                compression="snappy"
+            )
+
+        arrays = [
+            pa.array([convert(value) for value in column_values(rows, idx)], type=self._writer.schema.field(idx).type)
+            for idx, convert in enumerate(self._converters)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._writer.schema), row_group_size=len(rows))
+
+    def arrow_type(self, values):
+        pa = self._pa
+        value = next((value for value in values if value is not None), None)
+        if isinstance(value, bool):
+            return pa.bool_()
+        if isinstance(value, int):
+            return pa.int64()
+        if isinstance(value, (float, Decimal)):
+            return pa.float64()
+        if isinstance(value, datetime.datetime):
+            return pa.timestamp("us")
+        if isinstance(value, datetime.date):
+            return pa.date32()
+        if isinstance(value, (bytes, bytearray)):
+            return pa.binary()
+        return pa.string()
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+        else:
+            # An empty table still gets a valid file
+            pa = self._pa
+            pa.parquet.write_table(
+                pa.table({name: pa.array([], type=pa.string()) for name in self.column_names}),
+                self.file_path
+            )
+
+
+def column_values(rows, idx):
+    return [row[idx] for row in rows]
+
+def converter_for(pa, arrow_type):
+    if arrow_type == pa.float64():
+        return lambda value: None if value is None else float(value)
+    if arrow_type == pa.string():
+        return lambda value: None if value is None else str(value)
+    return lambda value: value
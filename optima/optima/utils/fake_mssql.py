@@ -0,0 +1,410 @@
+"""SQLite stand-in for the Optima SQL Server.
+
+Mimics the parts of pymssql's connect/cursor API the integration uses and
+translates the T-SQL it sends, so order pushes, status polling and the master
+sync can run and be benchmarked without a plant server. Enable it in
+site_config.json:
+
+    "optima_fake_mssql": 1,                     # or a path to the SQLite file
+    "optima_fake_mssql_latency_ms": 2           # optional, added per round trip
+
+Only the OPTIMA_Orders, OPTIMA_OrderLines, ERP_Customers and ITEMS tables are
+modelled. Of the schema explorer's catalog queries only the column and primary
+key lookup of the table viewer is supported.
+"""
+import frappe
+from frappe.utils import cint, flt, now_datetime
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+FAKE_SERVER_VERSION = "Optima fake SQL Server (SQLite {0})"
+DEFAULT_SEQUENCE_START = 1001
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS OPTIMA_Orders (
+    ID_OPERATIONS INTEGER PRIMARY KEY AUTOINCREMENT,
+    ID_ORDINI INTEGER,
+    CLIENTE TEXT,
+    RIFCLI TEXT,
+    DATAORD TEXT,
+    DATACONS TEXT,
+    DEF TEXT,
+    NOTES TEXT,
+    DESCR_TIPICAUDOC TEXT,
+    DESCR1_SPED TEXT,
+    DESCR2_SPED TEXT,
+    INDIRI_SPED TEXT,
+    CAP_SPED TEXT,
+    LOCALITA_SPED TEXT,
+    PROV_SPED TEXT,
+    SyncStatus INTEGER DEFAULT 0,
+    SyncNotes TEXT
+);
+CREATE TABLE IF NOT EXISTS OPTIMA_OrderLines (
+    ID_OPERATIONS INTEGER PRIMARY KEY AUTOINCREMENT,
+    ID_ORDINI INTEGER,
+    RIGA INTEGER,
+    QTAPZ INTEGER,
+    DESCR_MAT_COMP TEXT,
+    COD_ART_CLIENTE TEXT,
+    DESCMAT TEXT,
+    SAGOMA TEXT,
+    CODICE_ANAGRAFICA TEXT,
+    DIMXPZ REAL,
+    DIMYPZ REAL,
+    ID_UM INTEGER,
+    isrect INTEGER,
+    PRODOTTI_CODICE TEXT
+);
+CREATE INDEX IF NOT EXISTS OPTIMA_OrderLines_ID_ORDINI ON OPTIMA_OrderLines (ID_ORDINI);
+CREATE TABLE IF NOT EXISTS ERP_Customers (
+    Code TEXT PRIMARY KEY,
+    Description TEXT,
+    TimeStamp TEXT
+);
+CREATE TABLE IF NOT EXISTS ITEMS (
+    GMCQ_BARCODE TEXT PRIMARY KEY,
+    NOTES TEXT,
+    LASTDATE TEXT
+);
+CREATE TABLE IF NOT EXISTS fake_sequences (
+    name TEXT PRIMARY KEY,
+    next_value INTEGER
+);
+"""
+
+SEQUENCE_RANGE_RE = re.compile(r"sp_sequence_get_range\s+@sequence_name\s*=\s*N'([^']+)'", re.I)
+CREATE_SEQUENCE_RE = re.compile(r"OBJECT_ID\(N'([^']+)',\s*N'SO'\)", re.I)
+TOP_RE = re.compile(r"\bSELECT\s+TOP\s*\(?\s*(\?|\d+)\s*\)?", re.I)
+TABLE_COLUMNS_RE = re.compile(r"\bAS\s+is_primary_key\s+FROM\s+INFORMATION_SCHEMA\.COLUMNS\b", re.I)
+OFFSET_FETCH_RE = re.compile(
+    r"\bOFFSET\s+(\?|\d+)\s+ROWS?\s+FETCH\s+(?:NEXT|FIRST)\s+(\?|\d+)\s+ROWS?\s+ONLY", re.I
+)
+TRANSLATIONS = (
+    (re.compile(r"\bSET\s+NOCOUNT\s+(ON|OFF)\s*;?", re.I), ""),
+    (re.compile(r"CAST\(\s*SCOPE_IDENTITY\(\)\s+AS\s+\w+\s*\)", re.I), "last_insert_rowid()"),
+    (re.compile(r"SCOPE_IDENTITY\(\)|@@IDENTITY", re.I), "last_insert_rowid()"),
+    (re.compile(r"\bISNULL\(", re.I), "IFNULL("),
+    (re.compile(r"\bGETDATE\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\b(?:\w+\.)?dbo\.|\[dbo\]\.", re.I), ""),
+    (re.compile(r"\[([^\]]+)\]"), r'"\1"'),
+)
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+class Error(Exception):
+    pass
+
+class OperationalError(Error):
+    pass
+
+class InterfaceError(Error):
+    pass
+
+
+def get_database_path():
+    path = frappe.conf.get("optima_fake_mssql")
+    if isinstance(path, str) and path not in ("1", "true"):
+        return path
+    return frappe.get_site_path("private", "optima_fake_mssql.sqlite")
+
+def get_latency():
+    """Seconds of injected latency per round trip."""
+    return flt(frappe.conf.get("optima_fake_mssql_latency_ms")) / 1000
+
+def connect(server=None, user=None, password=None, database=None, port=None, autocommit=False, **kwargs):
+    """Open a connection to the fake server, like pymssql.connect."""
+    return FakeConnection(get_database_path(), autocommit=autocommit, latency=get_latency())
+
+def translate(sql, params=()):
+    """Turn one T-SQL batch into SQLite statements with their parameters.
+
+    Returns a list of (statement, params) pairs. Parameters are split across
+    the statements by counting placeholders, the way SQL Server binds them.
+    """
+    sql = sql.replace("%%", "\x00").replace("%s", "?").replace("\x00", "%")
+    for pattern, replacement in TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+
+    params = list(params or ())
+    statements = []
+    for statement in sql.split(";"):
+        statement = statement.strip()
+        if not statement:
+            continue
+
+        count = statement.count("?")
+        statement_params, params = params[:count], params[count:]
+
+        top = TOP_RE.search(statement)
+        if top:
+            if top.group(1) == "?":
+                # TOP's value is bound where it appears, LIMIT comes last
+                statement_params.append(statement_params.pop(statement[:top.start(1)].count("?")))
+            statement = TOP_RE.sub("SELECT ", statement, count=1) + f" LIMIT {top.group(1)}"
+
+        offset = OFFSET_FETCH_RE.search(statement)
+        if offset:
+            # SQLite takes LIMIT before OFFSET, swap the bound values to match
+            if offset.group(1) == "?" and offset.group(2) == "?":
+                statement_params[-2:] = statement_params[-2:][::-1]
+            statement = OFFSET_FETCH_RE.sub(
+                lambda m: f"LIMIT {m.group(2)} OFFSET {m.group(1)}", statement
+            )
+
+        statements.append((statement, tuple(adapt(value) for value in statement_params)))
+    return statements
+
+def adapt(value):
+    """Store values the way they'd round-trip through pymssql as text/numbers."""
+    if isinstance(value, date):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class FakeConnection:
+    def __init__(self, path, autocommit=False, latency=0):
+        self.path = path
+        self.latency = latency
+        self._autocommit = autocommit
+        self._db = sqlite3.connect(
+            path,
+            timeout=30,
+            isolation_level=None if autocommit else "DEFERRED",
+            check_same_thread=False,
+            detect_types=0
+        )
+        ensure_schema(self._db, path)
+        self._sequence_values = {}  # sequence -> next value handed out in the open transaction
+
+    def cursor(self, as_dict=False):
+        return FakeCursor(self, as_dict=as_dict)
+
+    def autocommit(self, status):
+        self._autocommit = bool(status)
+        if status and self._db.in_transaction:
+            self._db.commit()
+        self._db.isolation_level = None if status else "DEFERRED"
+
+    def commit(self):
+        self._round_trip()
+        self._db.commit()
+        self._sequence_values = {}
+
+    def rollback(self):
+        self._db.rollback()
+        # Sequences are not transactional on SQL Server, a rolled back range stays used
+        if self._sequence_values:
+            for sequence, next_value in self._sequence_values.items():
+                self._db.execute(
+                    "UPDATE fake_sequences SET next_value = MAX(next_value, ?) WHERE name = ?",
+                    (next_value, sequence)
+                )
+            self._db.commit()
+            self._sequence_values = {}
+
+    def close(self):
+        self._db.close()
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeCursor:
+    def __init__(self, connection, as_dict=False):
+        self.connection = connection
+        self.as_dict = as_dict
+        self._cursor = connection._db.cursor()
+        self._rows = []
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        if params is not None and not isinstance(params, (tuple, list)):
+            params = (params,)
+
+        self.connection._round_trip()
+        self._rows, self.description, self.rowcount = [], None, -1
+
+        if SEQUENCE_RANGE_RE.search(sql):
+            return self._get_sequence_range(SEQUENCE_RANGE_RE.search(sql).group(1), params[0])
+        if "CREATE SEQUENCE" in sql.upper():
+            return self._create_sequence(CREATE_SEQUENCE_RE.search(sql).group(1))
+        if TABLE_COLUMNS_RE.search(sql):
+            return self._get_table_columns(params[0])
+        if "@@VERSION" in sql.upper():
+            return self._set_result([(FAKE_SERVER_VERSION.format(sqlite3.sqlite_version),)], ("version",))
+
+        try:
+            for statement, statement_params in translate(sql, params):
+                self._cursor.execute(statement, statement_params)
+                if self._cursor.description:
+                    self.description = self._cursor.description
+                    self._rows = self._cursor.fetchall()
+                self.rowcount = self._cursor.rowcount
+                self.lastrowid = self._cursor.lastrowid
+        except sqlite3.OperationalError as e:
+            raise OperationalError(str(e)) from e
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+
+        if self.description:
+            self._rows = [self._format(row) for row in self._rows]
+
+    def executemany(self, sql, seq_of_params):
+        for params in seq_of_params:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _format(self, row):
+        if self.as_dict:
+            return {column[0]: value for column, value in zip(self.description, row)}
+        return tuple(row)
+
+    def _set_result(self, rows, columns):
+        self.description = tuple((column, None, None, None, None, None, None) for column in columns)
+        self._rows = [self._format(row) for row in rows]
+
+    def _get_sequence_range(self, sequence, size):
+        db = self.connection._db
+        started = not db.in_transaction
+        if started:
+            db.execute("BEGIN IMMEDIATE")
+        row = db.execute("SELECT next_value FROM fake_sequences WHERE name = ?", (sequence,)).fetchone()
+        if not row:
+            raise OperationalError(f"Cannot find the sequence object '{sequence}'")
+        first = row[0]
+        db.execute("UPDATE fake_sequences SET next_value = ? WHERE name = ?", (first + cint(size), sequence))
+        if started:
+            db.execute("COMMIT")
+        else:
+            self.connection._sequence_values[sequence] = first + cint(size)
+        self._set_result([(first, first + cint(size) - 1)], ("first", "last"))
+
+    def _get_table_columns(self, table):
+        """Column names and primary key flags, like the table viewer's INFORMATION_SCHEMA lookup."""
+        quoted = '"' + table.replace('"', '""') + '"'
+        columns = self.connection._db.execute(f"PRAGMA table_info({quoted})").fetchall()
+        self._set_result([(column[1], 1 if column[5] else 0) for column in columns], ("COLUMN_NAME", "is_primary_key"))
+
+    def _create_sequence(self, sequence):
+        db = self.connection._db
+        start = db.execute("SELECT IFNULL(MAX(ID_ORDINI), ?) + 1 FROM OPTIMA_Orders", (DEFAULT_SEQUENCE_START - 1,)).fetchone()[0]
+        db.execute("INSERT OR IGNORE INTO fake_sequences (name, next_value) VALUES (?, ?)", (sequence, start))
+        if not self.connection._autocommit:
+            db.commit()
+
+
+def ensure_schema(db, path):
+    if path in _schema_ready:
+        return
+    with _schema_lock:
+        if path not in _schema_ready:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            _schema_ready.add(path)
+
+def reset(path=None):
+    """Empty every fake table, e.g. between benchmark runs."""
+    db = sqlite3.connect(path or get_database_path())
+    try:
+        db.executescript(SCHEMA)
+        db.executescript("""
+            DELETE FROM OPTIMA_OrderLines;
+            DELETE FROM OPTIMA_Orders;
+            DELETE FROM ERP_Customers;
+            DELETE FROM ITEMS;
+            DELETE FROM fake_sequences;
+            DELETE FROM sqlite_sequence;
+        """)
+        db.commit()
+    finally:
+        db.close()
+
+def seed_master_data(items=1000, customers=200, path=None):
+    """Fill ITEMS and ERP_Customers with synthetic rows for the master sync."""
+    db = sqlite3.connect(path or get_database_path())
+    started = now_datetime() - timedelta(days=30)
+    try:
+        db.executescript(SCHEMA)
+        db.executemany(
+            "INSERT OR REPLACE INTO ITEMS (GMCQ_BARCODE, NOTES, LASTDATE) VALUES (?, ?, ?)",
+            [
+                (f"FAKE-ART-{idx:06d}", f"Fake glass article {idx}", str(started + timedelta(minutes=idx)))
+                for idx in range(1, cint(items) + 1)
+            ]
+        )
+        db.executemany(
+            "INSERT OR REPLACE INTO ERP_Customers (Code, Description, TimeStamp) VALUES (?, ?, ?)",
+            [
+                (f"FAKE-CUST-{idx:05d}", f"Fake Customer {idx}", str(started + timedelta(minutes=idx)))
+                for idx in range(1, cint(customers) + 1)
+            ]
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def seed_orders(count, path=None):
+    """Insert pending OPTIMA_Orders headers and return their ID_OPERATIONS."""
+    db = sqlite3.connect(path or get_database_path())
+    try:
+        db.executescript(SCHEMA)
+        first = db.execute("SELECT IFNULL(MAX(ID_OPERATIONS), 0) + 1 FROM OPTIMA_Orders").fetchone()[0]
+        db.executemany(
+            "INSERT INTO OPTIMA_Orders (ID_OPERATIONS, ID_ORDINI, CLIENTE, RIFCLI, DATAORD, DEF) VALUES (?, ?, 1, ?, ?, 'Y')",
+            [
+                (order_id, order_id, f"F{order_id}", str(now_datetime().date()))
+                for order_id in range(first, first + cint(count))
+            ]
+        )
+        db.commit()
+        return list(range(first, first + cint(count)))
+    finally:
+        db.close()
+
+def process_orders(completed=0.9, path=None):
+    """Play Optima's side: settle pending orders as synced or rejected."""
+    db = sqlite3.connect(path or get_database_path())
+    try:
+        ids = [row[0] for row in db.execute("SELECT ID_OPERATIONS FROM OPTIMA_Orders WHERE SyncStatus = 0")]
+        db.executemany(
+            "UPDATE OPTIMA_Orders SET SyncStatus = ?, SyncNotes = ? WHERE ID_OPERATIONS = ?",
+            [
+                (1, None, order_id) if random.random() < flt(completed) else (-1, "Rejected by fake server", order_id)
+                for order_id in ids
+            ]
+        )
+        db.commit()
+        return len(ids)
+    finally:
+        db.close()
+
+def is_enabled():
+    return bool(frappe.conf.get("optima_fake_mssql"))
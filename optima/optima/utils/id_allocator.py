@@ -0,0 +1,109 @@
+import frappe
+from frappe.utils import cint
+import threading
+from .connection import get_dedicated_optima_connection
+
+ORDER_ID_SEQUENCE = "dbo.OPTIMA_ORDER_ID_SEQ"
+DEFAULT_ID_BLOCK_SIZE = 20
+
+
+class IdBlockAllocator:
+    """Hands out IDs from blocks reserved on a SQL Server sequence.
+
+    A block is reserved with sp_sequence_get_range, so concurrent workers never
+    receive the same ID and only go to the server once every `block_size` IDs.
+    Sequence values are not transactional: IDs from rolled back or abandoned
+    blocks leave gaps but are never handed out twice.
+    """
+
+    def __init__(self, sequence, block_size=DEFAULT_ID_BLOCK_SIZE):
+        self.sequence = sequence
+        self.block_size = max(cint(block_size), 1)
+        self._next = None
+        self._last = None
+        self._lock = threading.Lock()
+
+    def next_id(self, cursor=None):
+        with self._lock:
+            if self._next is None or self._next > self._last:
+                self._next, self._last = self.reserve_block(cursor)
+            value = self._next
+            self._next += 1
+            return value
+
+    def reserve_block(self, cursor=None):
+        """Reserve the next block, on the caller's cursor when given.
+
+        Sequence values are not rolled back with the caller's transaction, so
+        reserving on its connection is safe and needs no second connection
+        while the caller holds one. Without a cursor a dedicated connection
+        outside the pool is used.
+        """
+        if cursor is not None:
+            return self._get_range(cursor)
+
+        with get_dedicated_optima_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                return self._get_range(cursor)
+            finally:
+                cursor.close()
+
+    def _get_range(self, cursor):
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @first sql_variant, @last sql_variant;
+            EXEC sys.sp_sequence_get_range
+                @sequence_name = N'{self.sequence}',
+                @range_size = %s,
+                @range_first_value = @first OUTPUT,
+                @range_last_value = @last OUTPUT;
+            SELECT CAST(@first AS bigint), CAST(@last AS bigint);
+        """, (self.block_size,))
+        first, last = cursor.fetchone()
+        return int(first), int(last)
+
+
+def ensure_order_id_sequence():
+    """Create the ID_ORDINI sequence once, starting above the current maximum."""
+    with get_dedicated_optima_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                IF OBJECT_ID(N'{ORDER_ID_SEQUENCE}', N'SO') IS NULL
+                BEGIN
+                    BEGIN TRY
+                        DECLARE @start bigint = (
+                            SELECT ISNULL(MAX(ID_ORDINI), 1000) + 1 FROM dbo.OPTIMA_Orders
+                        );
+                        DECLARE @sql nvarchar(max) = N'CREATE SEQUENCE {ORDER_ID_SEQUENCE} AS bigint START WITH '
+                            + CAST(@start AS nvarchar(20)) + N' INCREMENT BY 1 NO CACHE';
+                        EXEC sp_executesql @sql;
+                    END TRY
+                    BEGIN CATCH
+                        -- Another worker created it first
+                        IF ERROR_NUMBER() <> 2714 THROW;
+                    END CATCH
+                END
+            """)
+        finally:
+            cursor.close()
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_order_id_allocator():
+    """Return this worker's ID_ORDINI allocator for the current site."""
+    site = frappe.local.site
+    if site not in _allocators:
+        with _allocators_lock:
+            if site not in _allocators:
+                ensure_order_id_sequence()
+                settings = frappe.get_cached_doc("Optima Settings")
+                _allocators[site] = IdBlockAllocator(
+                    ORDER_ID_SEQUENCE,
+                    block_size=settings.get("order_id_block_size") or DEFAULT_ID_BLOCK_SIZE
+                )
+    return _allocators[site]
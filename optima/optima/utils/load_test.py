@@ -0,0 +1,265 @@
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, get_datetime, now_datetime, nowdate, time_diff_in_seconds
+from frappe.utils.background_jobs import get_queue
+import json
+import random
+import time
+from . import fake_mssql
+from .metrics import LATENCY_PERCENTILES, percentile
+
+LOAD_TEST_PREFIX = "LOAD"  # po_no prefix that tags generated orders
+LOAD_TEST_TTL = 7 * 24 * 60 * 60  # seconds run metadata and samples are kept
+DEFAULT_SAMPLE_INTERVAL = 5  # seconds between queue depth samples
+CLEANUP_TIMEOUT = 60 * 60  # seconds
+ADDRESSES_PER_RUN = 20
+CITIES = (
+    ("Nairobi", "00100"), ("Mombasa", "80100"), ("Kisumu", "40100"),
+    ("Nakuru", "20100"), ("Eldoret", "30100"), ("Thika", "01000")
+)
+
+@frappe.whitelist()
+def start_load_test(count=100, min_lines=1, max_lines=20, line_distribution="skewed",
+        min_width=300, max_width=2400, min_height=300, max_height=3000,
+        orders_per_second=0, duration=600, allow_live=0):
+    """Submit synthetic Sales Orders in the background and sample the pipeline.
+
+    Returns a run ID for get_load_test_report. Orders are pushed to whatever
+    server the site points at, so this refuses to run against the real Optima
+    server unless allow_live is set. Generated orders are tagged with the run
+    ID in po_no and stay on the site until clear_load_test removes them.
+    """
+    frappe.only_for("System Manager")
+    if not fake_mssql.is_enabled() and not cint(allow_live):
+        frappe.throw(_("Enable optima_fake_mssql in site_config.json, or pass allow_live=1 to load the real Optima server"))
+
+    run_id = frappe.generate_hash(length=8)
+    params = {
+        "count": cint(count),
+        "min_lines": max(cint(min_lines), 1),
+        "max_lines": max(cint(max_lines), cint(min_lines), 1),
+        "line_distribution": line_distribution,
+        "width": (flt(min_width), flt(max_width)),
+        "height": (flt(min_height), flt(max_height)),
+        "orders_per_second": flt(orders_per_second)
+    }
+    frappe.cache().set_value(
+        run_key(run_id),
+        {"run_id": run_id, "params": params, "started_at": str(now_datetime())},
+        expires_in_sec=LOAD_TEST_TTL
+    )
+
+    frappe.enqueue(
+        "optima.optima.utils.load_test.generate_orders",
+        queue="long",
+        timeout=cint(duration) + 300,
+        run_id=run_id,
+        **params
+    )
+    frappe.enqueue(
+        "optima.optima.utils.load_test.sample_queue_depth",
+        queue="long",
+        timeout=cint(duration) + 300,
+        run_id=run_id,
+        duration=cint(duration)
+    )
+    return run_id
+
+@frappe.whitelist()
+def clear_load_test(run_id=None):
+    """Queue removal of the Sales Orders and addresses a load test generated.
+
+    Without a run ID, every load test's leftovers go. Only the site is cleaned
+    up: orders already pushed stay on the Optima server.
+    """
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "optima.optima.utils.load_test.delete_load_test_orders",
+        queue="long",
+        timeout=CLEANUP_TIMEOUT,
+        run_id=run_id
+    )
+    frappe.msgprint(_("Load test cleanup has been queued."))
+
+def delete_load_test_orders(run_id=None):
+    """Cancel and delete tagged Sales Orders with their Optima records, then the addresses."""
+    tag = f"{LOAD_TEST_PREFIX}-{run_id}-%" if run_id else f"{LOAD_TEST_PREFIX}-%"
+    deleted = 0
+
+    for name in frappe.get_all("Sales Order", filters={"po_no": ["like", tag]}, pluck="name"):
+        try:
+            so = frappe.get_doc("Sales Order", name)
+            if so.docstatus == 1:
+                so.cancel()
+            frappe.db.delete("Optima Outbox", {"sales_order": name})
+            frappe.db.delete("Optima Sync Log", {"reference_doctype": "Sales Order", "reference_name": name})
+            frappe.delete_doc("Optima Order", name, ignore_permissions=True, force=True, ignore_missing=True)
+            frappe.delete_doc("Sales Order", name, ignore_permissions=True)
+            frappe.db.commit()
+            deleted += 1
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(frappe.get_traceback(), "Optima Load Test Cleanup")
+
+    for address in frappe.get_all("Address", filters={"address_title": ["like", tag]}, pluck="name"):
+        try:
+            frappe.delete_doc("Address", address, ignore_permissions=True)
+            frappe.db.commit()
+        except frappe.LinkExistsError:
+            # Still used by an order that could not be deleted
+            frappe.db.rollback()
+    return deleted
+
+def run_key(run_id, suffix="meta"):
+    return f"optima_load_test|{run_id}|{suffix}"
+
+def generate_orders(run_id, count=100, min_lines=1, max_lines=20, line_distribution="skewed",
+        width=(300, 2400), height=(300, 3000), orders_per_second=0):
+    """Create and submit `count` Sales Orders flagged for Optima."""
+    customers = frappe.get_all("Customer", filters={"disabled": 0}, pluck="name", limit=200)
+    items = frappe.get_all(
+        "Item",
+        filters={"disabled": 0, "is_sales_item": 1, "has_variants": 0},
+        pluck="name",
+        limit=500
+    )
+    if not customers or not items:
+        frappe.throw(_("The load test needs at least one enabled Customer and one sales Item"))
+
+    addresses = make_addresses(run_id, customers)
+    has_dimensions = frappe.get_meta("Sales Order Item").has_field("width")
+    interval = 1 / orders_per_second if orders_per_second else 0
+
+    for idx in range(1, cint(count) + 1):
+        started = time.monotonic()
+        customer = random.choice(customers)
+        so = frappe.get_doc({
+            "doctype": "Sales Order",
+            "customer": customer,
+            "po_no": f"{LOAD_TEST_PREFIX}-{run_id}-{idx:05d}",
+            "transaction_date": nowdate(),
+            "delivery_date": add_days(nowdate(), random.randint(3, 30)),
+            "shipping_address_name": addresses.get(customer),
+            "custom_send_to_optima": 1,
+            "items": [
+                make_order_line(random.choice(items), width, height, has_dimensions)
+                for _line in range(pick_line_count(min_lines, max_lines, line_distribution))
+            ]
+        })
+        so.insert(ignore_permissions=True)
+        so.submit()
+        frappe.db.commit()
+
+        if interval:
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+
+def pick_line_count(min_lines, max_lines, distribution):
+    """Line count for one order; "skewed" gives mostly small orders and a long tail."""
+    if distribution == "skewed":
+        lines = int(random.lognormvariate(0, 1) * (min_lines + max_lines) / 4) + min_lines
+        return min(lines, max_lines)
+    return random.randint(min_lines, max_lines)
+
+def make_order_line(item_code, width, height, has_dimensions):
+    line = {
+        "item_code": item_code,
+        "qty": random.randint(1, 10),
+        "rate": round(random.uniform(500, 5000), 2)
+    }
+    if has_dimensions:
+        # Only sites that carry pane dimensions on Sales Order Item keep these
+        line["width"] = round(random.uniform(*width))
+        line["height"] = round(random.uniform(*height))
+    return line
+
+def make_addresses(run_id, customers):
+    """Give a sample of the customers a synthetic shipping address."""
+    addresses = {}
+    for idx, customer in enumerate(random.sample(customers, min(len(customers), ADDRESSES_PER_RUN)), 1):
+        city, pincode = random.choice(CITIES)
+        address = frappe.get_doc({
+            "doctype": "Address",
+            "address_title": f"{LOAD_TEST_PREFIX}-{run_id}-{idx}",
+            "address_type": "Shipping",
+            "address_line1": f"Plot {random.randint(1, 999)}, Industrial Area",
+            "city": city,
+            "pincode": pincode,
+            "country": frappe.db.get_default("country") or "Kenya",
+            "links": [{"link_doctype": "Customer", "link_name": customer}]
+        }).insert(ignore_permissions=True)
+        addresses[customer] = address.name
+    frappe.db.commit()
+    return addresses
+
+def sample_queue_depth(run_id, duration=600, interval=DEFAULT_SAMPLE_INTERVAL):
+    """Record outbox, RQ and spool depth every `interval` seconds for `duration`."""
+    from .spool import get_spool_status
+
+    cache = frappe.cache()
+    deadline = time.monotonic() + cint(duration)
+    while time.monotonic() < deadline:
+        cache.rpush(run_key(run_id, "samples"), json.dumps({
+            "at": str(now_datetime()),
+            "outbox_pending": frappe.db.count("Optima Outbox", {"status": ["in", ["Pending", "Processing"]]}),
+            "long_queue": get_queue("long").count,
+            "spooled": get_spool_status()["orders"],
+            "synced": frappe.db.count("Sales Order", {
+                "po_no": ["like", f"{LOAD_TEST_PREFIX}-{run_id}-%"],
+                "custom_optima_sync_status": "Completed"
+            })
+        }))
+        # Each sample must see other workers' commits
+        frappe.db.rollback()
+        time.sleep(interval)
+
+    cache.expire(cache.make_key(run_key(run_id, "samples")), LOAD_TEST_TTL)
+
+@frappe.whitelist()
+def get_load_test_report(run_id):
+    """End-to-end throughput, submit-to-sync latency and queue depth for a run."""
+    frappe.only_for("System Manager")
+
+    meta = frappe.cache().get_value(run_key(run_id))
+    if not meta:
+        frappe.throw(_("Load test {0} not found or expired").format(run_id))
+
+    orders = frappe.db.sql("""
+        SELECT so.name, so.creation AS submitted, so.custom_optima_sync_status AS status,
+            sl.synced
+        FROM `tabSales Order` so
+        LEFT JOIN (
+            SELECT reference_name, MIN(modified) AS synced
+            FROM `tabOptima Sync Log`
+            WHERE reference_doctype = 'Sales Order' AND status = 'Completed'
+            GROUP BY reference_name
+        ) sl ON sl.reference_name = so.name
+        WHERE so.po_no LIKE %s AND so.docstatus = 1
+    """, (f"{LOAD_TEST_PREFIX}-{run_id}-%",), as_dict=True)
+
+    synced = [order for order in orders if order.synced]
+    latencies = sorted(time_diff_in_seconds(order.synced, order.submitted) for order in synced)
+
+    throughput = None
+    if synced:
+        window = time_diff_in_seconds(
+            max(get_datetime(order.synced) for order in synced),
+            min(get_datetime(order.submitted) for order in orders)
+        )
+        throughput = round(len(synced) / window, 2) if window else None
+
+    return {
+        "run_id": run_id,
+        "params": meta["params"],
+        "started_at": meta["started_at"],
+        "submitted": len(orders),
+        "synced": len(synced),
+        "failed": sum(1 for order in orders if order.status == "Failed"),
+        "orders_per_second": throughput,
+        "submit_to_sync_seconds": {
+            **{f"p{pct}": percentile(latencies, pct) for pct in LATENCY_PERCENTILES},
+            "max": latencies[-1] if latencies else None
+        },
+        "queue_depth": [
+            json.loads(sample) for sample in frappe.cache().lrange(run_key(run_id, "samples"), 0, -1)
+        ]
+    }
@@ -0,0 +1,69 @@
+import frappe
+from frappe.utils import cint
+from .connection import get_optima_connection
+
+DEFAULT_FETCH_CHUNK_SIZE = 1000
+
+# Column names follow what insert_item_to_external_db/insert_customer_to_external_db
+# write: the article code lives in GMCQ_BARCODE and its description in NOTES.
+# ITEMS carries no price, so prices stay with ERPNext.
+# Watermark is the last-change column used for delta syncs.
+ITEMS_QUERY = """
+    SELECT GMCQ_BARCODE AS ItemCode, NOTES AS Description, LASTDATE AS Watermark
+    FROM ITEMS
+    WHERE GMCQ_BARCODE IS NOT NULL
+"""
+ITEMS_WATERMARK_COLUMN = "LASTDATE"
+
+CUSTOMERS_QUERY = """
+    SELECT Code AS CustomerCode, Description AS CustomerName, TimeStamp AS Watermark
+    FROM ERP_Customers
+    WHERE Code IS NOT NULL
+"""
+CUSTOMERS_WATERMARK_COLUMN = "TimeStamp"
+
+def get_fetch_chunk_size():
+    """Rows fetched per round trip while streaming master data."""
+    settings = frappe.get_cached_doc("Optima Settings")
+    return cint(settings.get("fetch_chunk_size")) or DEFAULT_FETCH_CHUNK_SIZE
+
+def stream_rows(query, params=None, chunk_size=None):
+    """Yield the rows of `query` one by one, fetching `chunk_size` rows at a time.
+
+    Only one chunk is held in memory, so a full catalog sync stays flat no matter
+    how many rows Optima returns.
+    """
+    chunk_size = cint(chunk_size) or get_fetch_chunk_size()
+
+    with get_optima_connection() as conn:
+        cursor = conn.cursor(as_dict=True)
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield frappe._dict(row)
+        finally:
+            cursor.close()
+
+def changed_since(query, watermark_column, since):
+    """Restrict `query` to rows changed at or after `since`.
+
+    The comparison is inclusive so rows sharing the last watermark are not missed;
+    they are already mapped and get skipped by the sync.
+    """
+    if not since:
+        return query, None
+    return f"{query} AND {watermark_column} >= %s ORDER BY {watermark_column}", (since,)
+
+def fetch_optima_items(chunk_size=None, since=None):
+    """Stream Optima articles as rows with ItemCode, Description and Watermark."""
+    query, params = changed_since(ITEMS_QUERY, ITEMS_WATERMARK_COLUMN, since)
+    return stream_rows(query, params, chunk_size=chunk_size)
+
+def fetch_optima_customers(chunk_size=None, since=None):
+    """Stream Optima customers as rows with CustomerCode, CustomerName and Watermark."""
+    query, params = changed_since(CUSTOMERS_QUERY, CUSTOMERS_WATERMARK_COLUMN, since)
+    return stream_rows(query, params, chunk_size=chunk_size)
@@ -0,0 +1,94 @@
+import frappe
+from frappe.utils import cint
+import time
+from contextlib import contextmanager
+
+LATENCY_SAMPLE_SIZE = 1000  # rolling window kept per stage
+LATENCY_PERCENTILES = (50, 95, 99)
+ORDER_SYNC_METRIC = "order_sync"
+
+class StageTimer:
+    """Collect wall-clock durations, in milliseconds, of named stages."""
+
+    def __init__(self):
+        self.spans = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.spans[name] = round(self.spans.get(name, 0) + elapsed, 2)
+
+    @property
+    def total(self):
+        return round((time.perf_counter() - self._started) * 1000, 2)
+
+    def as_dict(self):
+        return {**self.spans, "total": self.total}
+
+def _samples_key(metric, stage):
+    return f"optima_latency|{metric}|{stage}"
+
+def record_stage_timings(metric, spans):
+    """Push one run's spans into the rolling per-stage samples in Redis."""
+    cache = frappe.cache()
+    try:
+        pipe = cache.pipeline()
+        for stage, duration in spans.items():
+            key = cache.make_key(_samples_key(metric, stage))
+            pipe.lpush(key, duration)
+            pipe.ltrim(key, 0, LATENCY_SAMPLE_SIZE - 1)
+        pipe.sadd(cache.make_key(_samples_key(metric, "stages")), *spans.keys())
+        pipe.execute()
+    except Exception:
+        # Metrics must never fail the sync they measure
+        frappe.log_error(frappe.get_traceback(), "Optima Latency Metrics")
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of already sorted samples."""
+    if not samples:
+        return None
+    rank = max(int(-(-pct * len(samples) // 100)), 1)
+    return samples[rank - 1]
+
+def get_stage_percentiles(metric):
+    cache = frappe.cache()
+    stages = sorted(
+        stage.decode() if isinstance(stage, bytes) else stage
+        for stage in cache.smembers(_samples_key(metric, "stages"))
+    )
+
+    stats = {}
+    for stage in stages:
+        samples = sorted(float(value) for value in cache.lrange(_samples_key(metric, stage), 0, -1))
+        if not samples:
+            continue
+        stats[stage] = {
+            "count": len(samples),
+            **{f"p{pct}": percentile(samples, pct) for pct in LATENCY_PERCENTILES},
+            "max": samples[-1]
+        }
+    return stats
+
+def clear_stage_timings(metric):
+    cache = frappe.cache()
+    stages_key = _samples_key(metric, "stages")
+    keys = [
+        _samples_key(metric, stage.decode() if isinstance(stage, bytes) else stage)
+        for stage in cache.smembers(stages_key)
+    ]
+    cache.delete_value(keys + [stages_key])
+
+@frappe.whitelist()
+def get_sync_latency_stats(metric=ORDER_SYNC_METRIC, reset=0):
+    """Return rolling p50/p95/p99 latencies, in milliseconds, per sync stage."""
+    frappe.only_for("System Manager")
+
+    stats = get_stage_percentiles(metric)
+    if cint(reset):
+        clear_stage_timings(metric)
+    return {"metric": metric, "window": LATENCY_SAMPLE_SIZE, "stages": stats}
@@ -1,20 +1,64 @@
 import frappe
 from frappe import _
+from frappe.utils import flt
 from frappe.utils.background_jobs import enqueue
 from .connection import get_optima_connection
+from .id_allocator import get_order_id_allocator
+from .metrics import ORDER_SYNC_METRIC, StageTimer, record_stage_timings
+import hashlib
+import json
 import random
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta
 
+ORDER_LINE_COLUMNS = (
+    "ID_ORDINI", "RIGA", "QTAPZ", "DESCR_MAT_COMP",
+    "COD_ART_CLIENTE", "DESCMAT", "SAGOMA", "CODICE_ANAGRAFICA",
+    "DIMXPZ", "DIMYPZ", "ID_UM", "isrect", "PRODOTTI_CODICE"
+)
+MAX_INSERT_PARAMS = 2099  # SQL Server allows at most 2100 parameters per request
+MAX_INSERT_ROWS = 1000  # and at most 1000 row constructors per VALUES clause
+ORDER_ITEM_FIELDS = (
+    "item_code", "item_name", "description", "qty", "rate", "amount", "optima_sync_status"
+)
+ORDER_ITEM_FLOAT_FIELDS = ("qty", "rate", "amount")
+ORDER_SYNC_JOB_TIMEOUT = 300  # seconds
+# Outlives the job timeout so a slow push can't lose its lock mid-run, but still
+# expires if the worker dies without releasing it
+ORDER_SYNC_LOCK_TIMEOUT = 2 * ORDER_SYNC_JOB_TIMEOUT
+# Assigned per push, so they are left out of the payload hash
+PUSH_ASSIGNED_FIELDS = ("RIFCLI", "ID_ORDINI")
+# Optima Order sync statuses of an order that was written to Optima: In Progress
+# until the status poller sees Optima accept it, then Completed
+PUSHED_SYNC_STATUSES = ("In Progress", "Completed")
+
+class OrderSyncLocked(frappe.ValidationError):
+    pass
+
 @frappe.whitelist()
 def enqueue_optima_order_sync(sales_order):
-    """Enqueue the Optima order sync process."""
-    enqueue(
+    """Enqueue the Optima order sync process.
+
+    Repeated calls while a job for the same Sales Order is still queued or
+    running are collapsed into that job.
+    """
+    job = enqueue(
         method="optima.optima.utils.order_sync.sync_sales_order_to_optima_by_name",
         queue="long",
-        timeout=300,
+        timeout=ORDER_SYNC_JOB_TIMEOUT,
         job_name=f"sync_optima_order_{sales_order}",
+        job_id=f"sync_optima_order_{sales_order}",
+        deduplicate=True,
         sales_order=sales_order
     )
+
+    if not job:
+        frappe.msgprint(
+            msg=_('A sync for this order is already queued or running.'),
+            title=_('Order Sync Queued'),
+            indicator='orange'
+        )
+        return
     
     frappe.msgprint(
         msg=_('Order sync has been queued and will be sent to Optima in the background.'),
@@ -22,61 +66,134 @@ def enqueue_optima_order_sync(sales_order):
         indicator='blue'
     )
 
-def sync_sales_order_to_optima_by_name(sales_order):
+def sync_sales_order_to_optima_by_name(sales_order, force=False):
     """Wrapper function to sync sales order by name."""
     doc = frappe.get_doc("Sales Order", sales_order)
-    return sync_sales_order_to_optima(doc)
+    try:
+        return sync_sales_order_to_optima(doc, force=force)
+    except OrderSyncLocked as e:
+        # Another worker is pushing this order right now, its result stands
+        return {"success": False, "skipped": True, "message": str(e)}
+
+
+@contextmanager
+def order_sync_lock(sales_order):
+    """Hold the per-order sync lock in Redis, or raise OrderSyncLocked."""
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(f"optima_order_sync|{sales_order}"), timeout=ORDER_SYNC_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        raise OrderSyncLocked(_("Sales Order {0} is already being synced to Optima").format(sales_order))
+
+    try:
+        yield
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            # Already expired and possibly taken over by another worker
+            pass
 
 def prepare_order_header(doc, shipping_details):
-    """Prepare order header data matching Optima_Orders schema."""
+    """Prepare order header data matching Optima_Orders schema.
+
+    RIFCLI and ID_ORDINI are assigned at push time and are not part of the header.
+    """
     return {
-        "CLIENTE": 44934,  # Assuming a default customer ID; replace with actual logic if available
-        "NAZIONI_CODICE": None,
-        "RIF": doc.name[:12],  # Truncate to 12 characters to match SQL type
-        "RIFCLI": doc.po_no or '',
+        "CLIENTE": 1,
         "DATAORD": doc.transaction_date,
-        "DATACONS": doc.delivery_date,
-        "DATAINIZIO": doc.transaction_date,
-        "DATAFINE": doc.delivery_date,
+        "DATACONS": doc.delivery_date or (doc.transaction_date + timedelta(days=7)),
         "DEF": 'Y',  # Confirmed order
-        "NOTES": "Test",  # Default value, can be customized
-        "DESCR1_SPED": shipping_details.get("address_line1", "")[:40],
-        "DESCR2_SPED": doc.customer_name[:40],
-        "INDIRI_SPED": shipping_details.get("address_line1", "")[:64],
-        "CAP_SPED": (shipping_details.get("pincode") or "")[:30],
-        "LOCALITA_SPED": (shipping_details.get("city") or "")[:30],
-        "PROV_SPED": (shipping_details.get("state") or "")[:30],
-        "COMMESSA_CLI": doc.name[:50],
-        "RIFINTERNO": doc.name[:50],
-        "RIFAGENTE": frappe.session.user[:50],
-        "DESCR_TIPICAUDOC": 'Sales Order'
+        "NOTES": doc.name[:64],
+        "DESCR_TIPICAUDOC": 'SALES',
+        "DESCR1_SPED": shipping_details["address_line1"][:40] or "",
+        "DESCR2_SPED": doc.customer_name[:40] or "",
+        "INDIRI_SPED": shipping_details["address_line1"][:64] or "",
+        "CAP_SPED": shipping_details["pincode"][:30] or "",
+        "LOCALITA_SPED": shipping_details["city"][:30] or "",
+        "PROV_SPED": shipping_details["state"][:30] or ""
     }
 
+def insert_order_header(cursor, header):
+    """Insert an OPTIMA_Orders row and return its identity in the same round trip.
+
+    SCOPE_IDENTITY() is read in the same batch as the INSERT, so no separate
+    SELECT @@IDENTITY is needed and the value cannot come from a row inserted by a
+    trigger. OUTPUT INSERTED is not used because SQL Server rejects it without
+    INTO on tables that have triggers.
+    """
+    columns = list(header)
+    cursor.execute(f"""
+        SET NOCOUNT ON;
+        INSERT INTO OPTIMA_Orders ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))});
+        SELECT CAST(SCOPE_IDENTITY() AS bigint);
+    """, tuple(header[column] for column in columns))
+    return cursor.fetchone()[0]
+
 def prepare_order_line(idx, item, order_id):
     """Prepare order line data matching Optima_OrderLines schema."""
+    description = item.description or item.item_name
     return {
         "ID_ORDINI": order_id,
         "RIGA": idx,
-        "QTAPZ": item.qty,
-        "DESCR_MAT_COMP": item.description[:512] if item.description else item.item_name[:512],
+        "QTAPZ": int(item.qty),
+        "DESCR_MAT_COMP": description[:512],
         "COD_ART_CLIENTE": item.item_code[:512],
-        "DESCMAT": item.description[:1024] if item.description else item.item_name[:1024],
+        "DESCMAT": description[:1024],
         "SAGOMA": 'RECT',  # Default rectangle shape
         "CODICE_ANAGRAFICA": item.item_code[:32],
-        "CATEGORIE": item.item_group[:255] if item.item_group else '',
-        "DIMXPZ": item.get('width', 20),
-        "DIMYPZ": item.get('height', 50),
+        "DIMXPZ": float(item.get('width', 1000)),
+        "DIMYPZ": float(item.get('height', 2000)),
         "ID_UM": 0,  # 0=mm
-        "PRODOTTI_CODICE": item.item_code[:32],
-        "isrect": 1  # 1=Rectangle, 0=Shaped
+        "isrect": 1,  # 1=Rectangle, 0=Shaped
+        "PRODOTTI_CODICE": item.item_code[:32]
     }
 
-def get_next_order_id(cursor):
-    """Get the next available order ID from OPTIMA_Orders."""
+def insert_order_lines(cursor, lines):
+    """Insert prepared order lines using chunked multi-row INSERT statements.
+
+    Each statement carries as many rows as fit under SQL Server's limit of 2100
+    parameters and 1000 row constructors, so a 500-line order costs 4 round trips
+    instead of 500.
+    """
+    columns = ORDER_LINE_COLUMNS
+    rows_per_statement = min(MAX_INSERT_ROWS, MAX_INSERT_PARAMS // len(columns))
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+    for start in range(0, len(lines), rows_per_statement):
+        chunk = lines[start:start + rows_per_statement]
+        cursor.execute(
+            f"INSERT INTO OPTIMA_OrderLines ({', '.join(columns)}) VALUES "
+            + ", ".join([row_placeholder] * len(chunk)),
+            tuple(line[column] for line in chunk for column in columns)
+        )
+
+def compute_payload_hash(header, lines):
+    """SHA-256 of the canonical JSON of an order's header and lines.
+
+    Fields assigned at push time are excluded, so the hash only changes when
+    the content sent to Optima would change.
+    """
+    def strip(row):
+        return {key: value for key, value in row.items() if key not in PUSH_ASSIGNED_FIELDS}
+
+    payload = json.dumps(
+        {"header": strip(header), "lines": [strip(line) for line in lines]},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def get_next_order_id(cursor=None):
+    """Get the next available order ID for OPTIMA_Orders.
+
+    IDs come from blocks reserved on a SQL Server sequence and are handed out
+    from memory, so this no longer scans MAX(ID_ORDINI) and cannot return the
+    same ID to two workers. A new block is reserved on `cursor` when given.
+    """
     try:
-        cursor.execute("SELECT ISNULL(MAX(ID_ORDINI), 1000) + 1 FROM CONNECTOR_ORDERS.dbo.OPTIMA_Orders")
-        next_id = cursor.fetchone()[0]
-        return next_id
+        return get_order_id_allocator().next_id(cursor)
     except Exception as e:
         frappe.log_error(f"Error generating order ID: {str(e)}")
         raise
@@ -153,221 +270,376 @@ def create_sync_log(doc, operation_id, status, message=None):
     log.insert(ignore_permissions=True)
     return log
 
-def sync_sales_order_to_optima(doc):
-    """Sync Sales Order to Optima."""
+def get_order_item_rows(doc, sync_status):
+    """Optima Order Item rows mirroring the Sales Order items."""
+    return [{
+        "item_code": item.item_code,
+        "item_name": item.item_name,
+        "description": item.description or item.item_name,
+        "qty": item.qty,
+        "rate": item.rate,
+        "amount": item.amount,
+        "optima_sync_status": sync_status
+    } for item in doc.items]
+
+def save_optima_order(name, order_data, items):
+    """Insert the local Optima Order, or update it in place when `name` exists.
+
+    Document.save() deletes and reinserts every child row, so an existing
+    order has its fields set directly and only the item rows that differ are
+    written.
+    """
+    if not name:
+        frappe.get_doc({
+            "doctype": "Optima Order",
+            **order_data,
+            "items": items
+        }).insert()
+        return
+
+    reconcile_order_items(name, items)
+    frappe.db.set_value("Optima Order", name, order_data)
+
+def reconcile_order_items(parent, items):
+    """Update, insert and delete Optima Order Item rows so they match `items`.
+
+    Rows are matched by row index and only differing fields are written. Rows
+    that need the same change, e.g. every line flipping to Failed, share one
+    UPDATE. Returns the number of rows touched.
+    """
+    existing = {
+        row.idx: row
+        for row in frappe.get_all(
+            "Optima Order Item",
+            filters={"parent": parent, "parenttype": "Optima Order", "parentfield": "items"},
+            fields=["name", "idx", *ORDER_ITEM_FIELDS]
+        )
+    }
+
+    updates = {}
+    inserted = 0
+    for idx, item in enumerate(items, 1):
+        row = existing.pop(idx, None)
+        if not row:
+            frappe.get_doc({
+                "doctype": "Optima Order Item",
+                "parent": parent,
+                "parenttype": "Optima Order",
+                "parentfield": "items",
+                "idx": idx,
+                **item
+            }).db_insert()
+            inserted += 1
+            continue
+
+        changes = tuple(
+            (field, item.get(field))
+            for field in ORDER_ITEM_FIELDS
+            if not order_item_value_equal(field, row.get(field), item.get(field))
+        )
+        if changes:
+            updates.setdefault(changes, []).append(row.name)
+
+    for changes, names in updates.items():
+        frappe.db.set_value("Optima Order Item", {"name": ["in", names]}, dict(changes))
+
+    # Whatever is left was beyond the end of the new item list
+    removed = [row.name for row in existing.values()]
+    if removed:
+        frappe.db.delete("Optima Order Item", {"name": ["in", removed]})
+
+    return inserted + sum(len(names) for names in updates.values()) + len(removed)
+
+def order_item_value_equal(field, current, new):
+    if field in ORDER_ITEM_FLOAT_FIELDS:
+        return flt(current) == flt(new)
+    return (current or "") == (new or "")
+
+def record_sync_timings(sync_log, timer):
+    """Store a finished sync's stage timings on its log and in the rolling histograms."""
+    timings = timer.as_dict()
+    if sync_log:
+        # Written after the local commit so that stage is included too
+        frappe.db.set_value("Optima Sync Log", sync_log.name, {
+            "duration_ms": timings["total"],
+            "stage_timings": frappe.as_json(timings)
+        }, update_modified=False)
+        frappe.db.commit()
+
+    record_stage_timings(ORDER_SYNC_METRIC, timings)
+
+def get_shipping_details(doc):
+    """Get shipping details with default values."""
+    shipping_address = frappe.get_doc("Address", doc.shipping_address_name) if doc.shipping_address_name else None
+    return {
+        "address_line1": (shipping_address.address_line1 if shipping_address else "") or "",
+        "city": (shipping_address.city if shipping_address else "") or "",
+        "pincode": (shipping_address.pincode if shipping_address else "") or "",
+        "state": (shipping_address.state if shipping_address else "") or "",
+        "country": (shipping_address.country if shipping_address else "") or ""
+    }
+
+def write_order_to_optima(cursor, header, lines, timer=None):
+    """Assign RIFCLI and ID_ORDINI, then insert the header and its lines.
+
+    The caller owns the transaction. Returns the new order's order_id,
+    id_ordini and order_ref.
+    """
+    timer = timer or StageTimer()
+
+    # Generate order reference (12 chars max)
+    order_ref = f"S{datetime.now().strftime('%y%m%d%H%M')}"  # e.g. S2411141023
+    with timer.stage("allocate_id"):
+        id_ordini = get_next_order_id(cursor)
+
+    # Insert into OPTIMA_Orders
+    with timer.stage("header_insert"):
+        order_id = insert_order_header(cursor, {**header, "RIFCLI": order_ref, "ID_ORDINI": id_ordini})
+
+    # Insert order lines into OPTIMA_OrderLines
+    with timer.stage("line_insert"):
+        insert_order_lines(cursor, [{**line, "ID_ORDINI": id_ordini} for line in lines])
+
+    return frappe._dict(order_id=order_id, id_ordini=id_ordini, order_ref=order_ref)
+
+def save_synced_order(doc, optima_order, shipping_details, push, payload_hash, sync_log=None):
+    """Record a committed push on the Optima Order, the sync log and the Sales Order."""
+    order_data = {
+        "sales_order": doc.name,
+        "customer": doc.customer,
+        "customer_reference": doc.po_no or "",
+        "order_date": doc.transaction_date,
+        "delivery_date": doc.delivery_date,
+        # Settled by the status poller once Optima has processed the order
+        "status": "Pending",
+        "sync_status": "In Progress",
+        "sync_message": f"Order synced successfully. Optima Order ID: {push.order_id}",
+        "order_number": push.order_ref,
+        "internal_reference": doc.name,
+        "agent_reference": frappe.session.user,
+        "notes": doc.name[:64],
+        "delivery_description_1": shipping_details["address_line1"][:40] or "",
+        "delivery_description_2": doc.customer_name[:40] or "",
+        "delivery_address": shipping_details["address_line1"] or "",
+        "delivery_zip": shipping_details["pincode"] or "",
+        "delivery_city": shipping_details["city"] or "",
+        "delivery_country": shipping_details["country"] or "",
+        "optima_order_id": str(push.order_id),
+        "optima_operation_id": str(push.order_id),
+        "payload_hash": payload_hash,
+        # A new push starts status polling from scratch
+        "next_status_check": None,
+        "status_check_attempts": 0,
+        "optima_sync_details": frappe.as_json({
+            "order_id": push.order_id,
+            "id_ordini": push.id_ordini,
+            "order_ref": push.order_ref,
+            "sync_time": str(datetime.now())
+        })
+    }
+
+    save_optima_order(optima_order, order_data, get_order_item_rows(doc, "Synced"))
+
+    # Update sync log
+    if sync_log:
+        sync_log.status = "Completed"
+        sync_log.operation_id = push.order_id
+        sync_log.save()
+
+    # Update ERPNext status
+    frappe.db.set_value('Sales Order', doc.name, {
+        'custom_optima_sync_status': 'Completed',
+        'custom_optima_order': push.order_id
+    })
+
+def record_pushed_order(sales_order, optima_order, shipping_details, push, payload_hash,
+        sync_log=None, message=None, doc=None):
+    """Record a push that is already committed in Optima, one order per commit.
+
+    Never raises: the order exists in Optima now, so a failure here must not
+    lead to a retry that would create it there a second time. If the full
+    bookkeeping fails, the Optima IDs are still stored on the Sales Order and
+    the failure is logged for reconciliation. Returns True if it was saved in full.
+    """
+    try:
+        doc = doc or frappe.get_doc("Sales Order", sales_order)
+        log = None
+        if sync_log and frappe.db.exists("Optima Sync Log", sync_log):
+            log = frappe.get_doc("Optima Sync Log", sync_log)
+            if message:
+                log.message = message
+        save_synced_order(doc, optima_order, shipping_details, push, payload_hash, log)
+        frappe.db.commit()
+        return True
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(
+            f"Sales Order {sales_order} was pushed to Optima as order {push.order_id} "
+            f"(ID_ORDINI {push.id_ordini}, RIFCLI {push.order_ref}) but recording it locally failed. "
+            f"Reconcile it by hand instead of pushing it again.\n\n{frappe.get_traceback()}",
+            "Optima Order Reconciliation"
+        )
+
+    try:
+        mark_pushed_order(sales_order, optima_order, push, payload_hash)
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Optima Order Reconciliation")
+    return False
+
+def mark_pushed_order(sales_order, optima_order, push, payload_hash):
+    """Store just the Optima IDs of a push, with plain column updates that rarely fail."""
+    frappe.db.set_value('Sales Order', sales_order, {
+        'custom_optima_sync_status': 'Completed',
+        'custom_optima_order': push.order_id
+    })
+    if optima_order:
+        frappe.db.set_value("Optima Order", optima_order, {
+            "status": "Pending",
+            "sync_status": "In Progress",
+            "next_status_check": None,
+            "status_check_attempts": 0,
+            "order_number": push.order_ref,
+            "optima_order_id": str(push.order_id),
+            "optima_operation_id": str(push.order_id),
+            "payload_hash": payload_hash
+        })
+
+def spool_unreachable_order(doc, error, header, lines, shipping_details, payload_hash):
+    """Write the prepared order to the local spool because Optima can't be reached."""
+    from .spool import spool_order
+
+    sync_log = create_sync_log(
+        doc, None, "Pending", f"Optima unreachable, spooled for replay: {str(error)[:100]}"
+    )
+    spool_order(doc.name, header, lines, shipping_details, payload_hash, sync_log.name)
+
+    frappe.db.set_value('Sales Order', doc.name, 'custom_optima_sync_status', 'Pending')
+    frappe.db.commit()
+
+    return {"success": False, "spooled": True, "message": str(error)}
+
+def skip_unchanged_order(doc, optima_order):
+    """Close out a sync whose payload matches the last successful push.
+
+    Nothing is sent and no sync log is written, so re-saving an unchanged
+    order costs no connection at all.
+    """
+    frappe.db.set_value('Sales Order', doc.name, {
+        'custom_optima_sync_status': 'Completed',
+        'custom_optima_order': optima_order.optima_order_id
+    })
+    frappe.db.commit()
+
+    return {"success": True, "order_id": optima_order.optima_order_id, "skipped": True}
+
+def record_failed_sync(doc, sync_log, timer, error):
+    """Mark the sync log, the Optima Order and the Sales Order as failed."""
+    if sync_log:
+        sync_log.status = "Failed"
+        sync_log.message = str(error)[:140]
+        sync_log.duration_ms = timer.total
+        sync_log.stage_timings = frappe.as_json(timer.as_dict())
+        sync_log.save()
+    
+    # Create/Update Optima Order with error status
+    optima_order = frappe.db.get_value("Optima Order", {"sales_order": doc.name})
+
+    error_data = {
+        "sales_order": doc.name,
+        "customer": doc.customer,
+        "status": "Failed",
+        "sync_status": "Failed",
+        "sync_message": str(error)[:140]
+    }
+
+    save_optima_order(optima_order, error_data, get_order_item_rows(doc, "Failed"))
+    
+    frappe.db.set_value('Sales Order', doc.name, {
+        'custom_optima_sync_status': 'Failed',
+        'custom_optima_sync_error': str(error)[:140]
+    })
+    frappe.db.commit()
+
+def sync_sales_order_to_optima(doc, conn=None, force=False):
+    """Sync Sales Order to Optima.
+
+    Pass `conn` to reuse a connection that is already checked out, e.g. when the
+    outbox dispatcher pushes a batch of orders. An order whose header and lines
+    hash the same as its last successful push is not written again unless
+    `force` is set. Raises OrderSyncLocked if another worker holds the order.
+    """
     sync_log = None
+    timer = StageTimer()
     
-    with get_optima_connection() as conn:
+    with ExitStack() as stack:
+        # Taken before anything is written so two workers never push, or update
+        # the Optima Order of, the same Sales Order at once
+        stack.enter_context(order_sync_lock(doc.name))
+
         try:
-            cursor = conn.cursor()
-            
-            # Create sync log
-            sync_log = create_sync_log(doc, None, "Pending")
-            
             # Get shipping details with default values
-            shipping_address = frappe.get_doc("Address", doc.shipping_address_name) if doc.shipping_address_name else None
-            shipping_details = {
-                "address_line1": (shipping_address.address_line1 if shipping_address else "") or "",
-                "city": (shipping_address.city if shipping_address else "") or "",
-                "pincode": (shipping_address.pincode if shipping_address else "") or "",
-                "state": (shipping_address.state if shipping_address else "") or "",
-                "country": (shipping_address.country if shipping_address else "") or ""
-            }
-
-            # Generate order reference (12 chars max)
-            order_ref = f"S{datetime.now().strftime('%y%m%d%H%M')}"  # e.g. S2411141023
-            
-            # Insert into OPTIMA_Orders
-            cursor.execute("""
-                INSERT INTO OPTIMA_Orders (
-                    CLIENTE, RIFCLI, DATAORD, DATACONS, DEF, NOTES, ID_ORDINI,
-                    DESCR_TIPICAUDOC, DESCR1_SPED, DESCR2_SPED, INDIRI_SPED,
-                    CAP_SPED, LOCALITA_SPED, PROV_SPED
-                ) VALUES (
-                    1, %s, %s, %s, 'Y', %s, 1,
-                    'SALES', %s, %s, %s,
-                    %s, %s, %s
-                )
-            """, (
-                order_ref,  # RIFCLI
-                doc.transaction_date,  # DATAORD
-                doc.delivery_date or (doc.transaction_date + timedelta(days=7)),  # DATACONS
-                doc.name[:64],  # NOTES
-                shipping_details["address_line1"][:40] or "",  # DESCR1_SPED
-                doc.customer_name[:40] or "",  # DESCR2_SPED
-                shipping_details["address_line1"][:64] or "",  # INDIRI_SPED
-                shipping_details["pincode"][:30] or "",  # CAP_SPED
-                shipping_details["city"][:30] or "",  # LOCALITA_SPED
-                shipping_details["state"][:30] or ""  # PROV_SPED
-            ))
-            
-            # Get the ID of inserted order
-            cursor.execute("SELECT @@IDENTITY")
-            order_id = cursor.fetchone()[0]
-            
-            # Insert order lines into OPTIMA_OrderLines
-            for idx, item in enumerate(doc.items, 1):
-                cursor.execute("""
-                    INSERT INTO OPTIMA_OrderLines (
-                        ID_ORDINI, RIGA, QTAPZ, DESCR_MAT_COMP,
-                        COD_ART_CLIENTE, DESCMAT, SAGOMA, CODICE_ANAGRAFICA,
-                        DIMXPZ, DIMYPZ, ID_UM, isrect, PRODOTTI_CODICE
-                    ) VALUES (
-                        %s, %s, %s, %s,
-                        %s, %s, 'RECT', %s,
-                        %s, %s, 0, 1, %s
-                    )
-                """, (
-                    order_id,  # ID_ORDINI
-                    idx,  # RIGA
-                    int(item.qty),  # QTAPZ
-                    item.description[:512] or item.item_name[:512],  # DESCR_MAT_COMP
-                    item.item_code[:512],  # COD_ART_CLIENTE
-                    item.description[:1024] or item.item_name[:1024],  # DESCMAT
-                    item.item_code[:32],  # CODICE_ANAGRAFICA
-                    float(item.get('width', 1000)),  # DIMXPZ
-                    float(item.get('height', 2000)),  # DIMYPZ
-                    item.item_code[:32]  # PRODOTTI_CODICE
-                ))
-            
-            # Commit transaction
-            conn.commit()
+            shipping_details = get_shipping_details(doc)
 
-            # Create or update Optima Order
-            optima_order = frappe.get_all(
+            # Build the payload first so unchanged orders need no connection or sync log
+            header = prepare_order_header(doc, shipping_details)
+            lines = [prepare_order_line(idx, item, None) for idx, item in enumerate(doc.items, 1)]
+            payload_hash = compute_payload_hash(header, lines)
+
+            optima_order = frappe.db.get_value(
                 "Optima Order",
-                filters={"sales_order": doc.name},
-                limit=1
+                {"sales_order": doc.name},
+                ["name", "sync_status", "payload_hash", "optima_order_id"],
+                as_dict=True
             )
+        except Exception as e:
+            record_failed_sync(doc, None, timer, e)
+            raise
 
-            order_data = {
-                "sales_order": doc.name,
-                "customer": doc.customer,
-                "customer_reference": doc.po_no or "",
-                "order_date": doc.transaction_date,
-                "delivery_date": doc.delivery_date,
-                "status": "Completed",
-                "sync_status": "Completed",
-                "sync_message": f"Order synced successfully. Optima Order ID: {order_id}",
-                "order_number": order_ref,
-                "internal_reference": doc.name,
-                "agent_reference": frappe.session.user,
-                "notes": doc.name[:64],
-                "delivery_description_1": shipping_details["address_line1"][:40] or "",
-                "delivery_description_2": doc.customer_name[:40] or "",
-                "delivery_address": shipping_details["address_line1"] or "",
-                "delivery_zip": shipping_details["pincode"] or "",
-                "delivery_city": shipping_details["city"] or "",
-                "delivery_country": shipping_details["country"] or "",
-                "optima_order_id": str(order_id),
-                "optima_operation_id": str(order_id),
-                "optima_sync_details": frappe.as_json({
-                    "order_id": order_id,
-                    "order_ref": order_ref,
-                    "sync_time": str(datetime.now())
-                })
-            }
-
-            if optima_order:
-                existing_order = frappe.get_doc("Optima Order", optima_order[0].name)
-                # Clear existing items
-                existing_order.items = []
-                # Add updated items
-                for item in doc.items:
-                    existing_order.append("items", {
-                        "item_code": item.item_code,
-                        "item_name": item.item_name,
-                        "description": item.description or item.item_name,
-                        "qty": item.qty,
-                        "rate": item.rate,
-                        "amount": item.amount,
-                        "optima_sync_status": "Synced"
-                    })
-                existing_order.update(order_data)
-                existing_order.save()
-            else:
-                new_order = frappe.get_doc({
-                    "doctype": "Optima Order",
-                    **order_data,
-                    "items": [{
-                        "item_code": item.item_code,
-                        "item_name": item.item_name,
-                        "description": item.description or item.item_name,
-                        "qty": item.qty,
-                        "rate": item.rate,
-                        "amount": item.amount,
-                        "optima_sync_status": "Synced"
-                    } for item in doc.items]
-                })
-                new_order.insert()
-
-            # Update sync log
-            if sync_log:
-                sync_log.status = "Completed"
-                sync_log.operation_id = order_id
-                sync_log.save()
-
-            # Update ERPNext status
-            frappe.db.set_value('Sales Order', doc.name, {
-                'custom_optima_sync_status': 'Completed',
-                'custom_optima_order': order_id
-            })
-            frappe.db.commit()
+        if (not force and optima_order and optima_order.sync_status in PUSHED_SYNC_STATUSES
+                and optima_order.payload_hash == payload_hash):
+            return skip_unchanged_order(doc, optima_order)
 
-            return {"success": True, "order_id": order_id}
+        with timer.stage("connect"):
+            try:
+                conn = conn or stack.enter_context(get_optima_connection())
+            except Exception as e:
+                # Optima is unreachable, keep the prepared payload on disk for replay
+                return spool_unreachable_order(doc, e, header, lines, shipping_details, payload_hash)
+
+        try:
+            cursor = conn.cursor()
+            
+            # Create sync log
+            sync_log = create_sync_log(doc, None, "Pending")
+
+            push = write_order_to_optima(cursor, header, lines, timer)
+            
+            # Commit transaction
+            with timer.stage("mssql_commit"):
+                conn.commit()
 
         except Exception as e:
             if conn:
                 conn.rollback()
-            
-            if sync_log:
-                sync_log.status = "Failed"
-                sync_log.message = str(e)[:140]
-                sync_log.save()
-            
-            # Create/Update Optima Order with error status
-            optima_order = frappe.get_all(
-                "Optima Order",
-                filters={"sales_order": doc.name},
-                limit=1
+            record_failed_sync(doc, sync_log, timer, e)
+            raise
+
+        # The order is committed in Optima from here on. Recording it locally
+        # must not raise, or the caller would retry and push it a second time.
+        with timer.stage("local_save"):
+            record_pushed_order(
+                doc.name,
+                optima_order.name if optima_order else None,
+                shipping_details,
+                push,
+                payload_hash,
+                sync_log=sync_log.name,
+                doc=doc
             )
 
-            error_data = {
-                "sales_order": doc.name,
-                "customer": doc.customer,
-                "status": "Failed",
-                "sync_status": "Failed",
-                "sync_message": str(e)[:140],
-                "items": [{
-                    "item_code": item.item_code,
-                    "item_name": item.item_name,
-                    "description": item.description or item.item_name,
-                    "qty": item.qty,
-                    "rate": item.rate,
-                    "amount": item.amount,
-                    "optima_sync_status": "Failed"
-                } for item in doc.items]
-            }
-
-            if optima_order:
-                existing_order = frappe.get_doc("Optima Order", optima_order[0].name)
-                existing_order.items = []
-                for item_data in error_data["items"]:
-                    existing_order.append("items", item_data)
-                existing_order.update(error_data)
-                existing_order.save()
-            else:
-                new_order = frappe.get_doc({
-                    "doctype": "Optima Order",
-                    **error_data
-                })
-                new_order.insert()
-            
-            frappe.db.set_value('Sales Order', doc.name, {
-                'custom_optima_sync_status': 'Failed',
-                'custom_optima_sync_error': str(e)[:140]
-            })
-            frappe.db.commit()
-            
-            raise
+        record_sync_timings(sync_log, timer)
+
+        return {"success": True, "order_id": push.order_id}
 
@@ -0,0 +1,193 @@
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, now_datetime
+import time
+from .circuit_breaker import get_optima_circuit
+from .connection import _is_alive, get_optima_connection
+from .order_sync import sync_sales_order_to_optima
+
+DEFAULT_OUTBOX_BATCH_SIZE = 50
+DEFAULT_OUTBOX_FLUSH_INTERVAL = 60  # seconds
+MAX_BATCHES_PER_FLUSH = 20
+MAX_OUTBOX_ATTEMPTS = 5
+DISPATCH_LOCK_TIMEOUT = 15 * 60  # seconds, also the dispatch job's timeout so a killed job's lock expires with it
+
+def get_outbox_settings():
+    """Return (batch_size, flush_interval) from Optima Settings."""
+    settings = frappe.get_cached_doc("Optima Settings")
+    return (
+        cint(settings.get("outbox_batch_size")) or DEFAULT_OUTBOX_BATCH_SIZE,
+        cint(settings.get("outbox_flush_interval")) or DEFAULT_OUTBOX_FLUSH_INTERVAL
+    )
+
+def add_to_outbox(sales_order):
+    """Queue a Sales Order for the next outbox flush.
+
+    The entry is written in the caller's transaction, so an order is only pushed
+    to Optima if the submit that queued it commits.
+    """
+    if frappe.db.exists("Optima Outbox", {"sales_order": sales_order, "status": ["in", ["Pending", "Processing"]]}):
+        return
+
+    frappe.get_doc({
+        "doctype": "Optima Outbox",
+        "sales_order": sales_order,
+        "status": "Pending"
+    }).insert(ignore_permissions=True)
+
+    batch_size, _flush_interval = get_outbox_settings()
+    if frappe.db.count("Optima Outbox", {"status": "Pending"}) >= batch_size:
+        # A full batch is waiting, don't wait for the next scheduled flush
+        enqueue_outbox_dispatch(force=True, enqueue_after_commit=True)
+
+def enqueue_outbox_dispatch(force=False, enqueue_after_commit=False):
+    """Queue an outbox flush on the long queue.
+
+    Runs every minute from the scheduler. A flush can push up to
+    `batch_size * MAX_BATCHES_PER_FLUSH` orders, far more than fits in a
+    scheduler job's timeout on the default queue.
+    """
+    frappe.enqueue(
+        "optima.optima.utils.outbox.dispatch_outbox",
+        queue="long",
+        timeout=DISPATCH_LOCK_TIMEOUT,
+        job_id="optima_outbox_dispatch",
+        deduplicate=True,
+        enqueue_after_commit=enqueue_after_commit,
+        force=force
+    )
+
+def dispatch_outbox(force=False):
+    """Drain pending outbox entries in batches, one Optima connection per batch."""
+    batch_size, flush_interval = get_outbox_settings()
+
+    cache = frappe.cache()
+    last_flush = cache.get_value("optima_outbox_last_flush")
+    if not force and last_flush and time.time() - float(last_flush) < flush_interval:
+        return
+
+    lock = cache.lock(cache.make_key("optima_outbox_dispatch"), timeout=DISPATCH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        # Another worker is already draining the outbox
+        return
+
+    try:
+        reclaim_stale_entries()
+
+        if get_optima_circuit().is_open():
+            # Optima is down, leave everything parked until the circuit half-opens
+            return
+
+        cache.set_value("optima_outbox_last_flush", time.time())
+
+        # Snapshot the queue so entries that fail and go back to Pending are
+        # retried on the next flush rather than in a loop within this one
+        entries = frappe.get_all(
+            "Optima Outbox",
+            filters={"status": "Pending"},
+            fields=["name", "sales_order", "attempts"],
+            order_by="creation asc",
+            limit=batch_size * MAX_BATCHES_PER_FLUSH
+        )
+
+        results = {"completed": 0, "failed": 0, "parked": 0}
+        for start in range(0, len(entries), batch_size):
+            batch_results = dispatch_batch(entries[start:start + batch_size])
+            for key in results:
+                results[key] += batch_results[key]
+            if batch_results["parked"]:
+                # Optima went away mid-flush, the remaining batches would only fail too
+                break
+
+        return results
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            # Already expired and possibly taken over by another worker
+            pass
+
+def reclaim_stale_entries():
+    """Return entries left in Processing by a dispatcher that died to the queue.
+
+    A live dispatcher holds the dispatch lock, which expires after
+    DISPATCH_LOCK_TIMEOUT, so anything in Processing for longer was abandoned.
+    """
+    frappe.db.set_value(
+        "Optima Outbox",
+        {"status": "Processing", "modified": ["<", add_to_date(now_datetime(), seconds=-DISPATCH_LOCK_TIMEOUT)]},
+        "status",
+        "Pending"
+    )
+    frappe.db.commit()
+
+def dispatch_batch(entries):
+    """Push one batch of outbox entries to Optima over a single connection.
+
+    Only errors raised on a live connection count against an entry. If the
+    server can't be reached, or the connection dies mid-batch, the remaining
+    entries are parked: returned to Pending without using up an attempt.
+    """
+    names = [entry.name for entry in entries]
+    frappe.db.set_value("Optima Outbox", {"name": ["in", names]}, "status", "Processing")
+    frappe.db.commit()
+
+    completed = []
+    failed = []
+    parked = []
+
+    try:
+        with get_optima_connection() as conn:
+            for entry in entries:
+                if parked:
+                    parked.append(entry.name)
+                    continue
+                try:
+                    sync_sales_order_to_optima(frappe.get_doc("Sales Order", entry.sales_order), conn=conn)
+                    completed.append(entry.name)
+                except Exception as e:
+                    if not _is_alive(conn):
+                        # The server went away, not the order's fault
+                        parked.append(entry.name)
+                        continue
+                    failed.append(entry.name)
+                    mark_entry_failed(entry, e)
+    except Exception:
+        # Could not get a connection at all, or the circuit is open. The
+        # circuit breaker already logs the outage.
+        parked = [name for name in names if name not in completed and name not in failed]
+
+    if parked:
+        frappe.db.set_value("Optima Outbox", {"name": ["in", parked]}, "status", "Pending")
+
+    if completed:
+        frappe.db.set_value("Optima Outbox", {"name": ["in", completed]}, {
+            "status": "Completed",
+            "processed_on": now_datetime()
+        })
+    frappe.db.commit()
+
+    return {"completed": len(completed), "failed": len(failed), "parked": len(parked)}
+
+def mark_entry_failed(entry, error):
+    """Return an entry to the queue, or fail it once it ran out of attempts."""
+    attempts = cint(entry.attempts) + 1
+    frappe.db.set_value("Optima Outbox", entry.name, {
+        "status": "Failed" if attempts >= MAX_OUTBOX_ATTEMPTS else "Pending",
+        "attempts": attempts,
+        "last_error": str(error)[:140],
+        "processed_on": now_datetime()
+    })
+    frappe.db.commit()
+
+@frappe.whitelist()
+def flush_outbox():
+    """Flush the outbox now instead of waiting for the scheduler."""
+    frappe.enqueue(
+        "optima.optima.utils.outbox.dispatch_outbox",
+        queue="long",
+        job_id="optima_outbox_dispatch",
+        deduplicate=True,
+        force=True
+    )
+    frappe.msgprint(_("Outbox flush has been queued."))
@@ -0,0 +1,49 @@
+import frappe
+from frappe.utils import cint
+import hashlib
+from .circuit_breaker import circuit_name
+
+DEFAULT_SCHEMA_CACHE_TTL = 10 * 60  # seconds catalog lookups are served from Redis
+SCHEMA_CACHE_PREFIX = "optima_schema"
+
+def schema_cache_key(server, port, user, password, database, obj):
+    """Key for one catalog lookup on one server.
+
+    The login is folded in as a fingerprint so a cached answer is only served
+    to callers who could have run the query themselves.
+    """
+    login = hashlib.sha256(f"{user}\0{password}".encode()).hexdigest()[:16]
+    return f"{SCHEMA_CACHE_PREFIX}|{circuit_name(server, port)}|{login}|{database or ''}|{obj}"
+
+def get_schema_cache_ttl():
+    return cint(frappe.get_cached_doc("Optima Settings").get("schema_cache_ttl")) or DEFAULT_SCHEMA_CACHE_TTL
+
+def get_cached_schema(server, port, user, password, database, obj, loader, refresh=False):
+    """Return `loader()` through the schema cache, calling it on a miss or when refreshing.
+
+    Errors from the loader propagate and are never cached.
+    """
+    cache = frappe.cache()
+    key = schema_cache_key(server, port, user, password, database, obj)
+
+    if not cint(refresh):
+        value = cache.get_value(key)
+        if value is not None:
+            return value
+
+    value = loader()
+    cache.set_value(key, value, expires_in_sec=get_schema_cache_ttl())
+    return value
+
+def invalidate_schema_cache(server=None, port=None):
+    """Drop cached catalog lookups for one server, or for every server."""
+    prefix = f"{SCHEMA_CACHE_PREFIX}|"
+    if server:
+        prefix += f"{circuit_name(server, port)}|"
+    frappe.cache().delete_keys(prefix)
+
+@frappe.whitelist()
+def clear_schema_cache(server=None, port=None):
+    """Forget cached schema metadata so the next lookup goes to the server."""
+    frappe.only_for("System Manager")
+    invalidate_schema_cache(server, port)
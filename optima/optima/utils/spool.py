@@ -0,0 +1,287 @@
+import frappe
+from frappe.utils import now_datetime
+import fcntl
+import json
+import os
+import time
+from contextlib import ExitStack
+from .circuit_breaker import get_optima_circuit
+from .connection import _is_alive, get_optima_connection
+from .order_sync import (
+    PUSHED_SYNC_STATUSES,
+    OrderSyncLocked,
+    insert_order_header,
+    insert_order_lines,
+    get_next_order_id,
+    order_sync_lock,
+    record_pushed_order
+)
+
+SPOOL_FOLDER = "optima_spool"
+SPOOL_SEGMENT_SUFFIX = ".jsonl"
+SPOOL_CLAIMED_SUFFIX = ".replaying"
+SPOOL_REPLAY_BATCH_SIZE = 50  # orders per MSSQL transaction during replay
+REPLAY_LOCK_TIMEOUT = 15 * 60  # seconds
+
+def get_spool_folder():
+    return frappe.get_site_path("private", SPOOL_FOLDER)
+
+def spool_order(sales_order, header, lines, shipping_details, payload_hash, sync_log=None):
+    """Append a prepared order to the spool.
+
+    `header` and `lines` come from prepare_order_header/prepare_order_line
+    without RIFCLI and ID_ORDINI, which are only assigned at replay.
+    """
+    append_to_spool({
+        "sales_order": sales_order,
+        "header": header,
+        "lines": lines,
+        "shipping_details": shipping_details,
+        "payload_hash": payload_hash,
+        "sync_log": sync_log,
+        "spooled_at": str(now_datetime())
+    })
+
+def append_to_spool(entry):
+    """Durably append one entry to the current hourly segment."""
+    folder = get_spool_folder()
+    os.makedirs(folder, exist_ok=True)
+    data = (json.dumps(entry, default=str, separators=(",", ":")) + "\n").encode()
+
+    while True:
+        path = os.path.join(folder, f"{now_datetime():%Y%m%d%H}{SPOOL_SEGMENT_SUFFIX}")
+        with open(path, "ab") as segment:
+            fcntl.flock(segment, fcntl.LOCK_EX)
+
+            # The replayer may have claimed the segment while we waited for the
+            # lock, in which case our handle no longer points at `path`
+            try:
+                claimed = os.stat(path).st_ino != os.fstat(segment.fileno()).st_ino
+            except FileNotFoundError:
+                claimed = True
+            if claimed:
+                continue
+
+            segment.write(data)
+            segment.flush()
+            os.fsync(segment.fileno())
+            return path
+
+def claim_segments():
+    """Rename spooled segments aside so new appends start a fresh segment.
+
+    Returns every claimed segment, including ones left by an interrupted
+    replay, oldest first.
+    """
+    folder = get_spool_folder()
+    if not os.path.isdir(folder):
+        return []
+
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(SPOOL_SEGMENT_SUFFIX):
+            continue
+        claimed = os.path.join(
+            folder, f"{name[:-len(SPOOL_SEGMENT_SUFFIX)]}.{time.time_ns()}{SPOOL_CLAIMED_SUFFIX}"
+        )
+        os.rename(os.path.join(folder, name), claimed)
+
+        # Wait for an append that already held the segment to finish
+        with open(claimed, "rb") as segment:
+            fcntl.flock(segment, fcntl.LOCK_EX)
+
+    return [
+        os.path.join(folder, name)
+        for name in sorted(os.listdir(folder))
+        if name.endswith(SPOOL_CLAIMED_SUFFIX)
+    ]
+
+def read_segment(path):
+    entries = []
+    with open(path, "rb") as segment:
+        for line in segment:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from a crash mid-append, the order stays Pending
+                frappe.log_error(f"Skipped unreadable spool entry in {path}: {line[:200]!r}", "Optima Spool")
+    return entries
+
+def rewrite_segment(path, entries):
+    """Atomically replace a claimed segment with the entries still to replay."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as segment:
+        for entry in entries:
+            segment.write((json.dumps(entry, default=str, separators=(",", ":")) + "\n").encode())
+        segment.flush()
+        os.fsync(segment.fileno())
+    os.replace(tmp_path, path)
+
+def has_spooled_orders():
+    folder = get_spool_folder()
+    return os.path.isdir(folder) and any(
+        name.endswith((SPOOL_SEGMENT_SUFFIX, SPOOL_CLAIMED_SUFFIX)) for name in os.listdir(folder)
+    )
+
+def replay_spool():
+    """Push spooled orders to Optima in the order they were spooled."""
+    if not has_spooled_orders() or get_optima_circuit().is_open():
+        return
+
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key("optima_spool_replay"), timeout=REPLAY_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return
+
+    try:
+        replayed = 0
+        for path in claim_segments():
+            entries = read_segment(path)
+            done = replay_entries(entries)
+            replayed += done
+
+            if done < len(entries):
+                # Optima went away again, keep the rest for the next run
+                rewrite_segment(path, entries[done:])
+                break
+            os.remove(path)
+
+        return {"replayed": replayed}
+    finally:
+        lock.release()
+
+def replay_entries(entries):
+    """Replay entries batch by batch and return how many were handled.
+
+    Stops at the first batch that fails because Optima is unreachable. A batch
+    that fails on a live connection is retried one order at a time, so a
+    single bad order is failed on its own instead of blocking the spool.
+    """
+    done = 0
+    try:
+        with get_optima_connection() as conn:
+            for start in range(0, len(entries), SPOOL_REPLAY_BATCH_SIZE):
+                batch = entries[start:start + SPOOL_REPLAY_BATCH_SIZE]
+                try:
+                    replay_batch(conn, batch)
+                except Exception:
+                    abort_replay(conn)
+                    for entry in batch:
+                        try:
+                            replay_batch(conn, [entry])
+                        except Exception as e:
+                            abort_replay(conn)
+                            mark_replay_failed(entry, e)
+                done += len(batch)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Optima Spool Replay")
+    return done
+
+def abort_replay(conn):
+    """Roll back a failed batch, raising if the connection itself is gone."""
+    frappe.db.rollback()
+    conn.rollback()
+    if not _is_alive(conn):
+        raise frappe.ValidationError("Lost the Optima connection during spool replay")
+
+def mark_replay_failed(entry, error):
+    """Fail an order the server rejected, as a regular sync would."""
+    frappe.log_error(f"Spooled order {entry['sales_order']} was rejected by Optima: {error}", "Optima Spool Replay")
+
+    if entry.get("sync_log") and frappe.db.exists("Optima Sync Log", entry["sync_log"]):
+        frappe.db.set_value("Optima Sync Log", entry["sync_log"], {
+            "status": "Failed",
+            "message": str(error)[:140]
+        })
+    frappe.db.set_value('Sales Order', entry["sales_order"], {
+        'custom_optima_sync_status': 'Failed',
+        'custom_optima_sync_error': str(error)[:140]
+    })
+    frappe.db.commit()
+
+def replay_batch(conn, entries):
+    """Write a batch of spooled orders in one MSSQL transaction.
+
+    Headers need a round trip each for their identity, but the lines of the
+    whole batch go out together in multi-row INSERTs. Raises only while
+    nothing has been committed in Optima, so a failed batch is safe to retry.
+    """
+    with ExitStack() as stack:
+        pending = []
+        for entry in entries:
+            optima_order = frappe.db.get_value(
+                "Optima Order",
+                {"sales_order": entry["sales_order"]},
+                ["name", "sync_status", "payload_hash"],
+                as_dict=True
+            )
+            if (optima_order and optima_order.sync_status in PUSHED_SYNC_STATUSES
+                    and optima_order.payload_hash == entry["payload_hash"]):
+                # Already pushed, e.g. by a manual retry or before a crashed replay
+                continue
+
+            try:
+                stack.enter_context(order_sync_lock(entry["sales_order"]))
+            except OrderSyncLocked:
+                # Being pushed right now by another worker, check it again next run
+                append_to_spool(entry)
+                continue
+
+            pending.append((entry, optima_order))
+
+        if not pending:
+            return
+
+        cursor = conn.cursor()
+        pushes = []
+        lines = []
+        try:
+            for entry, _optima_order in pending:
+                order_ref = f"S{now_datetime().strftime('%y%m%d%H%M')}"
+                id_ordini = get_next_order_id(cursor)
+                order_id = insert_order_header(cursor, {
+                    **entry["header"],
+                    "RIFCLI": order_ref,
+                    "ID_ORDINI": id_ordini
+                })
+                lines.extend({**line, "ID_ORDINI": id_ordini} for line in entry["lines"])
+                pushes.append(frappe._dict(order_id=order_id, id_ordini=id_ordini, order_ref=order_ref))
+
+            insert_order_lines(cursor, lines)
+            conn.commit()
+        finally:
+            cursor.close()
+
+        # The batch is committed in Optima. From here on nothing may roll it
+        # back or replay it again, so each order is recorded and committed on
+        # its own and failures only leave a reconciliation error
+        for (entry, optima_order), push in zip(pending, pushes):
+            record_pushed_order(
+                entry["sales_order"],
+                optima_order.name if optima_order else None,
+                entry["shipping_details"],
+                push,
+                entry["payload_hash"],
+                sync_log=entry.get("sync_log"),
+                message="Replayed from the local spool"
+            )
+
+@frappe.whitelist()
+def get_spool_status():
+    """Return how many orders are waiting in the spool."""
+    folder = get_spool_folder()
+    if not os.path.isdir(folder):
+        return {"segments": 0, "orders": 0}
+
+    segments = [
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.endswith((SPOOL_SEGMENT_SUFFIX, SPOOL_CLAIMED_SUFFIX))
+    ]
+    orders = 0
+    for path in segments:
+        with open(path, "rb") as segment:
+            orders += sum(1 for line in segment if line.strip())
+    return {"segments": len(segments), "orders": orders}
@@ -1,110 +1,261 @@
 import frappe
 from frappe import _
+from frappe.utils import add_to_date, cint, getdate, now_datetime
 from datetime import datetime
+from .circuit_breaker import get_optima_circuit
 from .connection import get_optima_connection
 from .mapping import fetch_optima_items, fetch_optima_customers
 
-def create_sync_log(sync_type, status, message=None):
-    """Create a sync log entry."""
+BULK_CREATE_CHUNK_SIZE = 500  # new Optima articles validated and inserted per commit
+STATUS_CHECK_CHUNK_SIZE = 500  # operation IDs per IN list, well under the 2100 parameter limit
+DEFAULT_STATUS_POLL_BUDGET = 200  # orders checked per poll
+STATUS_POLL_BASE_INTERVAL = 60  # seconds before the first re-check, doubled per unsettled check
+STATUS_POLL_MAX_INTERVAL = 6 * 60 * 60  # seconds, backoff ceiling
+STATUS_POLL_URGENT_MAX_INTERVAL = 10 * 60  # seconds, ceiling for orders due within URGENT_DELIVERY_DAYS
+URGENT_DELIVERY_DAYS = 2
+
+def create_sync_log(reference_doctype, status, message=None):
+    """Create a sync log entry for a master data sync of `reference_doctype`."""
     log = frappe.get_doc({
         "doctype": "Optima Sync Log",
-        "sync_type": sync_type,
+        "reference_doctype": reference_doctype,
+        "user": frappe.session.user,
         "status": status,
-        "message": message or "Sync completed successfully",
-        "sync_datetime": datetime.now()
+        "message": message or "Sync completed successfully"
     })
     log.insert(ignore_permissions=True)
     return log
 
+def load_mapping_index(doctype, key_field, value_field):
+    """Load every existing mapping in one query into a dict keyed by Optima code."""
+    return {
+        key: value
+        for key, value in frappe.get_all(doctype, fields=[key_field, value_field], as_list=True)
+    }
+
+def make_item_docs(item):
+    """Build the unsaved Item and Optima Item Mapping for an Optima article."""
+    return [
+        frappe.get_doc({
+            "doctype": "Item",
+            "item_code": item.ItemCode,
+            "item_name": item.Description,
+            "item_group": "Products"  # Set appropriate default
+        }),
+        frappe.get_doc({
+            "doctype": "Optima Item Mapping",
+            "optima_item_code": item.ItemCode,
+            "erpnext_item_code": item.ItemCode
+        })
+    ]
+
+def create_in_bulk(records, make_docs):
+    """Create ERPNext documents and their Optima mappings for `records`, one commit per chunk.
+
+    `make_docs` returns the unsaved documents for a record with its mapping
+    last. The ERPNext documents go through a regular insert(), so their
+    validation, child rows and every app's hooks run. The mappings have no
+    logic of their own and link to documents inserted just before, so the
+    chunk's mappings are written with a single multi-row INSERT. If that
+    INSERT fails the whole chunk is rolled back and created again record by
+    record, each document together with its mapping, so no document is ever
+    left without one. A record whose insert fails is rolled back on its own
+    and skipped.
+    Returns the number created and the list of records that failed.
+    """
+    frappe.db.savepoint("optima_bulk_create_chunk")
+    failed = []
+    mappings = []
+
+    for record in records:
+        docs = make_docs(record)
+        if insert_record_docs(record, docs[:-1]):
+            mappings.append(docs[-1])
+        else:
+            failed.append(record)
+
+    if not bulk_insert_mappings(mappings):
+        # e.g. a mapping created meanwhile by another sync
+        frappe.db.rollback(save_point="optima_bulk_create_chunk")
+        failed = [record for record in records if not insert_record_docs(record, make_docs(record))]
+
+    frappe.db.commit()
+    return len(records) - len(failed), failed
+
+def insert_record_docs(record, docs):
+    """Insert `docs` for one record under a savepoint; roll back and return False if any fails."""
+    frappe.db.savepoint("optima_bulk_create_row")
+    try:
+        for doc in docs:
+            doc.insert(ignore_permissions=True)
+    except Exception as e:
+        frappe.db.rollback(save_point="optima_bulk_create_row")
+        frappe.log_error(f"Optima master data insert failed: {str(e)}", "Optima Sync")
+        return False
+    return True
+
+def bulk_insert_mappings(mappings):
+    """Write mapping documents with one INSERT and return whether it succeeded."""
+    if not mappings:
+        return True
+
+    frappe.db.savepoint("optima_bulk_create_mappings")
+    try:
+        values = []
+        for mapping in mappings:
+            mapping.set_new_name()
+            mapping.set_user_and_timestamp()
+            mapping.set_docstatus()
+            values.append(mapping.get_valid_dict(convert_dates_to_str=True))
+
+        fields = list(values[0])
+        frappe.db.bulk_insert(mappings[0].doctype, fields, [[row.get(field) for field in fields] for row in values])
+    except Exception:
+        frappe.db.rollback(save_point="optima_bulk_create_mappings")
+        return False
+    return True
+
+def get_next_watermark(watermark, failed):
+    """Cap the new watermark at the oldest failed row, so the next delta sync reads it again.
+
+    Delta reads include rows changed at the watermark itself, so storing the
+    oldest failed row's own watermark is enough to pick it up again.
+    """
+    retry_from = min((row.Watermark for row in failed if row.Watermark), default=None)
+    if retry_from and (not watermark or retry_from < watermark):
+        return retry_from
+    return watermark
+
 @frappe.whitelist()
-def sync_items():
-    """Sync items from Optima to ERPNext."""
+def sync_items(delta=False):
+    """Sync items from Optima to ERPNext.
+
+    With `delta`, only rows changed since the stored items watermark are read.
+    """
     try:
-        items = fetch_optima_items()
+        since = get_watermark("items_watermark") if cint(delta) else None
+        items = fetch_optima_items(since=since)
+        watermark = None
+        item_index = load_mapping_index("Optima Item Mapping", "optima_item_code", "erpnext_item_code")
+        lookups = created = 0
+        pending = []
+        failed = []
         
         for item in items:
             # Check if mapping exists
-            existing_mapping = frappe.get_all(
-                "Optima Item Mapping",
-                filters={"optima_item_code": item.ItemCode},
-                fields=["name", "erpnext_item_code"]
-            )
-            
-            if not existing_mapping:
-                # Create new item in ERPNext if needed
-                erpnext_item = frappe.get_doc({
-                    "doctype": "Item",
-                    "item_code": item.ItemCode,
-                    "item_name": item.Description,
-                    "standard_rate": item.UnitPrice,
-                    "item_group": "Products"  # Set appropriate default
-                })
-                erpnext_item.insert(ignore_permissions=True)
+            lookups += 1
+            if item.Watermark and (not watermark or item.Watermark > watermark):
+                watermark = item.Watermark
+            if item.ItemCode not in item_index:
+                pending.append(item)
+                item_index[item.ItemCode] = item.ItemCode
                 
-                # Create mapping
-                mapping = frappe.get_doc({
-                    "doctype": "Optima Item Mapping",
-                    "optima_item_code": item.ItemCode,
-                    "erpnext_item_code": item.ItemCode
-                })
-                mapping.insert(ignore_permissions=True)
+                if len(pending) >= BULK_CREATE_CHUNK_SIZE:
+                    chunk_created, chunk_failed = create_in_bulk(pending, make_item_docs)
+                    created += chunk_created
+                    failed += chunk_failed
+                    pending = []
         
-        create_sync_log("Items", "Success")
-        return {"success": True, "message": "Items synced successfully"}
+        if pending:
+            chunk_created, chunk_failed = create_in_bulk(pending, make_item_docs)
+            created += chunk_created
+            failed += chunk_failed
+        
+        # One query loaded the index instead of one query per record
+        lookups_saved = max(lookups - 1, 0)
+        message = f"Items synced successfully. {created} created, {len(failed)} failed, {lookups_saved} mapping lookups saved"
+        create_sync_log("Item", "Completed", message)
+        # Only move the watermark once the run is on record
+        watermark = get_next_watermark(watermark, failed)
+        if watermark:
+            frappe.db.set_single_value("Optima Settings", "items_watermark", watermark)
+        return {"success": True, "message": message, "created": created, "failed": len(failed), "lookups_saved": lookups_saved}
     
     except Exception as e:
         error_msg = f"Error syncing items: {str(e)}"
-        create_sync_log("Items", "Failed", error_msg)
+        create_sync_log("Item", "Failed", error_msg)
         return {"success": False, "message": error_msg}
 
 @frappe.whitelist()
-def sync_customers():
-    """Sync customers from Optima to ERPNext."""
+def sync_customers(delta=False):
+    """Sync customers from Optima to ERPNext.
+
+    With `delta`, only rows changed since the stored customers watermark are read.
+    """
     try:
-        customers = fetch_optima_customers()
+        since = get_watermark("customers_watermark") if cint(delta) else None
+        customers = fetch_optima_customers(since=since)
+        watermark = None
+        customer_index = load_mapping_index("Optima Customer Mapping", "optima_customer_code", "erpnext_customer")
+        lookups = created = 0
+        failed = []
         
         for customer in customers:
             # Check if mapping exists
-            existing_mapping = frappe.get_all(
-                "Optima Customer Mapping",
-                filters={"optima_customer_code": customer.CustomerCode},
-                fields=["name", "erpnext_customer"]
-            )
-            
-            if not existing_mapping:
-                # Create new customer in ERPNext if needed
-                erpnext_customer = frappe.get_doc({
-                    "doctype": "Customer",
-                    "customer_name": customer.CustomerName,
-                    "customer_type": "Company",
-                    "territory": "All Territories"
-                })
-                erpnext_customer.insert(ignore_permissions=True)
-                
-                # Create mapping
-                mapping = frappe.get_doc({
-                    "doctype": "Optima Customer Mapping",
-                    "optima_customer_code": customer.CustomerCode,
-                    "erpnext_customer": erpnext_customer.name
-                })
-                mapping.insert(ignore_permissions=True)
+            lookups += 1
+            if customer.Watermark and (not watermark or customer.Watermark > watermark):
+                watermark = customer.Watermark
+            if customer.CustomerCode not in customer_index:
+                frappe.db.savepoint("optima_customer_row")
+                try:
+                    # Create new customer in ERPNext if needed
+                    erpnext_customer = frappe.get_doc({
+                        "doctype": "Customer",
+                        "customer_name": customer.CustomerName,
+                        "customer_type": "Company",
+                        "territory": "All Territories"
+                    })
+                    erpnext_customer.insert(ignore_permissions=True)
+                    
+                    # Create mapping
+                    mapping = frappe.get_doc({
+                        "doctype": "Optima Customer Mapping",
+                        "optima_customer_code": customer.CustomerCode,
+                        "erpnext_customer": erpnext_customer.name
+                    })
+                    mapping.insert(ignore_permissions=True)
+                except Exception as e:
+                    frappe.db.rollback(save_point="optima_customer_row")
+                    frappe.log_error(f"Optima customer insert failed: {str(e)}", "Optima Sync")
+                    failed.append(customer)
+                    continue
+                customer_index[customer.CustomerCode] = erpnext_customer.name
+                created += 1
         
-        create_sync_log("Customers", "Success")
-        return {"success": True, "message": "Customers synced successfully"}
+        # One query loaded the index instead of one query per record
+        lookups_saved = max(lookups - 1, 0)
+        message = f"Customers synced successfully. {created} created, {len(failed)} failed, {lookups_saved} mapping lookups saved"
+        create_sync_log("Customer", "Completed", message)
+        # Only move the watermark once the run is on record
+        watermark = get_next_watermark(watermark, failed)
+        if watermark:
+            frappe.db.set_single_value("Optima Settings", "customers_watermark", watermark)
+        return {"success": True, "message": message, "created": created, "failed": len(failed), "lookups_saved": lookups_saved}
     
     except Exception as e:
         error_msg = f"Error syncing customers: {str(e)}"
-        create_sync_log("Customers", "Failed", error_msg)
+        create_sync_log("Customer", "Failed", error_msg)
         return {"success": False, "message": error_msg}
 
+def get_watermark(fieldname):
+    """Return the stored high-water mark for a delta sync, if any."""
+    return frappe.db.get_single_value("Optima Settings", fieldname)
+
 def daily_sync():
     """Daily sync operation."""
     sync_items()
     sync_customers()
     # Update last sync datetime in settings
-    settings = frappe.get_single("Optima Settings")
-    settings.last_sync_datetime = datetime.now()
-    settings.save()
+    frappe.db.set_single_value("Optima Settings", "last_synchronization", datetime.now())
+
+def delta_sync():
+    """Frequent sync that only reads master data changed since the last run."""
+    if not cint(frappe.db.get_single_value("Optima Settings", "delta_sync_enabled")):
+        return
+
+    sync_items(delta=True)
+    sync_customers(delta=True)
+    frappe.db.set_single_value("Optima Settings", "last_synchronization", datetime.now())
 
 def hourly_sync():
     """Hourly sync operation for time-sensitive data."""
@@ -112,41 +263,111 @@ def hourly_sync():
     pass 
 
 def check_optima_sync_status():
-    """Check status of synced orders in Optima"""
-    conn = get_optima_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Get pending orders
-        orders = frappe.get_all(
-            "Optima Order",
-            filters={"sync_status": "In Progress"},
-            fields=["name", "optima_operation_id"]
+    """Check status of synced orders in Optima.
+
+    Only orders whose next check is due are polled, at most the configured
+    budget per run and the soonest delivery first, so the load on SQL Server
+    stays flat however many orders are waiting.
+    """
+    if get_optima_circuit().is_open():
+        return
+
+    budget = cint(frappe.db.get_single_value("Optima Settings", "status_poll_budget")) or DEFAULT_STATUS_POLL_BUDGET
+    orders = frappe.db.sql("""
+        SELECT name, optima_operation_id, delivery_date, status_check_attempts
+        FROM `tabOptima Order`
+        WHERE sync_status = 'In Progress'
+            AND IFNULL(optima_operation_id, '') != ''
+            AND (next_status_check IS NULL OR next_status_check <= %(now)s)
+        ORDER BY delivery_date IS NULL, delivery_date ASC, next_status_check ASC
+        LIMIT %(budget)s
+    """, {"now": now_datetime(), "budget": budget}, as_dict=True)
+    if not orders:
+        return
+
+    with get_optima_connection() as conn:
+        cursor = conn.cursor()
+
+        try:
+            for start in range(0, len(orders), STATUS_CHECK_CHUNK_SIZE):
+                chunk = orders[start:start + STATUS_CHECK_CHUNK_SIZE]
+                statuses = fetch_optima_sync_statuses(
+                    cursor, [order.optima_operation_id for order in chunk]
+                )
+                apply_optima_sync_statuses(chunk, statuses)
+                frappe.db.commit()
+        finally:
+            cursor.close()
+
+def fetch_optima_sync_statuses(cursor, operation_ids):
+    """Fetch SyncStatus/SyncNotes for a batch of operation IDs in one query."""
+    placeholders = ", ".join(["%s"] * len(operation_ids))
+    cursor.execute(f"""
+        SELECT ID_OPERATIONS, SyncStatus, SyncNotes 
+        FROM Optima_Orders 
+        WHERE ID_OPERATIONS IN ({placeholders})
+    """, tuple(operation_ids))
+
+    return {str(row[0]): (row[1], row[2]) for row in cursor.fetchall()}
+
+def apply_optima_sync_statuses(orders, statuses):
+    """Apply fetched Optima statuses to Optima Orders with bulk updates."""
+    completed = []
+    failed = {}  # sync notes -> order names
+    pending = []
+
+    for order in orders:
+        status, notes = statuses.get(str(order.optima_operation_id)) or (None, None)
+        if status == 1:
+            completed.append(order.name)
+        elif status is not None and status < 0:
+            failed.setdefault(notes or "", []).append(order.name)
+        else:
+            pending.append(order)
+
+    if completed:
+        frappe.db.set_value("Optima Order", {"name": ["in", completed]}, {
+            "sync_status": "Completed",
+            "status": "Synced"
+        })
+
+    for notes, names in failed.items():
+        frappe.db.set_value("Optima Order", {"name": ["in", names]}, {
+            "sync_status": "Failed",
+            "status": "Failed",
+            "sync_message": notes
+        })
+
+    schedule_next_status_checks(pending)
+
+    return {
+        "completed": len(completed),
+        "failed": sum(len(names) for names in failed.values()),
+        "rescheduled": len(pending)
+    }
+
+def schedule_next_status_checks(orders):
+    """Back off orders Optima hasn't settled yet, exponentially per attempt.
+
+    Orders due for delivery soon are capped at a short interval so they are
+    confirmed quickly even after many attempts.
+    """
+    now = now_datetime()
+    urgent_date = getdate(add_to_date(now, days=URGENT_DELIVERY_DAYS))
+    groups = {}  # (attempts, next check) -> order names
+
+    for order in orders:
+        attempts = cint(order.get("status_check_attempts")) + 1
+        ceiling = (
+            STATUS_POLL_URGENT_MAX_INTERVAL
+            if order.get("delivery_date") and getdate(order.delivery_date) <= urgent_date
+            else STATUS_POLL_MAX_INTERVAL
         )
-        
-        for order in orders:
-            # Check status in Optima
-            cursor.execute("""
-                SELECT SyncStatus, SyncNotes 
-                FROM Optima_Orders 
-                WHERE ID_OPERATIONS = %s
-            """, (order.optima_operation_id,))
-            
-            result = cursor.fetchone()
-            if result:
-                status, notes = result
-                
-                optima_order = frappe.get_doc("Optima Order", order.name)
-                if status == 1:
-                    optima_order.sync_status = "Completed"
-                    optima_order.status = "Synced"
-                elif status < 0:
-                    optima_order.sync_status = "Failed"
-                    optima_order.status = "Failed"
-                    optima_order.sync_message = notes
-                
-                optima_order.save()
-                
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        interval = min(STATUS_POLL_BASE_INTERVAL * 2 ** min(attempts - 1, 20), ceiling)
+        groups.setdefault((attempts, interval), []).append(order.name)
+
+    for (attempts, interval), names in groups.items():
+        frappe.db.set_value("Optima Order", {"name": ["in", names]}, {
+            "status_check_attempts": attempts,
+            "next_status_check": add_to_date(now, seconds=interval)
+        }, update_modified=False)
@@ -0,0 +1,69 @@
+from frappe.utils import cint
+
+# Row counts and sizes come from partition metadata, so they are approximate
+# but cost the same however big the tables are. The DMVs need VIEW DATABASE
+# STATE and VIEW SERVER STATE; logins without them get the catalog views,
+# which give the same counts and sizes but no last-modified time.
+TABLE_STATS_QUERY = """
+    SELECT
+        t.name AS table_name,
+        SCHEMA_NAME(t.schema_id) AS schema_name,
+        SUM(CASE WHEN ps.index_id IN (0, 1) THEN ps.row_count ELSE 0 END) AS row_count,
+        SUM(ps.reserved_page_count) * 8 AS reserved_kb,
+        SUM(ps.used_page_count) * 8 AS used_kb,
+        (
+            SELECT MAX(us.last_user_update)
+            FROM sys.dm_db_index_usage_stats us
+            WHERE us.database_id = DB_ID() AND us.object_id = t.object_id
+        ) AS last_modified,
+        t.modify_date AS schema_modified
+    FROM sys.tables t
+    LEFT JOIN sys.dm_db_partition_stats ps ON ps.object_id = t.object_id
+    GROUP BY t.object_id, t.schema_id, t.name, t.modify_date
+    ORDER BY t.name
+"""
+
+TABLE_STATS_FALLBACK_QUERY = """
+    SELECT
+        t.name AS table_name,
+        SCHEMA_NAME(t.schema_id) AS schema_name,
+        (
+            SELECT SUM(p.rows) FROM sys.partitions p
+            WHERE p.object_id = t.object_id AND p.index_id IN (0, 1)
+        ) AS row_count,
+        (
+            SELECT SUM(au.total_pages) * 8 FROM sys.partitions p
+            INNER JOIN sys.allocation_units au ON au.container_id = p.partition_id
+            WHERE p.object_id = t.object_id
+        ) AS reserved_kb,
+        (
+            SELECT SUM(au.used_pages) * 8 FROM sys.partitions p
+            INNER JOIN sys.allocation_units au ON au.container_id = p.partition_id
+            WHERE p.object_id = t.object_id
+        ) AS used_kb,
+        NULL AS last_modified,
+        t.modify_date AS schema_modified
+    FROM sys.tables t
+    ORDER BY t.name
+"""
+
+def fetch_table_stats(cursor):
+    """Return every table in the connected database with its approximate size, in one query."""
+    try:
+        cursor.execute(TABLE_STATS_QUERY)
+    except Exception:
+        # Usually a missing VIEW ... STATE permission, which is expected on locked-down logins
+        cursor.execute(TABLE_STATS_FALLBACK_QUERY)
+
+    return [
+        {
+            "table_name": row[0],
+            "schema_name": row[1],
+            "row_count": cint(row[2]),
+            "reserved_kb": cint(row[3]),
+            "used_kb": cint(row[4]),
+            "last_modified": row[5],
+            "schema_modified": row[6]
+        }
+        for row in cursor.fetchall()
+    ]